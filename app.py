@@ -7,23 +7,20 @@ import streamlit as st
 import os
 import sys
 import time
-import threading
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, Optional, BinaryIO
 
 # 添加src目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from config import StreamlitConfig
+# 页面每次重跑都会执行本文件，这里只导入轻量模块；
+# 下载客户端、处理管道（requests、yaml等）在第一次提交任务时才导入
 from utils import (
-    create_zip_archive, 
-    get_directory_size, 
     format_file_size, 
     validate_inputs,
-    cleanup_temp_files,
-    create_zip_archive_in_memory
+    build_task_filter_params
 )
-from src.memory_pipeline import MemoryExtractionPipeline
-import yaml
+from src.job_manager import get_job_manager, QueueFull
 
 # 页面配置
 st.set_page_config(
@@ -33,9 +30,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 初始化配置
-config_manager = StreamlitConfig()
-
 # 会话状态初始化
 if 'processing' not in st.session_state:
     st.session_state.processing = False
@@ -43,48 +37,165 @@ if 'result' not in st.session_state:
     st.session_state.result = None
 if 'error' not in st.session_state:
     st.session_state.error = None
+if 'job_id' not in st.session_state:
+    # 浏览器刷新后从URL恢复任务ID
+    st.session_state.job_id = st.query_params.get('job')
+if 'client_id' not in st.session_state:
+    # 未登录时任务调度按浏览器会话计，会话标识由服务端生成，不从URL读取
+    st.session_state.client_id = uuid.uuid4().hex[:12]
+
 
+def scheduling_user() -> str:
+    """任务调度（轮流出队、单用户排队上限）使用的用户标识
 
-def process_project_async(params: Dict[str, Any], progress_callback):
-    """异步处理项目（内存版）"""
+    启用了Streamlit登录（st.login或Streamlit Cloud访问控制）时为登录邮箱，同一用户的多个标签页共用排队上限；
+    未登录时为当前浏览器会话，刷新页面后为新会话。
+    """
     try:
-        # 创建内存配置（不写入文件）
-        config = config_manager.create_memory_config(params)
-        progress_callback(20, "配置准备完成")
-        
-        # 初始化内存管道
-        pipeline = MemoryExtractionPipeline(config)
-        progress_callback(40, "处理管道初始化完成")
-        
-        # 处理项目
-        result = pipeline.process_single_project()
-        progress_callback(80, "项目处理完成")
-        
-        # 创建结果ZIP文件
-        zip_data = pipeline.create_result_zip(result)
-        progress_callback(90, "结果打包完成")
-        
-        # 计算大小
-        size = len(zip_data)
-        
-        progress_callback(100, "处理完成")
-        
-        return {
-            'project_id': result['project_id'],
-            'files': result.get('files', {}),
-            'zip_data': zip_data,
-            'status': result['status'],
-            'size': format_file_size(size),
-            'frame_extraction': result.get('frame_extraction', False),
-            'message': result.get('message', '处理完成')
-        }
+        email = st.user.get('email')
+    except Exception:
+        email = None
+    return f"user:{email}" if email else f"session:{st.session_state.client_id}"
+
+
+def run_job(params: Dict[str, Any], progress_callback, cancel_token=None) -> Dict[str, Any]:
+    """在后台线程中执行处理任务（首次调用时导入处理管道和下载客户端）"""
+    from src.project_job import run_project_job
+    return run_project_job(params, progress_callback, cancel_token)
+
+
+@st.cache_resource(show_spinner=False)
+def get_manager():
+    """进程级后台任务管理器，任务在页面重跑和刷新后继续运行"""
+    return get_job_manager(run_job)
+
+
+def deferred_archive(store, handle: str):
+    """下载按钮的延迟数据：用户点击下载时才打开结果压缩包，交给Streamlit按文件对象读取"""
+    def open_archive() -> BinaryIO:
+        return store.open(handle)
+    return open_archive
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_manifest_frame(handle: str):
+    """读取结果文件清单为DataFrame（按句柄缓存，翻页和搜索时不重复读取）"""
+    import pandas as pd
+    
+    manifest = get_manager().store.manifest(handle)
+    return pd.DataFrame(manifest) if manifest else None
+
+
+def render_file_listing(handle: str):
+    """分页、可搜索的结果文件列表和按任务汇总，只渲染当前页"""
+    df = load_manifest_frame(handle)
+    if df is None or df.empty:
+        st.write("无文件清单")
+        return
+    
+    files_tab, tasks_tab = st.tabs(["文件", "按任务汇总"])
+    
+    with files_tab:
+        col_search, col_page_size = st.columns([3, 1])
+        with col_search:
+            keyword = st.text_input("搜索路径或任务ID", key=f"manifest_search_{handle}")
+        with col_page_size:
+            page_size = st.selectbox("每页条数", options=[100, 500, 1000], key=f"manifest_page_size_{handle}")
         
-    except Exception as e:
-        raise Exception(f"项目处理失败: {str(e)}")
+        if keyword:
+            matched = df[df['path'].str.contains(keyword, regex=False) |
+                         df['taskId'].astype(str).str.contains(keyword, regex=False)]
+        else:
+            matched = df
+        page_count = max((len(matched) + page_size - 1) // page_size, 1)
+        page = st.number_input(f"页码（共 {page_count} 页，{len(matched)} 条）", min_value=1,
+                               max_value=page_count, value=1, step=1, key=f"manifest_page_{handle}")
+        start = (int(page) - 1) * page_size
+        page_rows = matched.iloc[start:start + page_size]
+        st.dataframe(
+            page_rows.assign(size=page_rows['size'].map(format_file_size)),
+            hide_index=True,
+            use_container_width=True,
+            column_config={'path': '路径', 'size': '大小', 'taskId': '任务ID', 'frame': '帧序号'}
+        )
+    
+    with tasks_tab:
+        tasks = df.dropna(subset=['taskId']).astype({'taskId': str}).groupby('taskId').agg(
+            frames=('frame', 'count'), size=('size', 'sum')
+        ).sort_values('size', ascending=False).reset_index()
+        st.write(f"共 {len(tasks)} 个任务")
+        st.dataframe(
+            tasks.assign(size=tasks['size'].map(format_file_size)),
+            hide_index=True,
+            use_container_width=True,
+            column_config={'taskId': '任务ID', 'frames': '帧数', 'size': '总大小'}
+        )
+
+
+STAGE_NAMES = {'download': '下载', 'unzip': '解压', 'split': '拆帧', 'compress': '打包'}
+ENDPOINT_NAMES = {'standard': '标准接口', 'oss': '大文件接口（OSS）', 'checkpoint': '检查点'}
+EVENT_NAMES = {'processed': '已处理', 'skipped_non_sequence': '跳过非序列文件',
+               'skipped_no_attachment': '跳过无附件的文件', 'failed': '处理失败'}
+MEMORY_MODE_NAMES = {'auto': '自动', 'memory': '内存', 'spooled': '内存优先（超出后写磁盘）', 'disk': '磁盘'}
+
+
+def render_metrics(metrics: dict):
+    """运行指标：下载概况和各阶段耗时、数据量、内存"""
+    stages = metrics.get('stages', {})
+    download = stages.get('download', {})
+    split = stages.get('split', {})
+    compress = stages.get('compress', {})
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("总耗时", f"{metrics.get('total_seconds', 0):.1f} 秒")
+    col2.metric("下载吞吐量", f"{download['mb_per_s']} MB/s" if download.get('mb_per_s') else "-")
+    col3.metric("输出帧数", split.get('frames', '-'))
+    col4.metric("压缩比", f"{compress['compression_ratio']}×" if compress.get('compression_ratio') else "-")
+    
+    details = []
+    if download.get('endpoint'):
+        details.append(f"**下载接口:** {ENDPOINT_NAMES.get(download['endpoint'], download['endpoint'])}")
+    if download.get('login_seconds') is not None:
+        details.append(f"**登录:** {download['login_seconds']} 秒")
+    if download.get('ttfb_seconds') is not None:
+        details.append(f"**首字节:** {download['ttfb_seconds']} 秒")
+    if download.get('failover_after_seconds') is not None:
+        details.append(f"**切换大文件接口前耗时:** {download['failover_after_seconds']} 秒")
+    if split.get('parse_seconds') is not None:
+        details.append(f"**解析/序列化:** {split['parse_seconds']} / {split['serialize_seconds']} 秒")
+    if split.get('events'):
+        details.append("**拆帧事件:** " + '，'.join(f"{EVENT_NAMES.get(kind, kind)} {count}" for kind, count in split['events'].items()))
+    memory = metrics.get('memory') or {}
+    if memory.get('mode'):
+        mode = MEMORY_MODE_NAMES.get(memory['mode'], memory['mode'])
+        if memory.get('switched'):
+            mode += f"（中途转为磁盘，写入磁盘 {memory.get('spilled_mb')} MB）"
+        elif memory.get('spilled_mb'):
+            mode += f"（写入磁盘 {memory['spilled_mb']} MB）"
+        details.append(f"**执行模式:** {mode}")
+    if metrics.get('cache_hit'):
+        details.append("**结果来源:** 结果缓存")
+    if details:
+        st.write(' · '.join(details))
+    
+    rows = []
+    for name, values in stages.items():
+        rows.append({
+            '阶段': STAGE_NAMES.get(name, name),
+            '耗时(秒)': values.get('seconds'),
+            'CPU(秒)': values.get('cpu_seconds'),
+            '输入': format_file_size(values['bytes_in']) if values.get('bytes_in') else '',
+            '输出': format_file_size(values.get('bytes_out') or values.get('bytes') or 0),
+            '常驻内存(MB)': values.get('rss_mb'),
+            '内存峰值(MB)': values.get('peak_traced_mb')
+        })
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
 
 
+@st.cache_resource(show_spinner=False)
 def is_streamlit_cloud():
-    """检测是否在Streamlit Cloud环境中运行"""
+    """检测是否在Streamlit Cloud环境中运行（进程内不变，只检测一次）"""
     # 检查Streamlit Cloud环境变量
     cloud_env = os.environ.get('STREAMLIT_CLOUD_RUNTIME', '').lower()
     if cloud_env == 'true':
@@ -107,6 +218,16 @@ def is_streamlit_cloud():
     
     return False
 
+@st.cache_data(ttl=60, show_spinner=False)
+def has_secret_section(section: str) -> bool:
+    """st.secrets中是否配置了指定段（缓存一分钟，页面重跑时不重复读取secrets）"""
+    try:
+        st.secrets[section]
+        return True
+    except (KeyError, FileNotFoundError):
+        return False
+
+
 def get_credentials():
     """获取账号信息，仅从Streamlit Cloud的st.secrets读取"""
     # 检查是否在Streamlit Cloud环境中运行
@@ -178,6 +299,69 @@ def main():
                                help="跳过数据下载，使用已有数据")
         enable_extraction = st.checkbox("启用拆帧", value=True,
                                        help="是否执行帧提取操作")
+        partition_annotations = st.checkbox("按帧分配标注", value=False,
+                                            help="将slots、slotsChildren、childrenOnly中的标注条目分配到所属帧，关闭时每帧只保留空标注结构")
+        annotation_frame_key = "frameIndex"
+        if partition_annotations:
+            annotation_frame_key = st.text_input("帧序号字段", value="frameIndex",
+                                                 help="slots条目或slotsChildren条目的slot中表示帧序号的字段名") or "frameIndex"
+        
+        # 抽帧方式
+        sampling_label = st.selectbox("抽帧方式",
+                                      options=["全部帧", "每N帧取一帧", "均匀抽取K帧", "指定帧序号", "仅首尾帧"],
+                                      index=0,
+                                      help="QA抽检时只输出部分帧，可大幅减少处理时间和结果大小")
+        sampling = None
+        if sampling_label == "每N帧取一帧":
+            sampling = {'mode': 'stride',
+                        'stride': int(st.number_input("步长N", min_value=1, value=10, step=1))}
+        elif sampling_label == "均匀抽取K帧":
+            sampling = {'mode': 'uniform',
+                        'count': int(st.number_input("每个任务帧数K", min_value=1, value=5, step=1))}
+        elif sampling_label == "指定帧序号":
+            sampling_indices = st.text_input("帧序号", value="0, -1",
+                                             help="逗号分隔，从0开始，负数表示倒数第几帧")
+            sampling = {'mode': 'indices', 'indices_text': sampling_indices}
+        elif sampling_label == "仅首尾帧":
+            sampling = {'mode': 'first_last'}
+        
+        # 输出格式选择
+        output_format_label = st.selectbox("输出格式",
+                                           options=["逐帧JSON", "JSONL分片"],
+                                           index=0,
+                                           help="逐帧JSON：每帧一个文件；JSONL分片：每行一帧，按大小或任务分片并附带索引")
+        output_format = "jsonl" if output_format_label == "JSONL分片" else "per_frame"
+        shard_by = "size"
+        max_shard_mb = 64
+        if output_format == "jsonl":
+            shard_by_label = st.radio("分片方式", options=["按大小", "按任务"], index=0,
+                                      help="按大小：分片达到上限后切换新分片；按任务：每个任务一个分片")
+            shard_by = "task" if shard_by_label == "按任务" else "size"
+            if shard_by == "size":
+                max_shard_mb = st.number_input("分片大小上限 (MB)", min_value=1, max_value=1024,
+                                               value=64, step=16)
+        shared_context = st.checkbox("共享任务上下文", value=False,
+                                     help="任务的metadata、operators、hints等字段每个任务只写一次，帧文件仅保留附件和标注")
+        
+        # 任务过滤（在解压、解析和拆帧阶段提前过滤）
+        with st.expander("🔍 任务过滤", expanded=False):
+            filter_statuses = st.text_input("任务状态", help="逗号分隔，留空表示不过滤")
+            filter_dataset_ids = st.text_input("数据集ID", help="逗号分隔，留空表示不过滤")
+            col_task_min, col_task_max = st.columns(2)
+            with col_task_min:
+                filter_task_id_min = st.text_input("任务ID下限")
+            with col_task_max:
+                filter_task_id_max = st.text_input("任务ID上限")
+            filter_attachment_types = st.multiselect(
+                "附件类型",
+                options=["IMAGE_SEQUENCE", "IMAGE_SET_SEQUENCE", "POINTCLOUD_SEQUENCE", "POINTCLOUD_SET_SEQUENCE"],
+                help="留空表示不过滤"
+            )
+            col_frame_start, col_frame_end = st.columns(2)
+            with col_frame_start:
+                filter_frame_start = st.text_input("起始帧", help="包含该帧")
+            with col_frame_end:
+                filter_frame_end = st.text_input("结束帧", help="不包含该帧")
         
         # 智能下载选项
         smart_download = st.checkbox("智能下载模式", value=True,
@@ -188,6 +372,15 @@ def main():
         else:
             st.warning("⚠️ 智能下载模式已关闭\n\n仅使用标准接口，大文件可能下载失败")
         
+        memory_mode = st.selectbox(
+            "内存模式", options=list(MEMORY_MODE_NAMES), format_func=MEMORY_MODE_NAMES.get,
+            help="自动：按导出大小选择，小项目全部在内存中处理，大项目写入临时文件；"
+                 "内存占用超过预算时会中途转为磁盘")
+        
+        profile = st.checkbox("性能分析", value=False,
+                              help="对本次处理做CPU和内存分析，分析报告放在结果压缩包的_profile/目录，"
+                                   "可附在性能问题反馈中；分析会使处理变慢")
+        
         # 账号信息显示
         if is_streamlit_cloud():
             # Streamlit Cloud模式
@@ -196,11 +389,7 @@ def main():
                 st.info("账号信息已通过Streamlit Cloud配置")
                 
                 # 检查OSS配置
-                try:
-                    st.secrets["oss_credentials"]
-                    oss_status = "✅ OSS配置已配置"
-                except (KeyError, FileNotFoundError):
-                    oss_status = "⚠️ OSS配置未配置"
+                oss_status = "✅ OSS配置已配置" if has_secret_section("oss_credentials") else "⚠️ OSS配置未配置"
                 
                 with st.expander("ℹ️ 账号配置说明", expanded=False):
                     st.markdown(f"""
@@ -332,6 +521,23 @@ def main():
             st.error("池子ID格式错误，请确保每行都是数字")
             return
         
+        try:
+            task_filter = build_task_filter_params(
+                filter_statuses, filter_dataset_ids, filter_task_id_min, filter_task_id_max,
+                filter_attachment_types, filter_frame_start, filter_frame_end
+            )
+        except ValueError:
+            st.error("任务过滤条件格式错误，请输入数字")
+            return
+        
+        if sampling and sampling['mode'] == 'indices':
+            try:
+                sampling = {'mode': 'indices',
+                            'indices': [int(x) for x in sampling['indices_text'].replace('，', ',').split(',') if x.strip()]}
+            except ValueError:
+                st.error("帧序号格式错误，请输入逗号分隔的整数")
+                return
+        
         # 获取账号信息（仅从Streamlit Cloud）
         try:
             username, password = get_credentials()
@@ -355,35 +561,57 @@ def main():
             'test_mode': test_mode,
             'enable_extraction': enable_extraction,
             'check_pool': check_pool,
-            'smart_download': smart_download  # 添加智能下载参数
+            'smart_download': smart_download,  # 添加智能下载参数
+            'output_format': output_format,
+            'shard_by': shard_by,
+            'max_shard_mb': int(max_shard_mb),
+            'shared_context': shared_context,
+            'partition_annotations': partition_annotations,
+            'annotation_frame_key': annotation_frame_key,
+            'sampling': sampling,
+            'filter': task_filter,
+            'memory_mode': memory_mode,
+            'profile': profile
         }
         
-        # 开始处理
-        st.session_state.processing = True
+        # 提交后台任务，参数相同的进行中任务会被复用；排队已满时拒绝
+        try:
+            job = get_manager().submit(params, user=scheduling_user())
+        except QueueFull as e:
+            st.error(f"⏳ {str(e)}")
+            return
+        st.session_state.job_id = job.job_id
+        st.query_params['job'] = job.job_id
         st.session_state.result = None
         st.session_state.error = None
-        
-        # 重置进度条
-        progress_bar.progress(0)
-        status_text.text("准备开始...")
-        
-        # 处理函数
-        def update_progress(percent, message):
-            progress_bar.progress(percent / 100)
-            status_text.text(f"{percent}% - {message}")
-        
-        try:
-            # 处理项目
-            result = process_project_async(params, update_progress)
-            st.session_state.result = result
+    
+    # 同步后台任务状态
+    job = get_manager().get(st.session_state.job_id) if st.session_state.job_id else None
+    st.session_state.processing = bool(job and job.is_active)
+    if job is not None:
+        progress_bar.progress(job.progress / 100)
+        if job.is_active:
+            st.session_state.result = None
+            st.session_state.error = None
+            queue_status = get_manager().queue_status(job.job_id) if job.status == 'queued' else None
+            if queue_status is not None:
+                status_text.text(f"⏳ {queue_status['message']}")
+            else:
+                status_text.text(f"{job.progress}% - {job.message}")
+        elif job.status == 'completed':
+            # 会话中只保存结果信息和句柄，结果压缩包留在磁盘
+            st.session_state.result = get_manager().load_result(job)
+            if st.session_state.result is None:
+                st.session_state.error = "结果已过期清理，请重新处理"
             status_text.text("✅ 处理完成！")
-            
-        except Exception as e:
-            st.session_state.error = str(e)
-            status_text.text(f"❌ 处理失败: {str(e)}")
-            
-        finally:
-            st.session_state.processing = False
+        elif job.status == 'cancelled':
+            st.session_state.result = None
+            st.session_state.error = None
+            status_text.text("⏹ 任务已取消")
+        else:
+            st.session_state.result = None
+            st.session_state.error = job.error
+            status_text.text(f"❌ 处理失败: {job.error}")
     
     # 显示结果
     with result_container:
@@ -398,18 +626,25 @@ def main():
                 st.write(f"**状态:** {result['status']}")
                 st.write(f"**大小:** {result.get('size', '未知')}")
                 st.write(f"**拆帧状态:** {'已启用' if result.get('frame_extraction') else '未启用'}")
+                if result.get('cache_hit'):
+                    st.write("**结果来源:** ♻️ 结果缓存（导出内容和处理参数与之前的任务相同）")
+            
+            # 运行指标
+            if result.get('metrics'):
+                with st.expander("⏱ 运行指标", expanded=False):
+                    render_metrics(result['metrics'])
             
             # 文件列表
-            if result.get('files'):
-                with st.expander("📁 文件列表"):
-                    for filename, data in result['files'].items():
-                        st.write(f"📄 {filename} ({format_file_size(len(data))})")
+            if result.get('handle') and result.get('file_count'):
+                with st.expander(f"📁 文件列表（{result['file_count']} 项，{format_file_size(result['total_size'])}）"):
+                    render_file_listing(result['handle'])
             
-            # 下载按钮
-            if result.get('zip_data'):
+            # 下载按钮（点击时才读取结果文件，页面重跑时不读取，会话中只保存句柄）
+            store = get_manager().store
+            if result.get('handle') and store.exists(result['handle']):
                 st.download_button(
-                    label=f"📥 下载结果 ZIP 文件 ({format_file_size(len(result['zip_data']))})",
-                    data=result['zip_data'],
+                    label=f"📥 下载结果 ZIP 文件 ({format_file_size(result.get('size_bytes', 0))})",
+                    data=deferred_archive(store, result['handle']),
                     file_name=f"project_{result['project_id']}_results.zip",
                     mime="application/zip",
                     use_container_width=True
@@ -422,12 +657,17 @@ def main():
         elif st.session_state.error:
             st.error(f"❌ 处理失败: {st.session_state.error}")
     
-    # 处理状态指示器
+    # 任务进行中时定时刷新页面获取最新进度
     if st.session_state.processing:
-        with st.spinner("正在处理项目，请稍候..."):
-            # 这里可以添加实时日志显示
-            pass
-
+        st.caption(f"任务ID：{st.session_state.job_id}（处理在后台进行，刷新页面不会中断）")
+        load = get_manager().scheduler.snapshot()
+        st.caption(f"当前负载：运行 {load['running']}/{load['max_jobs']} 个任务，排队 {load['queued']} 个，"
+                   f"内存令牌 {load['memory_in_use_mb']:.0f}/{load['memory_capacity_mb']:.0f} MB，"
+                   f"下载 {load['downloads_in_use']}/{load['max_downloads']}")
+        if st.button("⏹ 取消任务", help="停止下载和拆帧，释放连接和内存；共享该任务的其他请求也会一起停止"):
+            get_manager().cancel(st.session_state.job_id)
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+下载基准测试
+在本地模拟服务（mock_rosetta_server.py）上运行 SmartMemoryRosettaClient，
+测量各故障场景下的下载耗时、首字节时间、吞吐量以及故障转移路径：
+
+    python benchmarks/bench_download.py --tasks 500 --frames 50 --repeat 3
+    python benchmarks/bench_download.py --scenarios gateway_504_failover,timeout_failover --output download.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from contextlib import redirect_stdout
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(ROOT))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'src'))
+sys.path.append(ROOT)
+
+from mock_rosetta_server import MockRosettaServer, parse_fault
+from synthetic_export import add_generator_arguments, generator_kwargs
+
+
+# 场景：各接口的故障配置
+SCENARIOS = {
+    'standard': [],
+    'bandwidth_capped': ['export:bandwidth=20MB'],
+    'slow_headers': ['export:latency=1'],
+    'gateway_504_failover': ['export:error_rate=1'],
+    'empty_zip_failover': ['export:empty=1'],
+    'timeout_failover': ['export:hang_rate=1,hang=30'],
+    'oss_throttled': ['export:error_rate=1', 'oss:bandwidth=10MB'],
+    'flaky_login': ['login:fail_first=1'],
+    'all_fail': ['export:error_rate=1', 'query:error_rate=1']
+}
+
+
+def run_download(server: MockRosettaServer, scenario: str, project_id: int) -> Dict[str, Any]:
+    """在指定场景下下载一次"""
+    from smart_memory_client import SmartMemoryRosettaClient
+    from progress import ProgressReporter
+
+    server.reset()
+    for spec in SCENARIOS[scenario]:
+        server.set_faults(parse_fault(spec))
+
+    first_byte: List[float] = []
+
+    def on_progress(event):
+        if event['stage'] == 'download' and event['done'] and not first_byte:
+            first_byte.append(time.perf_counter())
+
+    progress = ProgressReporter(on_progress, min_interval=0)
+    client = SmartMemoryRosettaClient(project_id, [1], username='bench', password='bench')
+    started = time.perf_counter()
+    error = None
+    size = 0
+    try:
+        size = len(client.smart_download(progress))
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+
+    stats = server.stats
+    if stats['oss'].get('ok'):
+        source = 'oss'
+    elif stats['export'].get('ok') and not error:
+        source = 'standard'
+    else:
+        source = None
+    return {
+        'scenario': scenario,
+        'ok': error is None,
+        'source': source,
+        'seconds': round(elapsed, 3),
+        'ttfb_seconds': round(first_byte[0] - started, 3) if first_byte else None,
+        'mb': round(size / 1024 / 1024, 2),
+        'mb_per_s': round(size / 1024 / 1024 / elapsed, 2) if size and elapsed else None,
+        'requests': {endpoint: sum(counts.values()) for endpoint, counts in stats.items()},
+        'error': error
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """同一场景多次运行取中位数"""
+    summary = dict(runs[-1])
+    for key in ('seconds', 'ttfb_seconds', 'mb_per_s'):
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(statistics.median(values), 3) if values else None
+    summary['runs'] = len(runs)
+    summary['ok'] = all(run['ok'] for run in runs)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="下载基准测试（本地模拟服务）")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="场景，逗号分隔")
+    parser.add_argument('--tasks', type=int, default=200, help="导出数据的任务数")
+    add_generator_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=1, help="每个场景的运行次数（取中位数）")
+    parser.add_argument('--timeout', type=float, default=2, help="客户端标准接口超时（秒），用于超时场景")
+    parser.add_argument('--output', help="把结果保存为JSON")
+    parser.add_argument('--verbose', action='store_true', help="显示客户端日志")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenarios.split(',')
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}（可选：{', '.join(SCENARIOS)}）")
+
+    results = []
+    with MockRosettaServer(tasks=args.tasks, generator=generator_kwargs(args)) as server:
+        os.environ.update(server.client_env())
+        os.environ['ROSETTA_EXPORT_TIMEOUT'] = str(args.timeout)
+        export_mb = len(server.export_data(1)) / 1024 / 1024
+        print(f"模拟服务：{server.url}，导出压缩包 {export_mb:.1f} MB")
+
+        for scenario in scenarios:
+            runs = []
+            for _ in range(args.repeat):
+                if args.verbose:
+                    runs.append(run_download(server, scenario, 1))
+                else:
+                    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                        runs.append(run_download(server, scenario, 1))
+            results.append(summarize(runs))
+
+    header = f"{'场景':<24}{'结果':>6}{'路径':>10}{'秒':>9}{'首字节':>9}{'MB/秒':>9}  请求次数"
+    print(header)
+    print('-' * (len(header) + 30))
+    for result in results:
+        requests_text = ' '.join(f"{endpoint}={count}" for endpoint, count in result['requests'].items() if count)
+        print(f"{result['scenario']:<24}{'成功' if result['ok'] else '失败':>6}{result['source'] or '-':>10}"
+              f"{result['seconds']:>9}{result['ttfb_seconds'] or '-':>9}{result['mb_per_s'] or '-':>9}  "
+              f"{requests_text}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'export_mb': round(export_mb, 2), 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
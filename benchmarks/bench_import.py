@@ -0,0 +1,183 @@
+"""
+页面启动耗时基准测试
+测量Streamlit页面的冷启动导入开销，检查页面启动时是否误导入了下载客户端和处理管道：
+
+    python benchmarks/bench_import.py --repeat 5
+    python benchmarks/bench_import.py --detail page --output imports.json
+    python benchmarks/bench_import.py --max-page-ms 50   # 页面导入超过阈值或加载了重型模块时退出码为1
+
+每个导入目标在独立的新解释器中运行（模块缓存互不影响），取多次运行的中位数；
+页面渲染用streamlit.testing的AppTest测量首次运行和空闲重跑的耗时。
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入目标：名称 -> (说明, 导入语句)
+TARGETS = {
+    'streamlit': ("Streamlit框架", "import streamlit"),
+    'page': ("页面启动时导入的模块（不含streamlit）", "import utils; import src.job_manager"),
+    'job': ("第一次提交任务时导入的处理管道和客户端", "import src.project_job"),
+    'filesystem': ("文件版处理管道", "import src.pipeline")
+}
+
+# 不应在页面启动时加载的第三方模块
+HEAVY_MODULES = ('yaml', 'numpy', 'tqdm', 'requests', 'oss2', 'pandas')
+
+
+def child_import(target: str) -> Dict[str, Any]:
+    """在当前（新）解释器中导入目标并计时"""
+    sys.path.insert(0, ROOT)
+    sys.path.append(os.path.join(ROOT, 'src'))
+    # streamlit本身较重，先导入，只计量目标模块自身的导入开销
+    if target != 'streamlit':
+        import streamlit  # noqa: F401
+    before = set(sys.modules)
+    started = time.perf_counter()
+    exec(TARGETS[target][1], {})
+    seconds = time.perf_counter() - started
+    loaded = set(sys.modules) - before
+    return {
+        'target': target,
+        'ms': round(seconds * 1000, 2),
+        'modules': len(loaded),
+        'heavy': sorted(name for name in HEAVY_MODULES if name in loaded)
+    }
+
+
+def child_render(reruns: int) -> Dict[str, Any]:
+    """用AppTest运行页面：首次运行（含导入）和空闲重跑"""
+    from streamlit.testing.v1 import AppTest
+    # streamlit自身会加载部分模块（如numpy），只统计页面运行后新加载的
+    before = set(sys.modules)
+    app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=120)
+    started = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - started
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+    return {
+        'first_run_ms': round(first * 1000, 1),
+        'rerun_ms': round(statistics.median(timings) * 1000, 1) if timings else None,
+        'exceptions': [str(exception.value) for exception in app.exception],
+        'heavy': sorted(name for name in HEAVY_MODULES if name in sys.modules and name not in before)
+    }
+
+
+def run_child(argv: List[str]) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__)] + argv
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} 运行失败：{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def import_detail(target: str, top: int) -> List[Dict[str, Any]]:
+    """python -X importtime：目标导入过程中累计耗时最多的模块"""
+    code = (f"import sys; sys.path.insert(0, {ROOT!r}); sys.path.append({os.path.join(ROOT, 'src')!r}); "
+            f"{TARGETS[target][1]}")
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                               capture_output=True, text=True, cwd=ROOT)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(), 'self_ms': int(self_us) / 1000,
+                     'cumulative_ms': int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:top]
+
+
+def measure_target(target: str, repeat: int) -> Dict[str, Any]:
+    runs = [run_child(['--child-import', target]) for _ in range(repeat)]
+    return {
+        'target': target,
+        'description': TARGETS[target][0],
+        'ms': round(statistics.median(run['ms'] for run in runs), 2),
+        'min_ms': min(run['ms'] for run in runs),
+        'modules': runs[-1]['modules'],
+        'heavy': runs[-1]['heavy']
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="页面启动耗时基准测试")
+    parser.add_argument('--targets', default=','.join(TARGETS), help=f"导入目标，逗号分隔：{', '.join(TARGETS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="每个目标的运行次数（取中位数）")
+    parser.add_argument('--reruns', type=int, default=5, help="页面空闲重跑次数")
+    parser.add_argument('--no-render', action='store_true', help="不测量页面渲染")
+    parser.add_argument('--detail', help="对指定目标输出python -X importtime中最慢的模块")
+    parser.add_argument('--top', type=int, default=15, help="--detail输出的模块数量")
+    parser.add_argument('--max-page-ms', type=float, help="页面启动导入耗时上限（毫秒），超过时退出码为1")
+    parser.add_argument('--output', help="把结果保存为JSON")
+    # 子进程内部参数
+    parser.add_argument('--child-import', help=argparse.SUPPRESS)
+    parser.add_argument('--child-render', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child_import:
+        print(json.dumps(child_import(args.child_import), ensure_ascii=False))
+        return 0
+    if args.child_render:
+        print(json.dumps(child_render(args.reruns), ensure_ascii=False))
+        return 0
+
+    results = []
+    print(f"{'目标':<12}{'中位数ms':>10}{'最小ms':>10}{'新模块':>8}  重型模块")
+    for target in args.targets.split(','):
+        result = measure_target(target, args.repeat)
+        results.append(result)
+        print(f"{target:<12}{result['ms']:>10}{result['min_ms']:>10}{result['modules']:>8}  "
+              f"{', '.join(result['heavy']) or '-'}")
+
+    render = None
+    if not args.no_render:
+        try:
+            render = run_child(['--child-render', '--reruns', str(args.reruns)])
+        except RuntimeError as e:
+            print(f"\n⚠️ 页面渲染测量失败：{str(e)}")
+        else:
+            print(f"\n页面首次运行：{render['first_run_ms']} ms，空闲重跑（中位数）：{render['rerun_ms']} ms，"
+                  f"已加载的重型模块：{', '.join(render['heavy']) or '无'}")
+            for exception in render['exceptions']:
+                print(f"  ⚠️ 页面异常：{exception}")
+
+    detail = None
+    if args.detail:
+        detail = import_detail(args.detail, args.top)
+        print(f"\n{args.detail} 导入累计耗时最多的模块：")
+        for row in detail:
+            print(f"  {row['cumulative_ms']:>9.1f} ms  {row['self_ms']:>8.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'targets': results, 'render': render, 'detail': detail}, f, ensure_ascii=False, indent=2)
+
+    page = next((result for result in results if result['target'] == 'page'), None)
+    if page is not None and args.max_page_ms is not None:
+        failed = page['heavy'] or page['ms'] > args.max_page_ms
+        if render is not None and render['heavy']:
+            failed = True
+        if failed:
+            print(f"\n❌ 页面启动超过 {args.max_page_ms} ms 或加载了重型模块")
+            return 1
+        print(f"\n✅ 页面启动导入 {page['ms']} ms（上限 {args.max_page_ms} ms）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+并发用户压力测试
+模拟多个页面会话同时通过后台任务管理器（JobManager + run_project_job，与app.py的任务路径相同）
+提交项目并轮询状态，下载走本地模拟服务（mock_rosetta_server.py），
+测量每个会话的等待和处理耗时、进程常驻内存和CPU占用，估算单实例可承载的并发会话数
+（每个会话作为一个用户提交，调度器的排队上限和内存令牌同样生效，被拒绝的提交计为rejected）：
+
+    python benchmarks/bench_load.py --levels 1,2,4,8 --tasks 200 --frames 50
+    python benchmarks/bench_load.py --levels 4,8,16 --workers 4 --fault export:bandwidth=20MB \\
+        --latency-slo 60 --rss-limit-mb 2048 --output load.json
+
+每个并发级别在独立子进程中运行（模拟服务在父进程中），内存和CPU统计互不影响。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import threading
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_rosetta_server import MockRosettaServer, parse_fault
+from synthetic_export import add_generator_arguments, generator_kwargs
+
+
+# 生产环境默认的任务并发数（ROSETTA_JOB_WORKERS）
+DEFAULT_WORKERS = 2
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），Linux读取/proc，其他平台返回None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return round(ordered[index], 3)
+
+
+class ResourceSampler:
+    """后台线程定时采样进程的常驻内存和CPU占用"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+
+    def _run(self):
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.samples.append({
+                'rss_mb': current_rss_mb() or 0.0,
+                # 占单个核心的百分比（与top一致，多核时可超过100）
+                'cpu_percent': (cpu - last_cpu) / (wall - last_wall) * 100 if wall > last_wall else 0.0,
+                'threads': threading.active_count()
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> Dict[str, Any]:
+        rss = [sample['rss_mb'] for sample in self.samples if sample['rss_mb']]
+        cpu = [sample['cpu_percent'] for sample in self.samples]
+        return {
+            'peak_rss_mb': round(max(rss), 1) if rss else None,
+            'mean_cpu_percent': round(statistics.mean(cpu), 1) if cpu else None,
+            'peak_cpu_percent': round(max(cpu), 1) if cpu else None,
+            'peak_threads': max((sample['threads'] for sample in self.samples), default=None)
+        }
+
+
+def session_params(index: int) -> Dict[str, Any]:
+    """单个模拟会话的处理参数（各会话项目不同，不会复用任务和结果缓存）"""
+    from config import StreamlitConfig
+
+    params = StreamlitConfig().get_default_params()
+    params.update({
+        'project_id': 10000 + index,
+        'pool_ids': [1],
+        'project_name': f"压测项目{index}",
+        'username': f"load-user-{index}",
+        'password': 'load',
+        'result_cache': False,
+        'checkpoint': False
+    })
+    return params
+
+
+def run_session(manager, index: int, delay: float, poll_interval: float, timeout: float) -> Dict[str, Any]:
+    """模拟一个页面会话：提交任务后按页面刷新间隔轮询任务状态直到结束"""
+    from job_manager import JOB_COMPLETED, QueueFull
+
+    time.sleep(delay)
+    submitted = time.time()
+    try:
+        job = manager.submit(session_params(index), user=f"session-{index}")
+    except QueueFull as e:
+        return {'session': index, 'status': 'rejected', 'ok': False, 'latency_seconds': 0.0,
+                'queue_seconds': 0.0, 'run_seconds': None, 'polls': 0, 'error': str(e)}
+    polls = 0
+    while job.is_active and time.time() - submitted < timeout:
+        time.sleep(poll_interval)
+        job = manager.get(job.job_id)
+        polls += 1
+    if job.is_active:
+        manager.cancel(job.job_id)
+
+    finished = job.finished_at or time.time()
+    return {
+        'session': index,
+        'status': job.status if not job.is_active else 'timeout',
+        'ok': job.status == JOB_COMPLETED,
+        'latency_seconds': round(finished - submitted, 3),
+        'queue_seconds': round((job.started_at or finished) - job.created_at, 3),
+        'run_seconds': round(finished - job.started_at, 3) if job.started_at else None,
+        'polls': polls,
+        'error': job.error
+    }
+
+
+def run_level(sessions: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """在当前进程中以指定并发会话数运行一轮压力测试"""
+    from job_manager import JobManager
+    from project_job import run_project_job
+
+    job_root = tempfile.mkdtemp(prefix='bench_load_')
+    manager = JobManager(run_project_job, root=job_root, max_workers=args.workers or sessions)
+    results: List[Dict[str, Any]] = [None] * sessions
+
+    def worker(index: int):
+        results[index] = run_session(manager, index, index * args.ramp, args.poll_interval, args.timeout)
+
+    started = time.perf_counter()
+    try:
+        # 任务日志不计入输出
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), ResourceSampler() as sampler:
+            threads = [threading.Thread(target=worker, args=(index,)) for index in range(sessions)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        manager.scheduler.shutdown(wait=True)
+        shutil.rmtree(job_root, ignore_errors=True)
+
+    latencies = [result['latency_seconds'] for result in results if result['ok']]
+    completed = len(latencies)
+    return dict({
+        'sessions': sessions,
+        'workers': manager.max_workers,
+        'completed': completed,
+        'failed': sessions - completed,
+        'rejected': sum(result['status'] == 'rejected' for result in results),
+        'seconds': round(elapsed, 3),
+        'jobs_per_min': round(completed / elapsed * 60, 2) if elapsed else None,
+        'p50_latency_seconds': percentile(latencies, 50),
+        'p95_latency_seconds': percentile(latencies, 95),
+        'max_latency_seconds': percentile(latencies, 100),
+        'mean_queue_seconds': round(statistics.mean(result['queue_seconds'] for result in results), 3),
+        'session_results': results
+    }, **sampler.summary())
+
+
+def run_in_subprocess(sessions: int, argv: List[str], env: Dict[str, str]) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__), '--level', str(sessions)] + argv
+    completed = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ, **env))
+    if completed.returncode != 0:
+        raise RuntimeError(f"并发级别 {sessions} 运行失败：{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def sustained_level(levels: List[Dict[str, Any]], latency_slo: Optional[float],
+                    rss_limit_mb: Optional[float]) -> Optional[int]:
+    """全部会话成功、且满足延迟和内存上限的最大并发级别"""
+    sustained = None
+    for level in levels:
+        if level['failed']:
+            break
+        if latency_slo and (level['p95_latency_seconds'] or 0) > latency_slo:
+            break
+        if rss_limit_mb and (level['peak_rss_mb'] or 0) > rss_limit_mb:
+            break
+        sustained = level['sessions']
+    return sustained
+
+
+def print_table(levels: List[Dict[str, Any]]):
+    header = (f"{'会话':>6}{'并发':>6}{'成功':>6}{'秒':>9}{'任务/分':>9}{'P50':>9}{'P95':>9}"
+              f"{'平均排队':>10}{'峰值RSS':>10}{'CPU%':>8}{'峰值CPU%':>10}")
+    print(header)
+    print('-' * (len(header) + 8))
+    for level in levels:
+        print(f"{level['sessions']:>6}{level['workers']:>6}{level['completed']:>6}{level['seconds']:>9}"
+              f"{level['jobs_per_min'] or '-':>9}{level['p50_latency_seconds'] or '-':>9}"
+              f"{level['p95_latency_seconds'] or '-':>9}{level['mean_queue_seconds']:>10}"
+              f"{level['peak_rss_mb'] or '-':>10}{level['mean_cpu_percent'] or '-':>8}"
+              f"{level['peak_cpu_percent'] or '-':>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="并发用户压力测试（本地模拟服务）")
+    parser.add_argument('--levels', default='1,2,4,8', help="并发会话数，逗号分隔，按从小到大运行")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="任务管理器的并发任务数（ROSETTA_JOB_WORKERS），0表示与会话数相同")
+    parser.add_argument('--tasks', type=int, default=200, help="每个项目导出数据的任务数")
+    add_generator_arguments(parser)
+    parser.add_argument('--fault', action='append', default=[],
+                        help="模拟服务的故障配置，格式 接口:键=值[,键=值]，可重复")
+    parser.add_argument('--ramp', type=float, default=0.0, help="相邻会话的提交间隔（秒）")
+    parser.add_argument('--poll-interval', type=float, default=0.5, help="会话轮询任务状态的间隔（秒）")
+    parser.add_argument('--timeout', type=float, default=600, help="单个会话的超时时间（秒）")
+    parser.add_argument('--latency-slo', type=float, help="可接受的P95耗时（秒），用于估算承载能力")
+    parser.add_argument('--rss-limit-mb', type=float, help="可接受的峰值内存（MB），用于估算承载能力")
+    parser.add_argument('--output', help="把结果保存为JSON")
+    # 子进程内部参数
+    parser.add_argument('--level', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.level:
+        print(json.dumps(run_level(args.level, args), ensure_ascii=False))
+        return 0
+
+    faults: Dict[str, Dict[str, Any]] = {}
+    for spec in args.fault:
+        for endpoint, fault in parse_fault(spec).items():
+            faults.setdefault(endpoint, {}).update(fault)
+
+    child_argv = ['--workers', str(args.workers), '--ramp', str(args.ramp),
+                  '--poll-interval', str(args.poll_interval), '--timeout', str(args.timeout)]
+
+    levels = []
+    with MockRosettaServer(tasks=args.tasks, generator=generator_kwargs(args), faults=faults) as server:
+        export_mb = len(server.export_data(10000)) / 1024 / 1024
+        print(f"模拟服务：{server.url}，每个项目导出压缩包 {export_mb:.1f} MB，"
+              f"任务并发数 {args.workers or '与会话数相同'}")
+        for sessions in sorted(int(level) for level in args.levels.split(',')):
+            level = run_in_subprocess(sessions, child_argv, server.client_env())
+            levels.append(level)
+            print(f"  {sessions} 个会话：成功 {level['completed']}/{sessions}，P95 {level['p95_latency_seconds']} 秒，"
+                  f"峰值内存 {level['peak_rss_mb']} MB")
+
+    print()
+    print_table(levels)
+    sustained = sustained_level(levels, args.latency_slo, args.rss_limit_mb)
+    print(f"\n单实例可承载的并发会话数：{sustained if sustained is not None else '无（最小级别即未达标）'}"
+          f"（任务并发数 {args.workers or '与会话数相同'}；条件：全部成功"
+          f"{f'，P95 ≤ {args.latency_slo} 秒' if args.latency_slo else ''}"
+          f"{f'，峰值内存 ≤ {args.rss_limit_mb} MB' if args.rss_limit_mb else ''}）")
+    for level in levels:
+        errors = {result['error'] for result in level['session_results'] if result['error']}
+        for error in errors:
+            print(f"  ⚠️ {level['sessions']} 个会话时失败：{error}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'cpu_count': os.cpu_count(), 'export_mb': round(export_mb, 2),
+                       'workers': args.workers, 'sustained_sessions': sustained, 'levels': levels},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+拆帧吞吐量基准测试
+用合成导出数据测量 FrameSplitter.split_frames、MemoryFrameExtractor.extract_frames_from_memory
+和 create_zip_archive_in_memory 在不同数据规模下的 帧/秒、MB/秒 和峰值内存，用于发现性能回退：
+
+    python benchmarks/bench_split.py --sizes small,medium --format jsonl --output results.json
+    python benchmarks/bench_split.py --baseline results.json   # 吞吐量低于基线超过容差时退出码为1
+
+每个用例在独立子进程中运行，峰值内存（ru_maxrss）互不影响。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_export import (generate_export, sequence_frame_count, write_export_dir,
+                              add_generator_arguments, generator_kwargs)
+
+
+TARGETS = ('split_frames', 'extract_frames_from_memory', 'create_zip_archive_in_memory')
+
+# 规模预设：(任务数, 每任务帧数)
+SIZES = {
+    'small': (50, 20),
+    'medium': (200, 50),
+    'large': (500, 100)
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def output_config(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        'format': args.format,
+        'shard_by': args.shard_by,
+        'max_shard_mb': args.max_shard_mb,
+        'shared_context': args.shared_context
+    }
+
+
+def run_case(target: str, tasks: int, frames: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """在当前进程中运行单个用例
+
+    Returns:
+        Dict[str, Any]: 用例结果（耗时、帧/秒、MB/秒、峰值内存）
+    """
+    kwargs = generator_kwargs(args)
+    kwargs['frames'] = frames
+    files = generate_export(tasks, **kwargs)
+    frame_count = sequence_frame_count(files)
+    input_bytes = sum(len(content) for content in files.values())
+    baseline_rss = peak_rss_mb()
+    config = {'frame_extraction': {'enabled': True, 'output': output_config(args),
+                                   'partition_annotations': args.partition_annotations}}
+
+    # 拆帧过程中的逐文件日志和进度条不计入输出
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        if target == 'split_frames':
+            from src.frame_splitter import FrameSplitter
+            project_path = write_export_dir(files, tempfile.mkdtemp(prefix='bench_split_'))
+            del files
+            splitter = FrameSplitter(config['frame_extraction']['output'], args.partition_annotations)
+            try:
+                started = time.perf_counter()
+                splitter.split_frames(project_path)
+                elapsed = time.perf_counter() - started
+            finally:
+                shutil.rmtree(project_path, ignore_errors=True)
+        elif target == 'extract_frames_from_memory':
+            from memory_client import MemoryFrameExtractor
+            extractor = MemoryFrameExtractor(config)
+            started = time.perf_counter()
+            extractor.extract_frames_from_memory(files)
+            elapsed = time.perf_counter() - started
+        elif target == 'create_zip_archive_in_memory':
+            from memory_client import MemoryFrameExtractor
+            from utils import create_zip_archive_in_memory
+            # 打包输入为拆帧结果（不计时）
+            split_files = MemoryFrameExtractor(config).extract_frames_from_memory(files)
+            del files
+            input_bytes = sum(len(content) for content in split_files.values())
+            started = time.perf_counter()
+            create_zip_archive_in_memory(split_files, frame_index=True)
+            elapsed = time.perf_counter() - started
+        else:
+            raise ValueError(f"未知的测试目标：{target}")
+
+    return {
+        'target': target,
+        'tasks': tasks,
+        'frames': frame_count,
+        'input_mb': round(input_bytes / 1024 / 1024, 2),
+        'seconds': round(elapsed, 4),
+        'frames_per_s': round(frame_count / elapsed, 1) if elapsed else None,
+        'mb_per_s': round(input_bytes / 1024 / 1024 / elapsed, 2) if elapsed else None,
+        'baseline_rss_mb': round(baseline_rss, 1) if baseline_rss is not None else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1) if baseline_rss is not None else None
+    }
+
+
+def case_key(case: Dict[str, Any]) -> str:
+    return f"{case['target']}/{case['size']}/{case['format']}"
+
+
+def run_in_subprocess(target: str, size: str, argv: List[str]) -> Dict[str, Any]:
+    tasks, frames = SIZES[size]
+    command = [sys.executable, os.path.abspath(__file__), '--case', target,
+               '--tasks', str(tasks), '--case-frames', str(frames)] + argv
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"用例 {target}/{size} 运行失败：{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回吞吐量下降超过容差的用例说明"""
+    previous = {case_key(case): case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results:
+        old = previous.get(case_key(case))
+        if not old or not old.get('frames_per_s') or not case.get('frames_per_s'):
+            continue
+        ratio = case['frames_per_s'] / old['frames_per_s']
+        case['vs_baseline'] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append(f"{case_key(case)}：{old['frames_per_s']} → {case['frames_per_s']} 帧/秒"
+                               f"（{(1 - ratio) * 100:.0f}%）")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'用例':<48}{'帧数':>9}{'输入MB':>9}{'秒':>9}{'帧/秒':>11}{'MB/秒':>9}{'峰值RSS':>10}"
+    print(header)
+    print('-' * len(header))
+    for case in results:
+        line = (f"{case_key(case):<48}{case['frames']:>9}{case['input_mb']:>9}{case['seconds']:>9}"
+                f"{case['frames_per_s']:>11}{case['mb_per_s']:>9}{case['peak_rss_mb'] or '-':>10}")
+        if 'vs_baseline' in case:
+            line += f"  ×{case['vs_baseline']}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="拆帧吞吐量基准测试")
+    parser.add_argument('--sizes', default='small,medium', help=f"数据规模，逗号分隔：{','.join(SIZES)}")
+    parser.add_argument('--targets', default=','.join(TARGETS), help="测试目标，逗号分隔")
+    parser.add_argument('--format', default='per_frame', choices=['per_frame', 'jsonl'], help="拆帧输出格式")
+    parser.add_argument('--shard-by', default='size', choices=['size', 'task'], help="JSONL分片方式")
+    parser.add_argument('--max-shard-mb', type=float, default=64, help="JSONL分片大小上限（MB）")
+    parser.add_argument('--shared-context', action='store_true', help="启用共享上下文")
+    parser.add_argument('--partition-annotations', action='store_true', help="标注按帧分配")
+    add_generator_arguments(parser)
+    parser.add_argument('--output', help="把结果保存为JSON（可作为之后的基线）")
+    parser.add_argument('--baseline', help="基线结果JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许的吞吐量下降比例")
+    # 子进程内部参数
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--tasks', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--case-frames', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.tasks, args.case_frames, args)))
+        return 0
+
+    # 传给子进程的输出和生成参数
+    child_argv = ['--format', args.format, '--shard-by', args.shard_by, '--max-shard-mb', str(args.max_shard_mb),
+                  '--attachment-types', args.attachment_types, '--annotations', str(args.annotations),
+                  '--metadata-bytes', str(args.metadata_bytes), '--payload-files', str(args.payload_files),
+                  '--payload-bytes', str(args.payload_bytes), '--seed', str(args.seed)]
+    if args.shared_context:
+        child_argv.append('--shared-context')
+    if args.partition_annotations:
+        child_argv.append('--partition-annotations')
+
+    results = []
+    for size in args.sizes.split(','):
+        for target in args.targets.split(','):
+            case = run_in_subprocess(target, size, child_argv)
+            case.update(size=size, format=args.format)
+            results.append(case)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'cases': results}, f, ensure_ascii=False, indent=2)
+    if regressions:
+        print("\n⚠️ 性能回退：")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
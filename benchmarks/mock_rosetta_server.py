@@ -0,0 +1,305 @@
+"""
+本地模拟Rosetta/OSS服务
+模拟登录、标准导出（doneTask/export）、大文件导出记录（backDoor/queryProjectExportLog）接口
+和OSS对象下载（路径风格：/<bucket>/<key>），可注入延迟、带宽上限、504和超时，
+用于离线、可复现地测量下载、故障转移和流式读取：
+
+    python benchmarks/mock_rosetta_server.py --port 8900 --tasks 200 --frames 50 \\
+        --fault export:error_rate=1 --fault oss:bandwidth=20MB
+
+    ROSETTA_BASE_URL=http://127.0.0.1:8900 ROSETTA_OSS_ENDPOINT=http://127.0.0.1:8900 \\
+    ROSETTA_OSS_ACCESS_KEY=mock ROSETTA_OSS_SECRET_KEY=mock python cli.py job.yaml
+
+运行中可通过 POST /_mock/faults 修改故障配置，GET /_mock/stats 查看各接口请求次数。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_export import generate_export, build_export_zip, add_generator_arguments, generator_kwargs
+
+
+ENDPOINTS = ('login', 'export', 'query', 'oss')
+OSS_BUCKET = 'rosetta-data'
+
+# 单个接口的故障配置项及默认值
+DEFAULT_FAULT = {
+    'latency': 0.0,       # 返回响应头前的延迟（秒）
+    'bandwidth': 0,       # 响应体带宽上限（字节/秒），0表示不限制
+    'error_rate': 0.0,    # 返回错误状态码的概率
+    'error_status': 504,  # 错误状态码
+    'fail_first': 0,      # 前N次请求返回错误状态码
+    'hang_rate': 0.0,     # 挂起（不返回响应）的概率，用于触发客户端超时
+    'hang': 120.0,        # 挂起时长（秒）
+    'empty': False        # 返回空压缩包（仅export/oss）
+}
+
+_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def _parse_value(key: str, value: str) -> Any:
+    if key == 'bandwidth':
+        for suffix, scale in _UNITS.items():
+            if value.upper().endswith(suffix):
+                return int(float(value[:-len(suffix)]) * scale)
+        return int(float(value))
+    if key == 'empty':
+        return value.lower() in ('1', 'true', 'yes')
+    return type(DEFAULT_FAULT[key])(float(value))
+
+
+def parse_fault(spec: str) -> Dict[str, Dict[str, Any]]:
+    """解析故障配置，格式：接口:键=值[,键=值]，如 export:error_rate=1 或 oss:bandwidth=20MB,latency=0.1"""
+    endpoint, _, settings = spec.partition(':')
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"未知接口：{endpoint}（可选：{', '.join(ENDPOINTS)}）")
+    fault = {}
+    for item in settings.split(','):
+        key, _, value = item.partition('=')
+        if key not in DEFAULT_FAULT:
+            raise ValueError(f"未知故障配置：{key}")
+        fault[key] = _parse_value(key, value)
+    return {endpoint: fault}
+
+
+class MockRosettaServer:
+    """模拟服务（可在进程内启动，供基准测试直接使用）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, tasks: int = 50,
+                 generator: Optional[Dict[str, Any]] = None, export_path: Optional[str] = None,
+                 faults: Optional[Dict[str, Dict[str, Any]]] = None, seed: int = 0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            tasks: 每个项目生成的任务数
+            generator: 合成数据生成参数（synthetic_export.generate_export的参数）
+            export_path: 使用已有的导出压缩包代替合成数据
+            faults: 各接口的故障配置
+            seed: 故障注入的随机种子
+        """
+        self.tasks = tasks
+        self.generator = generator or {}
+        self.export_path = export_path
+        self.faults = {endpoint: dict(DEFAULT_FAULT) for endpoint in ENDPOINTS}
+        self.set_faults(faults or {})
+        self.random = random.Random(seed)
+        self.stats: Dict[str, Dict[str, int]] = {endpoint: {} for endpoint in ENDPOINTS}
+        self._exports: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_faults(self, faults: Dict[str, Dict[str, Any]]):
+        """更新故障配置（未给出的接口和配置项保持不变）"""
+        for endpoint, fault in faults.items():
+            self.faults[endpoint].update(fault)
+
+    def reset(self):
+        """恢复默认故障配置并清空统计"""
+        with self._lock:
+            self.faults = {endpoint: dict(DEFAULT_FAULT) for endpoint in ENDPOINTS}
+            self.stats = {endpoint: {} for endpoint in ENDPOINTS}
+
+    def export_data(self, project_id: Any) -> bytes:
+        """项目的导出压缩包（合成数据按项目ID生成并缓存）"""
+        key = str(project_id)
+        with self._lock:
+            if key not in self._exports:
+                if self.export_path:
+                    with open(self.export_path, 'rb') as f:
+                        self._exports[key] = f.read()
+                else:
+                    kwargs = dict(self.generator, seed=int(key) if key.isdigit() else 0)
+                    self._exports[key] = build_export_zip(generate_export(self.tasks, **kwargs))
+            return self._exports[key]
+
+    def _count(self, endpoint: str, outcome: str) -> int:
+        with self._lock:
+            counts = self.stats[endpoint]
+            counts[outcome] = counts.get(outcome, 0) + 1
+            return sum(counts.values())
+
+    def _decide(self, endpoint: str) -> str:
+        """按故障配置决定本次请求的结果：ok / error / hang"""
+        fault = self.faults[endpoint]
+        with self._lock:
+            seen = sum(self.stats[endpoint].values())
+            roll = self.random.random()
+        if seen < fault['fail_first'] or roll < fault['error_rate']:
+            return 'error'
+        if roll < fault['error_rate'] + fault['hang_rate']:
+            return 'hang'
+        return 'ok'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_json(self) -> Dict[str, Any]:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                try:
+                    return json.loads(body) if body else {}
+                except ValueError:
+                    return {}
+
+            def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+                      bandwidth: int = 0):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not bandwidth:
+                    self.wfile.write(body)
+                    return
+                # 按带宽上限分块发送
+                chunk_size = max(bandwidth // 20, 1024)
+                started = time.perf_counter()
+                for offset in range(0, len(body), chunk_size):
+                    self.wfile.write(body[offset:offset + chunk_size])
+                    delay = (offset + chunk_size) / bandwidth - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+            def _send_json(self, data: Dict[str, Any], status: int = 200):
+                self._send(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+            def _handle(self, endpoint: str, respond):
+                fault = server.faults[endpoint]
+                outcome = server._decide(endpoint)
+                server._count(endpoint, outcome)
+                if fault['latency']:
+                    time.sleep(fault['latency'])
+                if outcome == 'hang':
+                    time.sleep(fault['hang'])
+                    self.close_connection = True
+                    return
+                if outcome == 'error':
+                    self._send(fault['error_status'], b'<html><body>504 Gateway Time-out</body></html>',
+                               'text/html')
+                    return
+                respond(fault)
+
+            def _export_body(self, project_id: Any, fault: Dict[str, Any]) -> bytes:
+                return build_export_zip({}) if fault['empty'] else server.export_data(project_id)
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                data = self._read_json()
+                if path == '/rosetta-service/user/login':
+                    self._handle('login', lambda fault: self._send_json(
+                        {'code': 200, 'data': {'tokenValue': f"mock-token-{data.get('username')}"}}))
+                elif path == '/rosetta-service/project/doneTask/export':
+                    self._handle('export', lambda fault: self._send(
+                        200, self._export_body(data.get('projectId'), fault), 'application/octet-stream',
+                        fault['bandwidth']))
+                elif path == '/rosetta-service/backDoor/queryProjectExportLog':
+                    self._handle('query', lambda fault: self._send_json({'code': 200, 'data': [{
+                        'zipFileName': f"oss://{OSS_BUCKET}/exports/{data.get('projectId')}/export.zip",
+                        'fileSize': len(server.export_data(data.get('projectId')))
+                    }]}))
+                elif path == '/_mock/faults':
+                    server.set_faults(data)
+                    self._send_json({'faults': server.faults})
+                elif path == '/_mock/reset':
+                    server.reset()
+                    self._send_json({'faults': server.faults})
+                else:
+                    self._send_json({'message': f"未知接口：{path}"}, 404)
+
+            def do_GET(self):
+                # OSS SDK会对对象键中的/编码
+                path = unquote(self.path.split('?')[0])
+                prefix = f"/{OSS_BUCKET}/exports/"
+                if path.startswith(prefix):
+                    project_id = path[len(prefix):].split('/')[0]
+                    self._handle('oss', lambda fault: self._send(
+                        200, self._export_body(project_id, fault), 'application/zip', fault['bandwidth']))
+                elif path == '/_mock/stats':
+                    self._send_json({'stats': server.stats, 'faults': server.faults})
+                else:
+                    self._send_json({'message': f"未知对象：{path}"}, 404)
+
+            do_HEAD = do_GET
+
+        return Handler
+
+    def start(self) -> 'MockRosettaServer':
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-rosetta', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def client_env(self) -> Dict[str, str]:
+        """让客户端连接本服务所需的环境变量"""
+        return {
+            'ROSETTA_BASE_URL': self.url,
+            'ROSETTA_DEV_BASE_URL': self.url,
+            'ROSETTA_OSS_ENDPOINT': self.url,
+            'ROSETTA_OSS_ACCESS_KEY': 'mock-access-key',
+            'ROSETTA_OSS_SECRET_KEY': 'mock-secret-key'
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="本地模拟Rosetta/OSS服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--tasks', type=int, default=50, help="每个项目的任务数")
+    add_generator_arguments(parser)
+    parser.add_argument('--export', help="使用已有的导出压缩包代替合成数据")
+    parser.add_argument('--fault', action='append', default=[],
+                        help="故障配置，格式 接口:键=值[,键=值]，接口为login/export/query/oss，可重复")
+    args = parser.parse_args(argv)
+
+    faults: Dict[str, Dict[str, Any]] = {}
+    for spec in args.fault:
+        for endpoint, fault in parse_fault(spec).items():
+            faults.setdefault(endpoint, {}).update(fault)
+
+    server = MockRosettaServer(args.host, args.port, args.tasks, generator_kwargs(args), args.export, faults)
+    print(f"模拟服务已启动：{server.url}")
+    for key, value in server.client_env().items():
+        print(f"  export {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+合成Rosetta导出数据
+按任务数、每任务帧数、附件类型、标注数量、元数据大小和非JSON附件生成与真实任务导出结构一致的数据，
+用于拆帧性能基准测试和离线调试：
+
+    python benchmarks/synthetic_export.py --tasks 200 --frames 50 -o export.zip
+"""
+
+import os
+import io
+import json
+import random
+import zipfile
+import argparse
+from typing import Dict, Any, List, Optional, Sequence
+
+
+SEQUENCE_TYPES = ("IMAGE_SEQUENCE", "IMAGE_SET_SEQUENCE", "POINTCLOUD_SEQUENCE", "POINTCLOUD_SET_SEQUENCE")
+
+# 各附件类型的单帧附件结构
+_CAMERAS = ('front', 'left', 'right', 'back')
+
+
+def _attachment(attachment_type: str, task_id: int, frame: int, rng: random.Random) -> Any:
+    base = f"oss://rosetta-data/synthetic/{task_id}/{frame:06d}"
+    if attachment_type.startswith('POINTCLOUD'):
+        item = {
+            'url': f"{base}.pcd",
+            'pose': {'position': [rng.uniform(-50, 50) for _ in range(3)],
+                     'heading': [rng.uniform(-1, 1) for _ in range(4)]}
+        }
+        if attachment_type == 'POINTCLOUD_SET_SEQUENCE':
+            item['images'] = [{'url': f"{base}_{camera}.jpg", 'camera': camera} for camera in _CAMERAS]
+        return item
+    if attachment_type == 'IMAGE_SET_SEQUENCE':
+        return [{'url': f"{base}_{camera}.jpg", 'camera': camera} for camera in _CAMERAS]
+    return {'url': f"{base}.jpg", 'width': 1920, 'height': 1080}
+
+
+def _annotation(index: int, frames: int, rng: random.Random) -> Dict[str, Any]:
+    """一条贯穿多帧的标注（轨迹），每帧一个slot；部分为分组和标签类型"""
+    kind = index % 10
+    if kind == 8:
+        return {
+            'id': f"group-{index}", 'type': 'group', 'key': 'group',
+            'slotsChildren': [
+                {'slot': {'frameIndex': frame}, 'children': [{'id': f"child-{index}-{frame}", 'type': 'point'}]}
+                for frame in range(0, frames, 2)
+            ]
+        }
+    if kind == 9:
+        return {'id': f"tag-{index}", 'type': 'tag', 'key': 'weather', 'label': 'sunny', 'color': '#00ff00'}
+    start = rng.randrange(frames)
+    return {
+        'id': f"box-{index}", 'type': 'box3d', 'key': rng.choice(['car', 'pedestrian', 'cyclist', 'truck']),
+        'slots': [
+            {
+                'id': f"slot-{index}-{frame}",
+                'frameIndex': frame,
+                'center': [round(rng.uniform(-50, 50), 3) for _ in range(3)],
+                'size': [round(rng.uniform(0.5, 5), 3) for _ in range(3)],
+                'rotation': [0, 0, round(rng.uniform(-3.14, 3.14), 3)],
+                'attributes': {'occluded': rng.random() < 0.2, 'truncated': rng.random() < 0.1}
+            }
+            for frame in range(start, min(frames, start + rng.randint(1, frames)))
+        ]
+    }
+
+
+def generate_task(task_id: int, frames: int, attachment_type: str = 'IMAGE_SEQUENCE',
+                  annotations: int = 20, metadata_bytes: int = 1024,
+                  rng: Optional[random.Random] = None, pool_id: int = 1, status: int = 1) -> Dict[str, Any]:
+    """生成单个任务的导出文档
+
+    Args:
+        task_id: 任务ID
+        frames: 帧数（附件数）
+        attachment_type: 附件类型
+        annotations: 标注条目数
+        metadata_bytes: record.metadata的大致大小（字节）
+        rng: 随机数生成器
+        pool_id: 池子ID
+        status: 任务状态
+
+    Returns:
+        Dict[str, Any]: 任务文档
+    """
+    rng = rng or random.Random(task_id)
+    return {
+        'projectId': 9000,
+        'datasetId': 100 + task_id % 7,
+        'poolId': pool_id,
+        'taskId': task_id,
+        'status': status,
+        'taskParams': {
+            'record': {
+                'attachmentType': attachment_type,
+                'attachment': [_attachment(attachment_type, task_id, frame, rng) for frame in range(frames)],
+                'metadata': {'scene': f"scene-{task_id}", 'notes': 'x' * metadata_bytes}
+            },
+            'operators': [{'id': rng.randint(1, 500), 'role': 'annotator'}, {'id': rng.randint(1, 500), 'role': 'checker'}]
+        },
+        'result': {
+            'annotations': [_annotation(index, frames, rng) for index in range(annotations)],
+            'hints': [],
+            'metadata': {'duration': rng.randint(60, 3600)}
+        }
+    }
+
+
+def generate_export(tasks: int = 100, frames: int = 50,
+                    attachment_types: Sequence[str] = ('IMAGE_SEQUENCE',),
+                    annotations: int = 20, metadata_bytes: int = 1024,
+                    payload_files: int = 0, payload_bytes: int = 64 * 1024,
+                    pools: int = 2, seed: int = 0) -> Dict[str, bytes]:
+    """生成导出数据（解压后的文件映射）
+
+    Args:
+        tasks: 任务数
+        frames: 每个任务的帧数
+        attachment_types: 附件类型，按任务轮流使用（可包含非序列类型如IMAGE）
+        annotations: 每个任务的标注条目数
+        metadata_bytes: 每个任务record.metadata的大致大小（字节）
+        payload_files: 非JSON附件文件数（如点云、图片），测试拆帧对非JSON文件的处理
+        payload_bytes: 每个非JSON附件的大小（字节）
+        pools: 池子数，任务按池子分目录
+        seed: 随机种子，相同参数生成相同数据
+
+    Returns:
+        Dict[str, bytes]: 文件路径到内容的映射
+    """
+    rng = random.Random(seed)
+    files: Dict[str, bytes] = {}
+    for index in range(tasks):
+        task_id = 100000 + index
+        pool_id = 70000 + index % pools
+        task = generate_task(task_id, frames, attachment_types[index % len(attachment_types)],
+                             annotations, metadata_bytes, rng, pool_id, status=index % 3)
+        files[f"export/{pool_id}/{task_id}.json"] = json.dumps(task, ensure_ascii=False).encode('utf-8')
+    for index in range(payload_files):
+        files[f"export/assets/payload_{index:05d}.bin"] = rng.randbytes(payload_bytes) \
+            if hasattr(rng, 'randbytes') else os.urandom(payload_bytes)
+    files['export/README.txt'] = "合成导出数据，仅用于基准测试".encode('utf-8')
+    return files
+
+
+def sequence_frame_count(files: Dict[str, bytes]) -> int:
+    """导出数据中序列任务的总帧数（拆帧后应输出的帧数）"""
+    total = 0
+    for name, content in files.items():
+        if name.endswith('.json'):
+            record = json.loads(content).get('taskParams', {}).get('record', {})
+            if record.get('attachmentType') in SEQUENCE_TYPES:
+                total += len(record.get('attachment', []))
+    return total
+
+
+def build_export_zip(files: Dict[str, bytes]) -> bytes:
+    """把导出数据打包为ZIP（与平台导出压缩包结构相同）"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in files.items():
+            zip_file.writestr(name, content)
+    return buffer.getvalue()
+
+
+def write_export_dir(files: Dict[str, bytes], root: str) -> str:
+    """把导出数据写入目录（文件版管道的解压结果）
+
+    Returns:
+        str: 目录路径
+    """
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+    return root
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser):
+    """添加生成参数（供基准测试脚本复用）"""
+    parser.add_argument('--frames', type=int, default=50, help="每个任务的帧数")
+    parser.add_argument('--attachment-types', default='IMAGE_SEQUENCE',
+                        help="附件类型，逗号分隔，按任务轮流使用")
+    parser.add_argument('--annotations', type=int, default=20, help="每个任务的标注条目数")
+    parser.add_argument('--metadata-bytes', type=int, default=1024, help="每个任务元数据大小（字节）")
+    parser.add_argument('--payload-files', type=int, default=0, help="非JSON附件文件数")
+    parser.add_argument('--payload-bytes', type=int, default=64 * 1024, help="每个非JSON附件大小（字节）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+
+
+def generator_kwargs(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        'frames': args.frames,
+        'attachment_types': args.attachment_types.split(','),
+        'annotations': args.annotations,
+        'metadata_bytes': args.metadata_bytes,
+        'payload_files': args.payload_files,
+        'payload_bytes': args.payload_bytes,
+        'seed': args.seed
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="生成合成Rosetta导出数据")
+    parser.add_argument('--tasks', type=int, default=100, help="任务数")
+    add_generator_arguments(parser)
+    parser.add_argument('-o', '--output', required=True, help="输出路径：以.zip结尾时生成压缩包，否则写入目录")
+    args = parser.parse_args(argv)
+
+    files = generate_export(args.tasks, **generator_kwargs(args))
+    if args.output.endswith('.zip'):
+        with open(args.output, 'wb') as f:
+            f.write(build_export_zip(files))
+    else:
+        write_export_dir(files, args.output)
+    size = sum(len(content) for content in files.values())
+    print(f"已生成 {args.tasks} 个任务、{sequence_frame_count(files)} 帧（{size / 1024 / 1024:.1f} MB）：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Rosetta数据下载与拆帧工具 - 命令行版本
+不依赖Streamlit运行单项目或多项目任务，适用于定时任务和工作节点：
+
+    python cli.py job.yaml --credentials credentials.yaml --output-dir results
+
+任务文件（YAML或JSON）使用与界面相同的参数名，多项目时在projects中列出各项目；
+进度日志输出到标准错误，结束时在标准输出打印一行JSON状态，退出码表示整体结果。
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+from contextlib import redirect_stdout
+from typing import Dict, Any, List, Optional, Tuple
+
+import yaml
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from config import StreamlitConfig
+from utils import validate_inputs
+from credentials import CREDENTIALS_FILE_ENV, get_rosetta_credentials
+from cancellation import CancellationToken, OperationCancelled
+
+
+# 退出码
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INVALID = 2
+EXIT_CANCELLED = 130
+
+# 任务文件中不属于处理参数的键
+JOB_KEYS = ('projects', 'output_dir')
+
+
+class InvalidJob(ValueError):
+    """任务文件或凭据无效"""
+
+
+def load_job_file(path: str) -> Dict[str, Any]:
+    """读取任务文件（YAML或JSON）
+
+    Args:
+        path: 任务文件路径
+
+    Returns:
+        Dict[str, Any]: 任务配置
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            job = json.load(f) if path.endswith('.json') else yaml.safe_load(f)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        raise InvalidJob(f"无法读取任务文件 {path}：{str(e)}")
+    if not isinstance(job, dict):
+        raise InvalidJob(f"任务文件格式错误：{path}")
+    return job
+
+
+def build_job(job: Dict[str, Any], args: argparse.Namespace) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """合并默认参数、任务文件、命令行选项和凭据
+
+    Args:
+        job: 任务文件内容
+        args: 命令行参数
+
+    Returns:
+        Tuple[Dict[str, Any], List[Dict[str, Any]]]: 处理参数和项目列表
+    """
+    params = StreamlitConfig().get_default_params()
+    params.update({key: value for key, value in job.items() if key not in JOB_KEYS})
+    if args.max_workers is not None:
+        params['max_workers'] = args.max_workers
+    if args.pipelined:
+        params['pipelined'] = True
+    if args.test_mode:
+        params['test_mode'] = True
+
+    # 账号优先使用任务文件，其次环境变量和凭据文件
+    if 'username' not in job or 'password' not in job:
+        try:
+            credentials = get_rosetta_credentials()
+        except (OSError, yaml.YAMLError) as e:
+            raise InvalidJob(f"无法读取凭据文件：{str(e)}")
+        if credentials is None and not params.get('test_mode'):
+            raise InvalidJob("未找到Rosetta账号：请设置环境变量 ROSETTA_USERNAME/ROSETTA_PASSWORD，"
+                             "或在凭据文件的rosetta_credentials段中配置")
+        params.update(credentials or {})
+
+    projects = job.get('projects') or [{
+        'project_id': params.get('project_id'),
+        'pool_ids': params.get('pool_ids'),
+        'project_name': params.get('project_name')
+    }]
+    for project in projects:
+        if not isinstance(project, dict):
+            raise InvalidJob(f"项目格式错误：{project}")
+        error = validate_inputs(str(project.get('project_id') or ''), project.get('pool_ids') or [],
+                                params['username'], params['password'])
+        if error:
+            raise InvalidJob(f"项目 {project.get('project_id')}：{error}")
+        project.setdefault('project_name', f"项目{project.get('project_id')}")
+
+    # 单项目参数取第一个项目，其余项目由批处理覆盖
+    params.update(projects[0])
+    return params, projects
+
+
+def save_result(result: Dict[str, Any], output_dir: str) -> Optional[str]:
+    """把结果压缩包写入输出目录
+
+    Returns:
+        Optional[str]: 结果文件路径，没有压缩包时返回None
+    """
+    zip_data = result.pop('zip_data', None)
+    if zip_data is None:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"project_{result['project_id']}_results.zip")
+    with open(path, 'wb') as f:
+        f.write(zip_data)
+    return path
+
+
+def project_status(result: Dict[str, Any], output_path: Optional[str]) -> Dict[str, Any]:
+    """单个项目的机器可读状态"""
+    return {
+        'project_id': str(result.get('project_id')),
+        'status': result.get('status'),
+        'ok': str(result.get('status', '')).startswith('completed'),
+        'message': result.get('message'),
+        'output': output_path,
+        'size_bytes': os.path.getsize(output_path) if output_path else None,
+        'cache_hit': result.get('cache_hit', False),
+        'metrics': result.get('metrics')
+    }
+
+
+def run_single(params: Dict[str, Any], output_dir: str, cancel_token: CancellationToken) -> List[Dict[str, Any]]:
+    """处理单个项目，进度逐行输出"""
+    from project_job import run_project_job
+
+    def report(percent, message):
+        print(f"[{percent:3d}%] {message}", flush=True)
+
+    result = run_project_job(params, report, cancel_token)
+    result.pop('manifest', None)
+    return [project_status(result, save_result(result, output_dir))]
+
+
+def run_batch(params: Dict[str, Any], projects: List[Dict[str, Any]], output_dir: str,
+              cancel_token: CancellationToken) -> List[Dict[str, Any]]:
+    """并发或流水线处理多个项目，各项目打包完成后立即写入输出目录，取消时所有项目停止"""
+    from memory_pipeline import MemoryExtractionPipeline
+
+    config = StreamlitConfig().create_memory_config(params)
+    pipeline = MemoryExtractionPipeline(config, batch_only=True)
+    results = pipeline.process_multiple_projects(projects, cancel_token=cancel_token,
+                                                 on_result=lambda result: save_result(result, output_dir))
+    return [project_status(result, result.get('output')) for result in results]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rosetta数据下载与拆帧（命令行版）")
+    parser.add_argument('job_file', help="任务文件（YAML或JSON）")
+    parser.add_argument('--credentials', help=f"凭据文件（YAML或JSON），默认读取环境变量 {CREDENTIALS_FILE_ENV}")
+    parser.add_argument('--output-dir', help="结果压缩包输出目录，默认为任务文件中的output_dir或当前目录")
+    parser.add_argument('--max-workers', type=int, help="多项目并发数（覆盖任务文件中的max_workers）")
+    parser.add_argument('--pipelined', action='store_true', help="多项目使用流水线模式（下载/解压/拆帧/打包并行）")
+    parser.add_argument('--test-mode', action='store_true', help="测试模式，不下载数据")
+    parser.add_argument('--status-file', help="同时把JSON状态写入该文件")
+    args = parser.parse_args(argv)
+
+    if args.credentials:
+        os.environ[CREDENTIALS_FILE_ENV] = args.credentials
+
+    # 收到SIGTERM时与Ctrl+C一样协作式取消
+    cancel_token = CancellationToken()
+    signal.signal(signal.SIGTERM, lambda signum, frame: cancel_token.cancel())
+
+    started = time.time()
+    summary: Dict[str, Any] = {'status': 'failed', 'projects': []}
+    exit_code = EXIT_FAILED
+
+    # 处理日志输出到标准错误，标准输出只保留最终的JSON状态
+    with redirect_stdout(sys.stderr):
+        try:
+            job = load_job_file(args.job_file)
+            params, projects = build_job(job, args)
+            output_dir = args.output_dir or job.get('output_dir') or '.'
+            if len(projects) == 1:
+                summary['projects'] = run_single(params, output_dir, cancel_token)
+            else:
+                summary['projects'] = run_batch(params, projects, output_dir, cancel_token)
+            failed = [project for project in summary['projects'] if not project['ok']]
+            if not failed:
+                summary['status'], exit_code = 'completed', EXIT_OK
+            else:
+                summary['status'] = 'partial' if len(failed) < len(summary['projects']) else 'failed'
+        except InvalidJob as e:
+            summary.update(status='invalid', error=str(e))
+            exit_code = EXIT_INVALID
+        except (OperationCancelled, KeyboardInterrupt):
+            cancel_token.cancel()
+            summary['status'] = 'cancelled'
+            exit_code = EXIT_CANCELLED
+        except Exception as e:
+            summary['error'] = str(e)
+
+    summary['elapsed_seconds'] = round(time.time() - started, 3)
+    status_line = json.dumps(summary, ensure_ascii=False)
+    print(status_line)
+    if args.status_file:
+        with open(args.status_file, 'w', encoding='utf-8') as f:
+            f.write(status_line + '\n')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
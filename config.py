@@ -3,7 +3,6 @@ Streamlit应用配置管理
 """
 
 import os
-import yaml
 from typing import Dict, Any
 
 
@@ -32,7 +31,8 @@ class StreamlitConfig:
         config_filename = f"config_{params['project_id']}_{int(params.get('timestamp', 0))}.yaml"
         config_path = os.path.join(self.config_dir, config_filename)
         
-        # 保存配置文件
+        # 保存配置文件（yaml只在写文件配置时需要，不在页面启动时导入）
+        import yaml
         with open(config_path, 'w', encoding='utf-8') as f:
             yaml.dump(config_data, f, default_flow_style=False, allow_unicode=True)
             
@@ -74,12 +74,58 @@ class StreamlitConfig:
             'frame_extraction': {
                 'enabled': params.get('enable_extraction', True),
                 'method': 'rosetta',
+                'partition_annotations': params.get('partition_annotations', False),  # 标注条目按帧分配
+                'annotation_frame_key': params.get('annotation_frame_key', 'frameIndex'),  # 标注条目中的帧序号字段
+                'sampling': params.get('sampling'),  # 抽帧配置，None表示输出全部帧
                 'output': {
                     'add_timestamp': True,
                     'export_prefix': None,  # 内存处理，不需要输出前缀
-                    'export_subdir': None   # 内存处理，不需要输出子目录
+                    'export_subdir': None,  # 内存处理，不需要输出子目录
+                    'format': params.get('output_format', 'per_frame'),  # per_frame 或 jsonl
+                    'shard_by': params.get('shard_by', 'size'),  # JSONL分片方式：size 或 task
+                    'max_shard_mb': params.get('max_shard_mb', 64),  # 按大小分片时的分片上限
+                    'shared_context': params.get('shared_context', False),  # 任务级字段每个任务只写一次
+                    'frame_index': params.get('frame_index', True)  # 结果压缩包附带帧随机访问索引
                 }
             },
+            'filter': params.get('filter'),  # 任务过滤条件，None表示不过滤
+            'batch': {
+                'max_workers': params.get('max_workers', 1),  # 批处理并发项目数
+                'max_connections': params.get('max_connections', 2),  # 全局并发下载连接数
+                'memory_budget_mb': params.get('memory_budget_mb'),  # 全局内存预算，None表示不限制
+                'memory_per_job_mb': params.get('memory_per_job_mb'),  # 每个项目预留内存，None表示默认的1024MB
+                'pipelined': params.get('pipelined', False),  # 下载/解压/拆帧/打包流水线并行
+                'queue_size': params.get('queue_size', 2)  # 流水线阶段间队列容量
+            },
+            'cache': {
+                'enabled': params.get('result_cache', True),  # 相同参数和导出内容直接复用结果压缩包
+                'dir': params.get('cache_dir'),  # 缓存目录，None表示系统临时目录
+                'max_mb': params.get('cache_max_mb', 2048)  # 缓存总大小上限，按LRU淘汰
+            },
+            'checkpoint': {
+                'enabled': params.get('checkpoint', True),  # 中断后从最后完成的阶段/任务继续
+                'dir': params.get('checkpoint_dir'),  # 检查点目录，None表示系统临时目录
+                'max_age_hours': params.get('checkpoint_max_age_hours', 24),  # 超过该时间的检查点丢弃
+                'save_interval': params.get('checkpoint_interval', 5),  # 拆帧进度保存间隔（秒）
+                'min_size_mb': params.get('checkpoint_min_mb', 256)  # 导出小于该大小时不写检查点（内存版）
+            },
+            'memory': {
+                'mode': params.get('memory_mode', 'auto'),  # auto（按导出大小选择）/ memory / spooled / disk
+                'budget_mb': params.get('process_memory_mb'),  # 进程内存预算，None表示ROSETTA_MEMORY_BUDGET_MB或内存上限的60%
+                'peak_ratio': params.get('memory_peak_ratio', 20),  # 峰值占用相对导出压缩包大小的倍数
+                'spill_dir': params.get('spill_dir')  # 溢出临时文件目录，None表示系统临时目录
+            },
+            'metrics': {
+                'log': params.get('metrics_log', True),  # 运行指标追加写入JSONL日志
+                'log_path': params.get('metrics_log_path'),  # 日志路径，None表示环境变量ROSETTA_METRICS_LOG或系统临时目录
+                'trace_memory': params.get('trace_memory', False)  # 用tracemalloc记录各阶段内存峰值（有额外开销）
+            },
+            'profiling': {
+                'enabled': params.get('profile', False),  # 性能分析，结果追加到结果压缩包的_profile/目录
+                'mode': params.get('profile_mode', 'auto'),  # auto / sampling（pyinstrument）/ cprofile
+                'top_n': params.get('profile_top_n', 30),  # 报告中列出的函数和代码行数量
+                'trace_memory': params.get('profile_memory', True)  # 记录tracemalloc快照和分配排行
+            },
             'project': {
                 'project_id': params['project_id'],
                 'pool_ids': params['pool_ids'],
@@ -104,5 +150,17 @@ class StreamlitConfig:
             'test_mode': False,
             'enable_extraction': True,
             'check_pool': False,  # 默认使用完成池
-            'smart_download': True  # 默认启用智能下载
+            'smart_download': True,  # 默认启用智能下载
+            'output_format': 'per_frame',  # 默认逐帧JSON输出
+            'shard_by': 'size',
+            'max_shard_mb': 64,
+            'shared_context': False,
+            'partition_annotations': False,
+            'annotation_frame_key': 'frameIndex',
+            'sampling': None,
+            'filter': None,
+            'result_cache': True,
+            'checkpoint': True,
+            'memory_mode': 'auto',
+            'profile': False
         }
\ No newline at end of file
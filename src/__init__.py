@@ -4,9 +4,33 @@ Rosetta数据下载与拆帧工具包
 这是一个集成的工具包，用于从Rosetta平台下载数据并进行拆帧处理。
 """
 
+import os
+import sys
+
 __version__ = "1.0.0"
 __author__ = "Data Team"
 
-from .downloader import RosettaDownloader
-from .extractor import FrameExtractor
-from .pipeline import ExtractionPipeline
\ No newline at end of file
+# 文件版组件（pipeline、downloader、extractor、frame_splitter）之间使用相对导入；
+# 与内存版共用的模块（frame_output、task_filter、checkpoint等）统一以顶层名称导入，
+# 两套管道在同一进程中使用时也只加载一次。Streamlit页面和命令行已把src加入sys.path，直接导入src包时在这里补上
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in [os.path.abspath(path) for path in sys.path]:
+    sys.path.append(_SRC_DIR)
+
+# 按需导入：导入包时不加载下载和拆帧组件（requests、yaml、tqdm等）
+_LAZY_EXPORTS = {
+    'RosettaDownloader': 'downloader',
+    'FrameExtractor': 'extractor',
+    'ExtractionPipeline': 'pipeline'
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(f'.{_LAZY_EXPORTS[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+标注按帧分配
+一次遍历result.annotations，建立 帧序号 → 标注条目 的映射，
+拆帧时直接取出每帧的标注，代价与标注数量线性相关而非 帧数 × 标注数。
+每个标注的空结构只生成一次，没有条目的帧共享同一个标注列表。
+"""
+
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+# 需要按帧分配的标注条目字段
+PARTITION_KEYS = ('slots', 'slotsChildren', 'childrenOnly')
+
+# 条目中表示帧序号的字段（frame_extraction.annotation_frame_key）
+DEFAULT_FRAME_KEY = 'frameIndex'
+
+
+def item_frame_index(item: Any, frame_key: str = DEFAULT_FRAME_KEY) -> Optional[int]:
+    """获取标注条目所属的帧序号
+
+    slots条目的帧序号在条目自身，slotsChildren条目的帧序号在其slot字段中；找不到时返回None。
+
+    Args:
+        item: 标注条目（slots/slotsChildren/childrenOnly中的元素）
+        frame_key: 帧序号字段名
+
+    Returns:
+        Optional[int]: 帧序号
+    """
+    if not isinstance(item, dict):
+        return None
+    for candidate in (item, item.get('slot')):
+        if not isinstance(candidate, dict):
+            continue
+        value = candidate.get(frame_key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+class AnnotationPartition:
+    """单个任务的标注分帧结果"""
+
+    def __init__(self, result_annotations: List[Dict[str, Any]],
+                 skeleton_factory: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 frame_key: str = DEFAULT_FRAME_KEY):
+        """
+        Args:
+            result_annotations: 任务的result.annotations
+            skeleton_factory: 生成空标注结构的函数（拆帧器的_create_empty_annotation）
+            frame_key: 帧序号字段名
+        """
+        self.frame_key = frame_key
+        self.annotations = result_annotations
+        self.skeleton_factory = skeleton_factory
+
+        # 每个标注的空结构（只生成一次；没有条目的帧直接共享该列表，不能修改）
+        self.skeletons: List[Dict[str, Any]] = []
+        for annotation in result_annotations:
+            skeleton = skeleton_factory(annotation)
+            for key in PARTITION_KEYS:
+                if key in annotation:
+                    skeleton[key] = []
+            self.skeletons.append(skeleton)
+
+        # 帧序号 -> [(标注序号, 字段名, 条目)]
+        self.by_frame: Dict[int, List[Tuple[int, str, Any]]] = {}
+        # 找不到帧序号的条目数（不分配到任何帧，由拆帧器告警）
+        self.unassigned = 0
+
+        for annotation_idx, annotation in enumerate(result_annotations):
+            for key in PARTITION_KEYS:
+                items = annotation.get(key)
+                if not isinstance(items, list):
+                    continue
+                for item in items:
+                    frame = item_frame_index(item, frame_key)
+                    if frame is None:
+                        self.unassigned += 1
+                    else:
+                        self.by_frame.setdefault(frame, []).append((annotation_idx, key, item))
+
+    @property
+    def item_count(self) -> int:
+        return sum(len(items) for items in self.by_frame.values()) + self.unassigned
+
+    def unassigned_message(self) -> Optional[str]:
+        """存在找不到帧序号的条目时返回告警内容，否则返回None"""
+        if not self.unassigned:
+            return None
+        if not self.by_frame:
+            return (f"{self.unassigned} 个标注条目都没有帧序号字段 {self.frame_key}，未分配到任何帧，"
+                    f"请检查 frame_extraction.annotation_frame_key")
+        return f"{self.unassigned}/{self.item_count} 个标注条目没有帧序号字段 {self.frame_key}，未分配到任何帧"
+
+    def annotations_for_frame(self, frame_number: int) -> List[Dict[str, Any]]:
+        """生成指定帧的标注列表
+
+        每个标注保留原有的空结构，并填入属于该帧的条目。没有条目的帧直接返回共享的空结构列表，
+        有条目的帧只复制有条目的标注，返回的列表只用于序列化，不能修改。
+
+        Args:
+            frame_number: 帧序号
+
+        Returns:
+            List[Dict[str, Any]]: 该帧的标注列表
+        """
+        items = self.by_frame.get(frame_number)
+        if not items:
+            return self.skeletons
+        frame_annotations = list(self.skeletons)
+        filled: Dict[int, Dict[str, Any]] = {}
+        for annotation_idx, key, item in items:
+            annotation = filled.get(annotation_idx)
+            if annotation is None:
+                annotation = dict(self.skeletons[annotation_idx])
+                for partition_key in PARTITION_KEYS:
+                    if partition_key in annotation:
+                        annotation[partition_key] = []
+                filled[annotation_idx] = frame_annotations[annotation_idx] = annotation
+            annotation[key].append(item)
+
+        return frame_annotations
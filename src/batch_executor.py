@@ -0,0 +1,120 @@
+"""
+多项目批处理执行器
+以有限并发同时处理多个项目，受全局内存预算约束，结果按输入顺序返回
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, List, Optional
+
+from resource_budget import ResourceBudget
+
+
+# 每个项目默认预留的内存（MB）
+DEFAULT_MEMORY_PER_JOB_MB = 1024
+
+
+class BatchExecutor:
+    """多项目批处理执行器"""
+
+    def __init__(self,
+                 run_project: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 max_workers: int = 1,
+                 memory_budget: Optional[ResourceBudget] = None,
+                 memory_per_job_mb: float = DEFAULT_MEMORY_PER_JOB_MB,
+                 cancel_token=None):
+        """
+        Args:
+            run_project: 处理单个项目的函数，参数为项目字典
+            max_workers: 最大并发项目数
+            memory_budget: 全局内存预算（MB），为None时不限制
+            memory_per_job_mb: 每个项目预留的内存（MB），项目字典中的estimated_mb优先
+            cancel_token: 取消令牌（cancellation.CancellationToken），取消后未开始和等待内存预算的项目不再处理，
+                中断（Ctrl+C）时由执行器请求取消，让工作线程中的项目尽快退出
+        """
+        self.run_project = run_project
+        self.max_workers = max(int(max_workers or 1), 1)
+        self.memory_budget = memory_budget
+        self.memory_per_job_mb = memory_per_job_mb
+        self.cancel_token = cancel_token
+
+    @classmethod
+    def from_config(cls, run_project: Callable[[Dict[str, Any]], Dict[str, Any]],
+                    batch_config: Optional[Dict[str, Any]],
+                    max_workers: Optional[int] = None, memory_budget: Optional[ResourceBudget] = None,
+                    cancel_token=None) -> 'BatchExecutor':
+        """根据配置中的batch段创建执行器
+
+        Args:
+            run_project: 处理单个项目的函数
+            batch_config: batch配置
+            max_workers: 并发数，为None时使用配置值
+            memory_budget: 共享的内存预算，为None时按batch.memory_budget_mb创建（未配置时不限制）
+            cancel_token: 取消令牌
+
+        Returns:
+            BatchExecutor: 执行器实例
+        """
+        batch_config = batch_config or {}
+        memory_budget_mb = batch_config.get('memory_budget_mb')
+        if memory_budget is None and memory_budget_mb:
+            memory_budget = ResourceBudget(memory_budget_mb, 'memory_mb')
+        memory_per_job_mb = batch_config.get('memory_per_job_mb')
+        return cls(
+            run_project,
+            max_workers=max_workers or batch_config.get('max_workers', 1),
+            memory_budget=memory_budget,
+            memory_per_job_mb=DEFAULT_MEMORY_PER_JOB_MB if memory_per_job_mb is None else memory_per_job_mb,
+            cancel_token=cancel_token
+        )
+
+    def _run_one(self, index: int, total: int, project: Dict[str, Any]) -> Dict[str, Any]:
+        print(f"\n【{index}/{total}】处理项目：{project.get('project_name')} (ID: {project['project_id']})")
+
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        reservation = nullcontext()
+        if self.memory_budget is not None:
+            # 等待内存预算期间同样响应取消
+            reservation = self.memory_budget.reserve(project.get('estimated_mb') or self.memory_per_job_mb,
+                                                     cancel_token=self.cancel_token)
+
+        try:
+            with reservation:
+                result = self.run_project(project)
+            print(f"✅ 项目 {project['project_id']} 处理完成")
+            return result
+        except Exception as e:
+            print(f"❌ 项目 {project['project_id']} 处理失败：{str(e)}")
+            return {
+                'project_id': str(project['project_id']),
+                'error': str(e),
+                'status': 'failed',
+                'message': f'处理失败: {str(e)}'
+            }
+
+    def run(self, projects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """处理所有项目
+
+        Args:
+            projects: 项目列表，每个项目包含project_id, pool_ids, project_name
+
+        Returns:
+            List[Dict[str, Any]]: 处理结果，顺序与输入一致
+        """
+        total = len(projects)
+        if self.max_workers == 1 or total <= 1:
+            return [self._run_one(i, total, project) for i, project in enumerate(projects, 1)]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total),
+                                thread_name_prefix='batch') as pool:
+            futures = [pool.submit(self._run_one, i, total, project)
+                       for i, project in enumerate(projects, 1)]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                # 取消或中断：不再开始新项目，并通知运行中的项目退出，否则退出线程池时要等所有项目处理完
+                pool.shutdown(wait=False, cancel_futures=True)
+                if self.cancel_token is not None:
+                    self.cancel_token.cancel()
+                raise
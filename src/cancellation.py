@@ -0,0 +1,35 @@
+"""
+协作式取消
+任务持有一个取消令牌，下载分块、逐成员解压、逐帧生成和打包循环中检查令牌，
+取消后在当前分块/条目结束时退出，释放连接、工作线程和内存缓冲
+"""
+
+import threading
+
+
+class OperationCancelled(BaseException):
+    """任务已取消
+
+    继承BaseException（与asyncio.CancelledError相同），
+    确保各处理阶段用于容错的 except Exception 不会吞掉取消，取消能一直传递到任务边界。
+    """
+
+
+class CancellationToken:
+    """取消令牌"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """已请求取消时抛出OperationCancelled"""
+        if self._event.is_set():
+            raise OperationCancelled("任务已取消")
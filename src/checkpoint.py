@@ -0,0 +1,401 @@
+"""
+阶段检查点
+长任务中断（如容器重启）后从最后完成的单元继续，而不是从登录下载重新开始：
+1. 下载阶段：保存下载好的导出压缩包（文件版管道记录已解压的项目目录）
+2. 拆帧阶段：记录已完成的任务，以及写入器状态和尚未输出的JSONL分片内容
+内存版管道额外保存已输出的帧文件，恢复时直接载入
+
+只有导出大小达到min_size_mb（或已有检查点）时才写入磁盘，小任务中断后重跑的代价很小，不值得多写一份导出。
+同一检查点同时只能被一个任务使用（文件锁），其他任务不使用检查点。
+保存的导出附带内容哈希和导出标识，恢复前确认导出没有变化，见MemoryExtractionPipeline.fetch_stage。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import weakref
+from typing import Dict, Any, Callable, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在进程内互斥
+    fcntl = None
+
+
+# 默认检查点目录、保留时间和保存间隔
+DEFAULT_CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), 'rosetta_checkpoints')
+DEFAULT_MAX_AGE_HOURS = 24
+DEFAULT_SAVE_INTERVAL = 5.0
+# 导出小于该大小时不写检查点（MB）
+DEFAULT_MIN_SIZE_MB = 256
+
+STATE_NAME = 'checkpoint.json'
+ARCHIVE_NAME = 'export.zip'
+PARTIAL_SHARD_NAME = 'partial_shard.jsonl'
+OUTPUTS_DIR = 'outputs'
+LOCK_SUFFIX = '.lock'
+
+# 本进程持有的检查点锁（没有fcntl时的互斥，也避免同一进程重复加锁）
+_held_locks: Set[str] = set()
+_held_locks_guard = threading.Lock()
+
+
+def _acquire_lock(path: str) -> Optional[int]:
+    """非阻塞地获取检查点锁，成功时返回文件描述符（没有fcntl时为-1），已被占用时返回None"""
+    with _held_locks_guard:
+        if path in _held_locks:
+            return None
+        fd = -1
+        if fcntl is not None:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return None
+        _held_locks.add(path)
+        return fd
+
+
+def _release_lock(path: str, fd: int):
+    with _held_locks_guard:
+        if path not in _held_locks:
+            return
+        _held_locks.discard(path)
+        if fd >= 0:
+            # 锁文件保留（删除后其他任务可能锁住新建的同名文件）
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def checkpoint_key(config: Dict[str, Any], project_id=None, pool_ids=None) -> str:
+    """计算检查点键：账号、项目、池子、下载方式和影响拆帧输出的参数都相同的任务才共用检查点
+
+    Args:
+        config: 管道配置
+        project_id: 项目ID，为None时使用配置值
+        pool_ids: 池子ID列表，为None时使用配置值
+
+    Returns:
+        str: 检查点键
+    """
+    normalized = {
+        'project_id': str(project_id or config['project']['project_id']),
+        'pool_ids': sorted(str(pool_id) for pool_id in (pool_ids or config['project']['pool_ids'])),
+        'account': (config.get('rosetta') or {}).get('username'),
+        'download': config['download'],
+        'frame_extraction': config['frame_extraction'],
+        'filter': config.get('filter')
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+def _write_atomic(path: str, content: bytes):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+class Checkpoint:
+    """单个任务的检查点"""
+
+    def __init__(self, root: str, key: str, max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+                 save_interval: float = DEFAULT_SAVE_INTERVAL, min_size_mb: float = DEFAULT_MIN_SIZE_MB,
+                 lock_fd: int = -1):
+        """
+        Args:
+            root: 检查点根目录
+            key: 检查点键
+            max_age_hours: 检查点保留时间（小时），超过后丢弃重新开始
+            save_interval: 拆帧阶段保存检查点的最小间隔（秒）
+            min_size_mb: 导出小于该大小时不写检查点
+            lock_fd: from_config获取的检查点锁，随检查点释放
+        """
+        self.dir = os.path.join(root, key)
+        self.save_interval = save_interval
+        self.min_bytes = (min_size_mb or 0) * 1024 * 1024
+        # 锁在clear/close或对象回收时释放
+        self._release = weakref.finalize(self, _release_lock, self.dir + LOCK_SUFFIX, lock_fd)
+        self._last_save = time.time()
+        self._pending_outputs: Dict[str, bytes] = {}
+        self._pending_tasks: List[str] = []
+        self._on_saved: List[Callable[[], None]] = []
+
+        self.state = self._load()
+        if self.state and time.time() - self.state['created_at'] > max_age_hours * 3600:
+            print("检查点已过期，重新开始")
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.state = None
+        if self.state:
+            print(f"发现检查点 {key}，已完成阶段：{list(self.state['stages']) or '无'}，"
+                  f"已完成任务 {len(self.state['tasks'])} 个")
+        else:
+            self.state = {'created_at': time.time(), 'stages': {}, 'tasks': [],
+                          'writer': None, 'partial_shard': None}
+        self._completed = set(self.state['tasks'])
+        # 已有检查点时继续写入，否则等导出大小确定后再决定（见activate）
+        self.active = bool(self.state['stages'])
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], project_id=None, pool_ids=None) -> Optional['Checkpoint']:
+        """按配置中的checkpoint段创建检查点，未启用、测试模式或检查点正被其他任务使用时返回None"""
+        checkpoint_config = config.get('checkpoint')
+        if not checkpoint_config or not checkpoint_config.get('enabled', True):
+            return None
+        if config.get('debug', {}).get('test_mode'):
+            return None
+        root = checkpoint_config.get('dir') or DEFAULT_CHECKPOINT_DIR
+        key = checkpoint_key(config, project_id, pool_ids)
+        os.makedirs(root, exist_ok=True)
+        lock_fd = _acquire_lock(os.path.join(root, key) + LOCK_SUFFIX)
+        if lock_fd is None:
+            print(f"检查点 {key} 正被另一个任务使用，本次不使用检查点")
+            return None
+        return cls(
+            root, key,
+            max_age_hours=checkpoint_config.get('max_age_hours', DEFAULT_MAX_AGE_HOURS),
+            save_interval=checkpoint_config.get('save_interval', DEFAULT_SAVE_INTERVAL),
+            min_size_mb=checkpoint_config.get('min_size_mb', DEFAULT_MIN_SIZE_MB),
+            lock_fd=lock_fd
+        )
+
+    def activate(self, size_bytes: Optional[int] = None) -> bool:
+        """按导出大小决定是否写入检查点（已有检查点时总是写入）
+
+        Args:
+            size_bytes: 导出大小（字节），None表示总是写入（文件版管道的检查点只记录进度，不复制导出）
+
+        Returns:
+            bool: 是否写入检查点
+        """
+        if not self.active and (size_bytes is None or size_bytes >= self.min_bytes):
+            self.active = True
+        if self.active:
+            os.makedirs(self.dir, exist_ok=True)
+        return self.active
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(STATE_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self):
+        _write_atomic(self._path(STATE_NAME), json.dumps(self.state, ensure_ascii=False).encode('utf-8'))
+
+    # ---------- 阶段 ----------
+
+    def stage_done(self, stage: str) -> bool:
+        return stage in self.state['stages']
+
+    def stage_info(self, stage: str) -> Dict[str, Any]:
+        return self.state['stages'].get(stage, {})
+
+    def complete_stage(self, stage: str, **info):
+        """记录阶段完成（未写入检查点时忽略）"""
+        if not self.active:
+            return
+        self.state['stages'][stage] = dict(info, completed_at=time.time())
+        self._save_state()
+
+    # ---------- 下载阶段 ----------
+
+    def save_archive(self, zip_data: bytes, sha256: str, identity: Optional[Dict[str, Any]] = None):
+        """保存下载好的导出压缩包，并记录下载阶段完成（导出小于min_size_mb时不保存）
+
+        没有导出标识时（如标准接口下载）恢复前无法确认导出是否变化，总要重新下载，
+        因此只记录内容哈希（用于verify_archive），不保存压缩包。
+
+        Args:
+            zip_data: 导出压缩包
+            sha256: 压缩包内容哈希
+            identity: 导出标识（如大文件接口的导出记录），恢复前与当前导出比较，None表示无法不下载就确认
+        """
+        if not self.activate(len(zip_data)):
+            return
+        if identity is not None:
+            _write_atomic(self._path(ARCHIVE_NAME), zip_data)
+        elif os.path.exists(self._path(ARCHIVE_NAME)):
+            os.remove(self._path(ARCHIVE_NAME))
+        self.complete_stage('download', size=len(zip_data), sha256=sha256, identity=identity)
+
+    def archive_identity(self) -> Optional[Dict[str, Any]]:
+        """已保存导出的标识，没有时返回None"""
+        return self.stage_info('download').get('identity')
+
+    def load_archive(self, identity: Optional[Dict[str, Any]]) -> Optional[bytes]:
+        """读取已保存的导出压缩包
+
+        Args:
+            identity: 当前导出的标识，与保存时的标识一致才返回
+
+        Returns:
+            Optional[bytes]: 导出压缩包，没有保存、无法确认或导出已变化时返回None
+        """
+        if identity is None or identity != self.archive_identity():
+            return None
+        if not os.path.isfile(self._path(ARCHIVE_NAME)):
+            return None
+        with open(self._path(ARCHIVE_NAME), 'rb') as f:
+            return f.read()
+
+    def verify_archive(self, sha256: str) -> bool:
+        """重新下载后确认导出内容与检查点一致，不一致时丢弃之前的进度
+
+        Args:
+            sha256: 本次下载的导出内容哈希
+
+        Returns:
+            bool: 检查点是否仍然有效
+        """
+        saved = self.stage_info('download').get('sha256')
+        if saved is None or saved == sha256:
+            return True
+        print("导出内容与检查点不一致，丢弃之前的进度重新开始")
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.state = {'created_at': time.time(), 'stages': {}, 'tasks': [],
+                      'writer': None, 'partial_shard': None}
+        self._completed = set()
+        self.active = False
+        return False
+
+    # ---------- 拆帧阶段 ----------
+
+    def split_sources(self, sources: List[str]) -> List[str]:
+        """首次运行时记录拆帧任务列表，恢复时返回之前记录的列表
+
+        文件版管道拆帧时在项目目录中写出帧文件，恢复时不能重新扫描目录，
+        否则会把已写出的帧文件当作任务处理。
+
+        Args:
+            sources: 本次扫描到的任务源文件
+
+        Returns:
+            List[str]: 拆帧任务列表
+        """
+        info = self.stage_info('split_start')
+        if info:
+            return info['sources']
+        self.complete_stage('split_start', sources=list(sources))
+        return list(sources)
+
+    def task_done(self, source_path: str) -> bool:
+        """任务是否已在之前的运行中完成拆帧"""
+        return source_path in self._completed
+
+    def track_outputs(self, emit: Callable[[str, bytes], None]) -> Callable[[str, bytes], None]:
+        """包装写入器的输出回调，记录输出文件以便随检查点保存（内存版管道使用）"""
+        if not self.active:
+            return emit
+
+        def tracked_emit(path: str, content: bytes):
+            emit(path, content)
+            self._pending_outputs[path] = content
+        return tracked_emit
+
+    def record_task(self, source_path: str, writer, on_saved: Optional[Callable[[], None]] = None):
+        """记录任务拆帧完成（须在task结束、写入器处于任务边界时调用）
+
+        为避免每个任务都重写不断增长的索引，按save_interval间隔批量保存。
+
+        Args:
+            source_path: 任务源文件路径
+            writer: 帧输出写入器
+            on_saved: 该任务随检查点保存后执行的回调（如删除源文件）
+        """
+        if not self.active:
+            if on_saved is not None:
+                on_saved()
+            return
+        self._completed.add(source_path)
+        self._pending_tasks.append(source_path)
+        if on_saved is not None:
+            self._on_saved.append(on_saved)
+        if time.time() - self._last_save >= self.save_interval:
+            self.save(writer)
+
+    def save(self, writer):
+        """保存拆帧进度：已输出文件、未输出的分片行、写入器状态和已完成任务"""
+        if not self.active:
+            return
+        # 1. 已输出的文件
+        for path, content in self._pending_outputs.items():
+            target = os.path.join(self.dir, OUTPUTS_DIR, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+        self._pending_outputs = {}
+
+        # 2. 当前分片中尚未输出的行（只追加新增部分）
+        writer_state = writer.checkpoint_state()
+        lines = writer.pending_lines()
+        partial = self.state.get('partial_shard')
+        partial_path = self._path(PARTIAL_SHARD_NAME)
+        if lines:
+            if partial and partial['name'] == writer_state.get('shard_name') and partial['lines'] <= len(lines):
+                new_lines, mode = lines[partial['lines']:], 'ab'
+            else:
+                new_lines, mode = lines, 'wb'
+            with open(partial_path, mode) as f:
+                f.writelines(new_lines)
+            self.state['partial_shard'] = {
+                'name': writer_state.get('shard_name'),
+                'lines': len(lines),
+                'bytes': sum(len(line) for line in lines)
+            }
+        else:
+            self.state['partial_shard'] = None
+
+        # 3. 写入器状态和已完成任务（原子替换，作为提交点）
+        self.state['writer'] = writer_state
+        self.state['tasks'].extend(self._pending_tasks)
+        self._pending_tasks = []
+        self._save_state()
+        self._last_save = time.time()
+
+        on_saved, self._on_saved = self._on_saved, []
+        for callback in on_saved:
+            callback()
+
+    def restore_writer(self, writer):
+        """把写入器恢复到检查点保存时的状态"""
+        if not self.state.get('writer'):
+            return
+        lines: List[bytes] = []
+        partial = self.state.get('partial_shard')
+        if partial:
+            with open(self._path(PARTIAL_SHARD_NAME), 'rb') as f:
+                content = f.read(partial['bytes'])
+            lines = content.splitlines(keepends=True)
+        writer.restore_state(self.state['writer'], lines)
+        print(f"从检查点恢复写入器，已写出 {writer.frame_count} 帧")
+
+    def load_outputs(self) -> Dict[str, bytes]:
+        """读取已保存的输出文件（内存版管道恢复时使用）"""
+        outputs = {}
+        outputs_dir = os.path.join(self.dir, OUTPUTS_DIR)
+        for dirpath, _, filenames in os.walk(outputs_dir):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                with open(full_path, 'rb') as f:
+                    outputs[os.path.relpath(full_path, outputs_dir).replace(os.sep, '/')] = f.read()
+        return outputs
+
+    def clear(self):
+        """任务完成后删除检查点并释放锁"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.close()
+
+    def close(self):
+        """释放检查点锁（保留检查点，之后的任务可以继续）"""
+        self._release()
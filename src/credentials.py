@@ -0,0 +1,81 @@
+"""
+凭据读取
+按 环境变量 → 凭据文件 → Streamlit secrets 的顺序查找Rosetta账号和OSS密钥，
+命令行和后台节点无需Streamlit即可运行
+"""
+
+import os
+import yaml
+from typing import Dict, Any, Optional
+
+
+# 凭据文件路径（YAML或JSON），格式：
+# rosetta_credentials: {username: ..., password: ...}（与secrets.toml的段名一致）
+# oss_credentials: {access_key: ..., secret_key: ...}
+CREDENTIALS_FILE_ENV = 'ROSETTA_CREDENTIALS_FILE'
+
+USERNAME_ENV = 'ROSETTA_USERNAME'
+PASSWORD_ENV = 'ROSETTA_PASSWORD'
+OSS_ACCESS_KEY_ENV = 'ROSETTA_OSS_ACCESS_KEY'
+OSS_SECRET_KEY_ENV = 'ROSETTA_OSS_SECRET_KEY'
+
+
+def _load_credentials_file() -> Dict[str, Any]:
+    path = os.environ.get(CREDENTIALS_FILE_ENV)
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _streamlit_secrets(section: str) -> Optional[Dict[str, Any]]:
+    try:
+        import streamlit as st
+        return dict(st.secrets[section])
+    except ImportError:
+        return None
+    except (KeyError, FileNotFoundError):
+        return None
+    except Exception:
+        # 非Streamlit环境下secrets未配置时可能抛出其他异常
+        return None
+
+
+def get_rosetta_credentials() -> Optional[Dict[str, str]]:
+    """读取Rosetta账号
+
+    Returns:
+        Optional[Dict[str, str]]: 包含username和password，未配置时返回None
+    """
+    if os.environ.get(USERNAME_ENV) and os.environ.get(PASSWORD_ENV):
+        return {'username': os.environ[USERNAME_ENV], 'password': os.environ[PASSWORD_ENV]}
+    rosetta = _load_credentials_file().get('rosetta_credentials') or _streamlit_secrets('rosetta_credentials')
+    if rosetta and rosetta.get('username') and rosetta.get('password'):
+        return {'username': rosetta['username'], 'password': rosetta['password']}
+    return None
+
+
+def get_oss_credentials() -> Dict[str, str]:
+    """读取OSS密钥
+
+    Returns:
+        Dict[str, str]: 包含access_key和secret_key
+
+    Raises:
+        ValueError: 环境变量、凭据文件和Streamlit secrets中都未配置
+    """
+    if os.environ.get(OSS_ACCESS_KEY_ENV) and os.environ.get(OSS_SECRET_KEY_ENV):
+        print("✅ 从环境变量获取OSS配置")
+        return {'access_key': os.environ[OSS_ACCESS_KEY_ENV], 'secret_key': os.environ[OSS_SECRET_KEY_ENV]}
+
+    oss = _load_credentials_file().get('oss_credentials')
+    if oss:
+        print("✅ 从凭据文件获取OSS配置")
+    else:
+        oss = _streamlit_secrets('oss_credentials')
+        if oss:
+            print("✅ 成功从Streamlit Cloud secrets获取OSS配置")
+    if not oss or not oss.get('access_key') or not oss.get('secret_key'):
+        raise ValueError(f"OSS配置未设置：请设置环境变量 {OSS_ACCESS_KEY_ENV}/{OSS_SECRET_KEY_ENV}，"
+                         f"或在凭据文件（{CREDENTIALS_FILE_ENV}）、Streamlit secrets中添加[oss_credentials]")
+    return {'access_key': oss['access_key'], 'secret_key': oss['secret_key']}
@@ -7,7 +7,8 @@ import os
 import yaml
 import shutil
 from typing import List, Optional
-from .rosetta_client import GetRosData
+# 与内存版共用的模块以顶层名称导入，只加载一次（见src/__init__.py）
+from rosetta_client import GetRosData
 
 
 class RosettaDownloader:
@@ -30,13 +31,15 @@ class RosettaDownloader:
     def download_project_data(self, 
                             project_id: int = None, 
                             pool_ids: List[int] = None,
-                            save_path: str = None) -> str:
+                            save_path: str = None,
+                            task_filter=None) -> str:
         """下载项目数据
         
         Args:
             project_id: 项目ID，如果为None则使用配置文件中的值
             pool_ids: 池子ID列表，如果为None则使用配置文件中的值
             save_path: 保存路径，如果为None则使用配置文件中的值
+            task_filter: 任务过滤条件，解压时跳过不符合条件的文件
             
         Returns:
             str: 数据保存路径
@@ -89,7 +92,7 @@ class RosettaDownloader:
             password=password
         )
         
-        downloader.get_unziped_data()
+        downloader.get_unziped_data(task_filter)
         
         print(f'数据下载完成，保存在：{project_path}')
         return project_path
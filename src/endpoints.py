@@ -0,0 +1,71 @@
+"""
+服务地址
+Rosetta服务和OSS的地址默认指向生产环境，可通过环境变量改为本地模拟服务（benchmarks/mock_rosetta_server.py），
+用于离线调试和下载基准测试
+"""
+
+import os
+from urllib.parse import urlparse
+
+
+# 环境变量
+ROSETTA_BASE_URL_ENV = 'ROSETTA_BASE_URL'
+ROSETTA_DEV_BASE_URL_ENV = 'ROSETTA_DEV_BASE_URL'
+OSS_ENDPOINT_ENV = 'ROSETTA_OSS_ENDPOINT'
+EXPORT_TIMEOUT_ENV = 'ROSETTA_EXPORT_TIMEOUT'
+QUERY_TIMEOUT_ENV = 'ROSETTA_QUERY_TIMEOUT'
+
+DEFAULT_BASE_URL = 'https://server.rosettalab.top'
+DEFAULT_DEV_BASE_URL = 'https://dev-server.rosettalab.top'
+DEFAULT_OSS_ENDPOINT = 'https://oss-cn-beijing.aliyuncs.com'
+OSS_BUCKET = 'rosetta-data'
+
+# 标准导出接口和大文件接口的默认超时（秒）
+DEFAULT_EXPORT_TIMEOUT = 30
+DEFAULT_QUERY_TIMEOUT = 60
+
+
+def base_url(use_dev: bool = False) -> str:
+    """Rosetta服务根地址"""
+    if use_dev:
+        return os.environ.get(ROSETTA_DEV_BASE_URL_ENV, DEFAULT_DEV_BASE_URL).rstrip('/')
+    return os.environ.get(ROSETTA_BASE_URL_ENV, DEFAULT_BASE_URL).rstrip('/')
+
+
+def service_url(path: str, use_dev: bool = False) -> str:
+    """Rosetta服务接口地址
+
+    Args:
+        path: 接口路径，如 user/login
+        use_dev: 是否使用开发环境
+
+    Returns:
+        str: 完整地址
+    """
+    return f"{base_url(use_dev)}/rosetta-service/{path}"
+
+
+def service_host(use_dev: bool = False) -> str:
+    """Rosetta服务主机名（用于Host等请求头）"""
+    return urlparse(base_url(use_dev)).netloc
+
+
+def oss_endpoint() -> str:
+    """OSS访问地址"""
+    return os.environ.get(OSS_ENDPOINT_ENV, DEFAULT_OSS_ENDPOINT)
+
+
+def oss_object_key(oss_file_name: str) -> str:
+    """把 oss://rosetta-data/<key> 形式的文件名转换为对象键"""
+    prefix = f"oss://{OSS_BUCKET}/"
+    return oss_file_name[len(prefix):] if oss_file_name.startswith(prefix) else oss_file_name
+
+
+def export_timeout() -> float:
+    """标准导出接口超时（秒）"""
+    return float(os.environ.get(EXPORT_TIMEOUT_ENV, DEFAULT_EXPORT_TIMEOUT))
+
+
+def query_timeout() -> float:
+    """大文件接口超时（秒）"""
+    return float(os.environ.get(QUERY_TIMEOUT_ENV, DEFAULT_QUERY_TIMEOUT))
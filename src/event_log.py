@@ -0,0 +1,151 @@
+"""
+结构化事件日志
+拆帧等热循环中每个文件一行的print在大型导出上会产生数十万次同步写标准输出，明显拖慢处理。
+本模块提供：
+1. 异步输出：日志记录经队列交给后台线程写出（QueueHandler + QueueListener），处理线程不等待IO
+2. 按类型聚合：EventLog对每种事件只逐条输出前几条，其余只计数，结束时输出一行汇总，
+   计数同时写入运行指标；WARNING及以上级别的事件（如处理失败的文件）总是逐条输出
+3. 级别：环境变量ROSETTA_LOG_LEVEL（默认INFO，设为DEBUG时逐条输出全部事件和完整接口响应）；
+   ROSETTA_LOG_FORMAT=json时每行输出一个JSON对象，便于日志平台采集
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+
+LOGGER_NAME = 'rosetta'
+
+# 每种事件默认逐条输出的条数
+DEFAULT_SAMPLE = 3
+
+_setup_lock = threading.Lock()
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """写入当前的sys.stdout（命令行把标准输出重定向到标准错误时同样生效）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if getattr(record, 'event', None):
+            data['event'] = record.event
+        data.update(getattr(record, 'fields', None) or {})
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _setup(logger: logging.Logger):
+    with _setup_lock:
+        if any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+            return
+        output = _StdoutHandler()
+        if os.environ.get('ROSETTA_LOG_FORMAT', '').lower() == 'json':
+            output.setFormatter(_JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(message)s'))
+
+        records: queue.Queue = queue.Queue(-1)
+        handler = QueueHandler(records)
+        handler.listener = QueueListener(records, output)
+        handler.listener.start()
+        atexit.register(handler.listener.stop)
+
+        logger.addHandler(handler)
+        logger.setLevel(os.environ.get('ROSETTA_LOG_LEVEL', 'INFO').upper())
+        # 不传给根日志器，避免Streamlit等框架的日志配置重复输出
+        logger.propagate = False
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """获取异步输出的日志器
+
+    Args:
+        name: 子日志器名称（如模块名），为None时返回顶层日志器
+
+    Returns:
+        logging.Logger: 日志器
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    _setup(logger)
+    return logger.getChild(name) if name else logger
+
+
+def flush():
+    """等待已提交的日志全部写出（之后的print不会排到这些日志前面）"""
+    for handler in logging.getLogger(LOGGER_NAME).handlers:
+        if isinstance(handler, QueueHandler):
+            handler.queue.join()
+
+
+class EventLog:
+    """按事件类型聚合的日志：每种事件逐条输出前sample条，其余只计数（WARNING及以上级别不抽样）"""
+
+    def __init__(self, name: str, sample: int = DEFAULT_SAMPLE):
+        """
+        Args:
+            name: 日志器名称
+            sample: 每种INFO级别事件逐条输出的条数（DEBUG级别时全部输出）
+        """
+        self.logger = get_logger(name)
+        self.sample = sample
+        self.verbose = self.logger.isEnabledFor(logging.DEBUG)
+        self.counts: Dict[str, int] = {}
+        self._labels: Dict[str, str] = {}
+        self._levels: Dict[str, int] = {}
+
+    def event(self, kind: str, message: str, level: int = logging.INFO, label: Optional[str] = None,
+              **fields: Any):
+        """记录一个事件
+
+        Args:
+            kind: 事件类型，如 skipped_non_sequence
+            message: 说明，只在逐条输出时格式化
+            level: 日志级别，WARNING及以上级别总是逐条输出
+            label: 汇总时显示的类型名称，默认使用kind
+            fields: 结构化字段（JSON格式输出时附带）
+        """
+        count = self.counts.get(kind, 0) + 1
+        self.counts[kind] = count
+        if count == 1:
+            self._labels[kind] = label or kind
+            self._levels[kind] = level
+        if level >= logging.WARNING or count <= self.sample or self.verbose:
+            self.logger.log(level, message, extra={'event': kind, 'fields': fields})
+            if count == self.sample and not self.verbose and level < logging.WARNING:
+                self.logger.log(level, f"（“{label or kind}”后续只计数，结束时汇总）", extra={'event': kind})
+
+    def summary(self) -> Dict[str, int]:
+        """输出各类事件的总数并等待日志写出
+
+        Returns:
+            Dict[str, int]: 事件类型到次数的映射
+        """
+        for kind, count in self.counts.items():
+            if count > self.sample and not self.verbose:
+                self.logger.log(self._levels[kind], f"{self._labels[kind]}：共 {count} 次",
+                                extra={'event': kind, 'fields': {'count': count}})
+        flush()
+        return dict(self.counts)
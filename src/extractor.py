@@ -28,12 +28,16 @@ class FrameExtractor:
     
     def extract_frames(self, 
                       project_path: str,
-                      method: str = None) -> str:
+                      method: str = None,
+                      task_filter=None,
+                      checkpoint=None) -> str:
         """执行拆帧操作
         
         Args:
             project_path: 项目数据路径
             method: 拆帧方法，可选 'rosetta' 或 'rosetta_new'，默认为配置中的值
+            task_filter: 任务过滤条件
+            checkpoint: 检查点，中断后恢复时从最后完成的任务继续
             
         Returns:
             str: 拆帧后的数据路径（与输入路径相同）
@@ -45,10 +49,16 @@ class FrameExtractor:
         
         print(f'开始使用 {method} 方法拆帧...')
         
+        output_config = self.config['frame_extraction'].get('output')
+        partition_annotations = self.config['frame_extraction'].get('partition_annotations', False)
+        sampling = self.config['frame_extraction'].get('sampling')
+        frame_key = self.config['frame_extraction'].get('annotation_frame_key')
         if method == "rosetta":
-            to_split(project_path)
+            to_split(project_path, output_config, partition_annotations, task_filter, sampling, checkpoint,
+                     frame_key)
         elif method == "rosetta_new":
-            to_split_new(project_path)
+            to_split_new(project_path, output_config, partition_annotations, task_filter, sampling, checkpoint,
+                         frame_key)
         else:
             raise ValueError(f"不支持的拆帧方法：{method}")
         
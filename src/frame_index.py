@@ -0,0 +1,274 @@
+"""
+结果压缩包的帧随机访问索引
+打包时为每一帧记录 (taskId, 帧序号) → 压缩包成员、偏移、大小、CRC，
+读取时直接定位到帧数据，无需扫描整个压缩包。
+JSONL分片以不压缩方式写入，单帧按行偏移直接读取，不解压整个分片。
+"""
+
+import os
+import json
+import struct
+import zlib
+import zipfile
+from typing import Dict, Any, Callable, List, Optional, Union, BinaryIO
+
+from frame_output import FRAME_PATH_PATTERN, JSONL_SUBDIR, JSONL_INDEX_NAME, JSONL_CONTEXTS_NAME, rebuild_frame_document
+
+
+# 索引在压缩包中的成员名
+FRAME_INDEX_NAME = 'frame_index.json'
+
+# 压缩包注释前缀，记录索引成员的本地文件头偏移
+_COMMENT_PREFIX = b'frame_index:'
+
+# 每帧索引项字段（以列表形式存储，减小索引体积）
+ENTRY_FIELDS = ['member', 'header_offset', 'compress_size', 'file_size', 'crc', 'compress_type',
+                'line_offset', 'line_length']
+
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+_EOCD_SIGNATURE = b'PK\x05\x06'
+
+
+def member_compress_type(name: str) -> int:
+    """成员的压缩方式：JSONL分片和共享上下文不压缩，以便按行偏移随机读取，其余成员压缩
+
+    Args:
+        name: 压缩包成员名
+
+    Returns:
+        int: zipfile.ZIP_STORED或zipfile.ZIP_DEFLATED
+    """
+    parts = name.replace(os.sep, '/').split('/')
+    if name.endswith('.jsonl') and (parts[-1] == JSONL_CONTEXTS_NAME or
+                                    (len(parts) > 1 and parts[-2] == JSONL_SUBDIR)):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _entry(info: zipfile.ZipInfo, line_offset: int = None, line_length: int = None) -> List[Any]:
+    return [info.filename, info.header_offset, info.compress_size, info.file_size,
+            info.CRC, info.compress_type, line_offset, line_length]
+
+
+def build_frame_index(infolist: List[zipfile.ZipInfo],
+                      read_file: Callable[[str], Optional[bytes]]) -> Dict[str, Any]:
+    """根据已写入的压缩包成员构建帧索引
+
+    Args:
+        infolist: 压缩包成员信息（需已写入，header_offset有效）
+        read_file: 按成员名读取原始内容的回调，用于解析JSONL分片索引
+
+    Returns:
+        Dict[str, Any]: 帧索引
+    """
+    infos = {info.filename: info for info in infolist}
+    frames: Dict[str, Dict[str, List[Any]]] = {}
+    members: Dict[str, List[Any]] = {}
+
+    for info in infolist:
+        name = info.filename
+        match = FRAME_PATH_PATTERN.search(name)
+        if match:
+            frames.setdefault(match.group(1), {})[str(int(match.group(2)))] = _entry(info)
+        elif name.endswith('_context.json'):
+            members[name] = _entry(info)
+
+    # JSONL布局：帧位于分片内部，额外记录行偏移
+    contexts = []
+    for name in infos:
+        if os.path.basename(name) != JSONL_INDEX_NAME:
+            continue
+        content = read_file(name)
+        if content is None:
+            continue
+        jsonl_index = json.loads(content)
+        root = os.path.dirname(name)
+
+        for task in jsonl_index.get('tasks', []):
+            shard = infos.get(os.path.join(root, task['shard']) if root else task['shard'])
+            if shard is None:
+                continue
+            task_frames = frames.setdefault(str(task['taskId']), {})
+            for frame_number, offset, length in zip(task['frames'], task['offsets'], task['lengths']):
+                task_frames[str(frame_number)] = _entry(shard, offset, length)
+
+        contexts_path = jsonl_index.get('contexts')
+        if contexts_path:
+            contexts_path = os.path.join(root, contexts_path) if root else contexts_path
+            contexts_info = infos.get(contexts_path)
+            contexts_content = read_file(contexts_path)
+            if contexts_info is not None and contexts_content is not None:
+                offset = 0
+                for line in contexts_content.splitlines(keepends=True):
+                    contexts.append(_entry(contexts_info, offset, len(line)))
+                    offset += len(line)
+
+    return {
+        'version': 1,
+        'fields': ENTRY_FIELDS,
+        'frame_count': sum(len(task_frames) for task_frames in frames.values()),
+        'frames': frames,
+        'members': members,
+        'contexts': contexts
+    }
+
+
+def append_frame_index(zipf: zipfile.ZipFile, read_file: Callable[[str], Optional[bytes]]) -> Dict[str, Any]:
+    """为写入中的压缩包追加帧索引成员，并在压缩包注释中记录其位置
+
+    Args:
+        zipf: 以写模式打开的ZipFile，所有帧成员已写入
+        read_file: 按成员名读取原始内容的回调
+
+    Returns:
+        Dict[str, Any]: 帧索引
+    """
+    index = build_frame_index(zipf.infolist(), read_file)
+    zipf.writestr(FRAME_INDEX_NAME, json.dumps(index, ensure_ascii=False, separators=(',', ':')))
+    index_info = zipf.getinfo(FRAME_INDEX_NAME)
+    zipf.comment = _COMMENT_PREFIX + str(index_info.header_offset).encode('ascii')
+    return index
+
+
+class FrameArchiveReader:
+    """基于帧索引的压缩包随机读取器
+
+    通过压缩包末尾注释定位索引，再按索引直接seek到帧数据，
+    不读取中央目录，也不扫描其他成员。
+    """
+
+    def __init__(self, archive: Union[str, BinaryIO], index: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            archive: 压缩包路径或可seek的二进制文件对象
+            index: 已加载的帧索引，为None时从压缩包中读取
+        """
+        if isinstance(archive, (str, os.PathLike)):
+            self._file = open(archive, 'rb')
+            self._owns_file = True
+        else:
+            self._file = archive
+            self._owns_file = False
+        self.index = index if index is not None else self._load_index()
+        self._context_cache: Dict[Any, Dict[str, Any]] = {}
+        # 压缩写入的JSONL分片（旧版压缩包）需整体解压，缓存最近一次读取的分片
+        self._member_cache: Optional[tuple] = None
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _data_offset(self, header_offset: int) -> int:
+        """成员数据的起始偏移（跳过本地文件头）"""
+        self._file.seek(header_offset)
+        header = self._file.read(_LOCAL_HEADER.size)
+        fields = _LOCAL_HEADER.unpack(header)
+        if fields[0] != _LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"无效的本地文件头偏移：{header_offset}")
+        name_length, extra_length = fields[9], fields[10]
+        return header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+    def _read_member(self, header_offset: int, compress_size: int, compress_type: int,
+                     crc: Optional[int] = None) -> bytes:
+        """读取指定本地文件头处的成员数据"""
+        self._file.seek(self._data_offset(header_offset))
+        raw = self._file.read(compress_size)
+
+        if compress_type == zipfile.ZIP_STORED:
+            data = raw
+        elif compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(raw)
+        else:
+            raise ValueError(f"不支持的压缩方式：{compress_type}")
+
+        if crc is not None and zlib.crc32(data) != crc:
+            raise ValueError(f"CRC校验失败，偏移：{header_offset}")
+        return data
+
+    def _load_index(self) -> Dict[str, Any]:
+        """从压缩包末尾注释定位并读取索引"""
+        self._file.seek(0, os.SEEK_END)
+        file_size = self._file.tell()
+        tail_size = min(file_size, 22 + 0xFFFF)
+        self._file.seek(file_size - tail_size)
+        tail = self._file.read(tail_size)
+
+        eocd = tail.rfind(_EOCD_SIGNATURE)
+        if eocd < 0:
+            raise ValueError("不是有效的ZIP文件")
+        comment_length = struct.unpack('<H', tail[eocd + 20:eocd + 22])[0]
+        comment = tail[eocd + 22:eocd + 22 + comment_length]
+        if not comment.startswith(_COMMENT_PREFIX):
+            raise ValueError("压缩包中不包含帧索引")
+        header_offset = int(comment[len(_COMMENT_PREFIX):])
+
+        # 索引成员的压缩大小需从本地文件头中读取
+        self._file.seek(header_offset)
+        fields = _LOCAL_HEADER.unpack(self._file.read(_LOCAL_HEADER.size))
+        compress_type, compress_size = fields[3], fields[7]
+        return json.loads(self._read_member(header_offset, compress_size, compress_type))
+
+    def _read_entry(self, entry: List[Any]) -> bytes:
+        _, header_offset, compress_size, _, crc, compress_type, line_offset, line_length = entry
+        if line_offset is None:
+            return self._read_member(header_offset, compress_size, compress_type, crc)
+        if compress_type == zipfile.ZIP_STORED:
+            self._file.seek(self._data_offset(header_offset) + line_offset)
+            return self._file.read(line_length)
+
+        if self._member_cache is None or self._member_cache[0] != header_offset:
+            self._member_cache = (header_offset,
+                                  self._read_member(header_offset, compress_size, compress_type, crc))
+        return self._member_cache[1][line_offset:line_offset + line_length]
+
+    def has_frame(self, task_id: Any, frame_number: int) -> bool:
+        return str(frame_number) in self.index['frames'].get(str(task_id), {})
+
+    def read_frame_bytes(self, task_id: Any, frame_number: int) -> bytes:
+        """读取指定帧的原始字节
+
+        Args:
+            task_id: 任务ID
+            frame_number: 帧序号
+
+        Returns:
+            bytes: 帧文件内容（JSONL布局为对应的一行）
+        """
+        try:
+            entry = self.index['frames'][str(task_id)][str(frame_number)]
+        except KeyError:
+            raise KeyError(f"索引中不存在帧：taskId={task_id}, frame={frame_number}")
+        return self._read_entry(entry)
+
+    def read_frame(self, task_id: Any, frame_number: int) -> Dict[str, Any]:
+        """读取指定帧并还原为完整帧文档（自动处理共享上下文）"""
+        entry = self.index['frames'][str(task_id)][str(frame_number)]
+        document = json.loads(self._read_entry(entry))
+        if 'context' not in document:
+            return document
+
+        ref = document['context']
+        if not isinstance(ref, int):
+            ref = os.path.join(os.path.dirname(entry[0]), ref)
+        if ref not in self._context_cache:
+            if isinstance(ref, int):
+                context_entry = self.index['contexts'][ref]
+            else:
+                context_entry = self.index['members'][ref]
+            self._context_cache[ref] = json.loads(self._read_entry(context_entry))
+        return rebuild_frame_document(self._context_cache[ref], document)
+
+    def tasks(self) -> List[str]:
+        """索引中的所有任务ID"""
+        return list(self.index['frames'].keys())
+
+    def frame_numbers(self, task_id: Any) -> List[int]:
+        """指定任务已索引的帧序号"""
+        return sorted(int(n) for n in self.index['frames'].get(str(task_id), {}))
@@ -0,0 +1,560 @@
+"""
+拆帧输出格式
+支持逐帧JSON文件（默认）与JSONL分片两种输出布局，两个拆帧器共用。
+两种布局都可启用共享上下文：任务级字段每个任务只写一次，帧记录仅保留附件与标注。
+"""
+
+import os
+import re
+import json
+import zipfile
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+# 支持的输出格式
+OUTPUT_FORMATS = ('per_frame', 'jsonl')
+
+# JSONL分片方式
+SHARD_MODES = ('size', 'task')
+
+# JSONL布局下的目录与索引文件名
+JSONL_SUBDIR = 'frames'
+JSONL_INDEX_NAME = 'frames_index.json'
+JSONL_CONTEXTS_NAME = 'contexts.jsonl'
+
+# 共享上下文布局下的上下文文件后缀
+CONTEXT_SUFFIX = '_context.json'
+
+# 逐帧布局的帧文件：<原目录>/<taskId>/<原文件名>_<帧序号>.json
+FRAME_PATH_PATTERN = re.compile(r'(?:^|/)(\d+)/[^/]+_(\d{6})\.json$')
+
+
+def frame_output_path(source_path: str, task_id: Any, frame_number: int) -> str:
+    """生成逐帧输出路径（与原始frame_splitter相同结构）
+
+    Args:
+        source_path: 原始任务JSON路径
+        task_id: 任务ID
+        frame_number: 帧序号
+
+    Returns:
+        str: <原目录>/<taskId>/<原文件名>_<帧序号>.json
+    """
+    base_name = os.path.basename(source_path)
+    name_without_ext = os.path.splitext(base_name)[0]
+    dir_name = os.path.dirname(source_path)
+    return os.path.join(dir_name, str(task_id), f"{name_without_ext}_{frame_number:06d}.json")
+
+
+def context_output_path(source_path: str, task_id: Any) -> str:
+    """生成共享上下文文件路径：<原目录>/<taskId>/<原文件名>_context.json"""
+    base_name = os.path.basename(source_path)
+    name_without_ext = os.path.splitext(base_name)[0]
+    dir_name = os.path.dirname(source_path)
+    return os.path.join(dir_name, str(task_id), f"{name_without_ext}{CONTEXT_SUFFIX}")
+
+
+def split_frame_document(frame_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """将帧文档拆分为任务级共享上下文和帧级字段
+
+    Args:
+        frame_data: 完整帧文档
+
+    Returns:
+        Tuple[Dict, Dict]: (共享上下文, 帧级字段attachment/annotations)
+    """
+    task_params = frame_data.get('taskParams', {})
+    record = task_params.get('record', {})
+    result = frame_data.get('result', {})
+
+    context = {
+        "projectId": frame_data.get('projectId'),
+        "datasetId": frame_data.get('datasetId'),
+        "poolId": frame_data.get('poolId'),
+        "taskId": frame_data.get('taskId'),
+        "status": frame_data.get('status'),
+        "taskParams": {
+            "record": {
+                "attachmentType": record.get('attachmentType'),
+                "metadata": record.get('metadata')
+            },
+            "operators": task_params.get('operators')
+        },
+        "result": {
+            "hints": result.get('hints'),
+            "metadata": result.get('metadata')
+        }
+    }
+    frame_fields = {
+        "attachment": record.get('attachment'),
+        "annotations": result.get('annotations')
+    }
+    return context, frame_fields
+
+
+def rebuild_frame_document(context: Dict[str, Any], frame_record: Dict[str, Any]) -> Dict[str, Any]:
+    """由共享上下文和帧记录还原完整帧文档（字段顺序与逐帧JSON一致）
+
+    Args:
+        context: 共享上下文
+        frame_record: 帧记录
+
+    Returns:
+        Dict[str, Any]: 完整帧文档
+    """
+    return {
+        "projectId": context.get('projectId'),
+        "datasetId": context.get('datasetId'),
+        "poolId": context.get('poolId'),
+        "taskId": context.get('taskId'),
+        "status": context.get('status'),
+        "taskParams": {
+            "record": {
+                "attachmentType": context['taskParams']['record'].get('attachmentType'),
+                "attachment": frame_record.get('attachment'),
+                "metadata": context['taskParams']['record'].get('metadata')
+            },
+            "operators": context['taskParams'].get('operators')
+        },
+        "result": {
+            "annotations": frame_record.get('annotations'),
+            "hints": context['result'].get('hints'),
+            "metadata": context['result'].get('metadata')
+        }
+    }
+
+
+class FrameOutputWriter:
+    """帧输出写入器基类
+
+    写入器只负责组织输出布局，实际落盘或放入内存由emit回调决定。
+    每个任务的输出在end_task时才写出，任务中途失败时调用abort_task丢弃，不会留下部分帧。
+    """
+
+    def __init__(self, emit: Callable[[str, bytes], None], shared_context: bool = False):
+        """
+        Args:
+            emit: 输出回调，参数为(输出路径, 文件内容)
+            shared_context: 是否启用共享上下文布局
+        """
+        self.emit = emit
+        self.shared_context = shared_context
+        self.frame_count = 0
+
+    def write_frame(self, source_path: str, task_id: Any, frame_number: int,
+                    frame_data: Dict[str, Any]):
+        """写入单帧数据"""
+        raise NotImplementedError
+
+    def end_task(self, source_path: str, task_id: Any):
+        """单个任务的所有帧写入完成，写出该任务的输出"""
+        pass
+
+    def abort_task(self):
+        """丢弃当前任务已写入的帧（任务拆帧失败时调用），已完成的任务不受影响"""
+        pass
+
+    def close(self):
+        """结束写入，输出剩余数据"""
+        pass
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """任务边界处的写入器状态（可JSON序列化），用于检查点"""
+        return {'frame_count': self.frame_count}
+
+    def pending_lines(self) -> List[bytes]:
+        """已写入但尚未输出的数据行（当前分片），用于检查点"""
+        return []
+
+    def restore_state(self, state: Dict[str, Any], pending_lines: List[bytes]):
+        """从检查点恢复写入器状态
+
+        Args:
+            state: checkpoint_state()返回的状态
+            pending_lines: pending_lines()保存的数据行
+        """
+        self.frame_count = state['frame_count']
+
+
+class PerFrameWriter(FrameOutputWriter):
+    """逐帧JSON写入器（原始输出格式）
+
+    启用共享上下文时，每个任务目录下额外写入一个<原文件名>_context.json，
+    帧文件只包含附件、标注以及对上下文文件的引用。
+    """
+
+    def __init__(self, emit: Callable[[str, bytes], None], shared_context: bool = False):
+        super().__init__(emit, shared_context)
+        self._context_path: Optional[str] = None
+        # 当前任务尚未写出的文件：[(路径, 内容)]
+        self._task_files: List[Tuple[str, bytes]] = []
+        self._task_frames = 0
+
+    def write_frame(self, source_path: str, task_id: Any, frame_number: int,
+                    frame_data: Dict[str, Any]):
+        path = frame_output_path(source_path, task_id, frame_number)
+
+        if self.shared_context:
+            context, frame_fields = split_frame_document(frame_data)
+            context_path = context_output_path(source_path, task_id)
+            if context_path != self._context_path:
+                self._task_files.append(
+                    (context_path, json.dumps(context, ensure_ascii=False, indent=2).encode('utf-8')))
+                self._context_path = context_path
+            frame_data = {
+                "context": os.path.basename(context_path),
+                "frameNumber": frame_number,
+                **frame_fields
+            }
+
+        self._task_files.append((path, json.dumps(frame_data, ensure_ascii=False, indent=2).encode('utf-8')))
+        self._task_frames += 1
+
+    def end_task(self, source_path: str, task_id: Any):
+        for path, content in self._task_files:
+            self.emit(path, content)
+        self.frame_count += self._task_frames
+        self.abort_task()
+
+    def abort_task(self):
+        self._task_files = []
+        self._task_frames = 0
+        self._context_path = None
+
+
+class JsonlShardWriter(FrameOutputWriter):
+    """JSONL分片写入器
+
+    每行一个帧文档（与逐帧JSON内容相同，紧凑格式），可直接作为下游加载器输入。
+    按大小或按任务分片，并输出一个记录分片与帧位置的小索引。
+    """
+
+    def __init__(self, emit: Callable[[str, bytes], None], output_root: str = '',
+                 shard_by: str = 'size', max_shard_bytes: int = 64 * 1024 * 1024,
+                 shared_context: bool = False):
+        """
+        Args:
+            emit: 输出回调，参数为(输出路径, 文件内容)
+            output_root: 输出根目录，内存模式为空字符串
+            shard_by: 分片方式，'size'按大小，'task'每个任务一个分片
+            max_shard_bytes: 按大小分片时单个分片的最大字节数
+            shared_context: 是否启用共享上下文（上下文写入contexts.jsonl，帧记录按行号引用）
+        """
+        super().__init__(emit, shared_context)
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"不支持的分片方式：{shard_by}")
+        self.output_root = output_root
+        self.shard_by = shard_by
+        self.max_shard_bytes = max_shard_bytes
+
+        self._shard_name: Optional[str] = None
+        self._shard_lines: List[bytes] = []
+        self._shard_size = 0
+        self._shard_frames = 0
+        self._shard_seq = 0
+
+        self.shards: List[Dict[str, Any]] = []
+        self.tasks: List[Dict[str, Any]] = []
+        self._current_task: Optional[Dict[str, Any]] = None
+
+        self._contexts: List[bytes] = []
+        self._context_ref: Optional[int] = None
+
+        # 当前任务尚未写入分片的帧：[(帧序号, 数据行)]，以及尚未写入的共享上下文
+        self._task_lines: List[Tuple[int, bytes]] = []
+        self._task_context: Optional[bytes] = None
+
+    def _shard_path(self, shard_name: str) -> str:
+        return os.path.join(self.output_root, JSONL_SUBDIR, shard_name)
+
+    def _open_shard(self, task_id: Any):
+        if self.shard_by == 'task':
+            self._shard_name = f"{task_id}.jsonl"
+        else:
+            self._shard_name = f"frames-{self._shard_seq:05d}.jsonl"
+        self._shard_seq += 1
+        self._shard_lines = []
+        self._shard_size = 0
+        self._shard_frames = 0
+
+    def _flush_shard(self):
+        if self._shard_name is None:
+            return
+        if self._shard_lines:
+            self.emit(self._shard_path(self._shard_name), b''.join(self._shard_lines))
+            self.shards.append({
+                'path': f"{JSONL_SUBDIR}/{self._shard_name}",
+                'frames': self._shard_frames,
+                'bytes': self._shard_size
+            })
+        self._shard_name = None
+        self._shard_lines = []
+
+    def write_frame(self, source_path: str, task_id: Any, frame_number: int,
+                    frame_data: Dict[str, Any]):
+        if self.shared_context:
+            context, frame_fields = split_frame_document(frame_data)
+            if self._task_context is None:
+                self._task_context = \
+                    json.dumps(context, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            # 上下文在end_task时追加到contexts.jsonl末尾，行号即当前上下文数
+            frame_data = {"context": len(self._contexts), "frameNumber": frame_number, **frame_fields}
+
+        line = json.dumps(frame_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._task_lines.append((frame_number, line))
+
+    def _append_line(self, source_path: str, task_id: Any, frame_number: int, line: bytes):
+        """把已完成任务的一行写入当前分片"""
+        if self._shard_name is None:
+            self._open_shard(task_id)
+        elif self.shard_by == 'size' and self._shard_size and \
+                self._shard_size + len(line) > self.max_shard_bytes:
+            self._flush_shard()
+            self._open_shard(task_id)
+
+        task = self._current_task
+        if task is None or task['shard'] != f"{JSONL_SUBDIR}/{self._shard_name}":
+            # 同一任务跨分片时拆成多条索引记录
+            task = {
+                'taskId': task_id,
+                'source': source_path,
+                'context': self._context_ref,
+                'shard': f"{JSONL_SUBDIR}/{self._shard_name}",
+                'frames': [],
+                'offsets': [],
+                'lengths': []
+            }
+            self.tasks.append(task)
+            self._current_task = task
+
+        task['frames'].append(frame_number)
+        task['offsets'].append(self._shard_size)
+        task['lengths'].append(len(line))
+
+        self._shard_lines.append(line)
+        self._shard_size += len(line)
+        self._shard_frames += 1
+        self.frame_count += 1
+
+    def end_task(self, source_path: str, task_id: Any):
+        if self._task_context is not None:
+            self._context_ref = len(self._contexts)
+            self._contexts.append(self._task_context)
+        for frame_number, line in self._task_lines:
+            self._append_line(source_path, task_id, frame_number, line)
+        self.abort_task()
+        self._current_task = None
+        self._context_ref = None
+        if self.shard_by == 'task':
+            self._flush_shard()
+
+    def abort_task(self):
+        self._task_lines = []
+        self._task_context = None
+
+    def close(self):
+        self._flush_shard()
+        if self._contexts:
+            self.emit(os.path.join(self.output_root, JSONL_SUBDIR, JSONL_CONTEXTS_NAME),
+                      b''.join(self._contexts))
+        index = {
+            'format': 'jsonl',
+            'shard_by': self.shard_by,
+            'shared_context': self.shared_context,
+            'contexts': f"{JSONL_SUBDIR}/{JSONL_CONTEXTS_NAME}" if self._contexts else None,
+            'frame_count': self.frame_count,
+            'shards': self.shards,
+            'tasks': self.tasks
+        }
+        self.emit(os.path.join(self.output_root, JSONL_INDEX_NAME),
+                  json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return {
+            'frame_count': self.frame_count,
+            'shard_name': self._shard_name,
+            'shard_size': self._shard_size,
+            'shard_frames': self._shard_frames,
+            'shard_seq': self._shard_seq,
+            'shards': self.shards,
+            'tasks': self.tasks,
+            'contexts': [context.decode('utf-8') for context in self._contexts]
+        }
+
+    def pending_lines(self) -> List[bytes]:
+        return self._shard_lines
+
+    def restore_state(self, state: Dict[str, Any], pending_lines: List[bytes]):
+        self.frame_count = state['frame_count']
+        self._shard_name = state['shard_name']
+        self._shard_lines = list(pending_lines)
+        self._shard_size = state['shard_size']
+        self._shard_frames = state['shard_frames']
+        self._shard_seq = state['shard_seq']
+        self.shards = state['shards']
+        self.tasks = state['tasks']
+        self._contexts = [context.encode('utf-8') for context in state['contexts']]
+        self._current_task = None
+        self._context_ref = None
+        self.abort_task()
+
+
+def create_frame_writer(output_config: Optional[Dict[str, Any]],
+                        emit: Callable[[str, bytes], None],
+                        output_root: str = '') -> FrameOutputWriter:
+    """根据输出配置创建写入器
+
+    Args:
+        output_config: frame_extraction.output配置
+        emit: 输出回调，参数为(输出路径, 文件内容)
+        output_root: 输出根目录，内存模式为空字符串
+
+    Returns:
+        FrameOutputWriter: 写入器实例
+    """
+    output_config = output_config or {}
+    output_format = output_config.get('format') or 'per_frame'
+    shared_context = bool(output_config.get('shared_context', False))
+
+    if output_format == 'per_frame':
+        return PerFrameWriter(emit, shared_context=shared_context)
+    elif output_format == 'jsonl':
+        return JsonlShardWriter(
+            emit,
+            output_root=output_root,
+            shard_by=output_config.get('shard_by') or 'size',
+            max_shard_bytes=int(output_config.get('max_shard_mb') or 64) * 1024 * 1024,
+            shared_context=shared_context
+        )
+    else:
+        raise ValueError(f"不支持的输出格式：{output_format}")
+
+
+def write_file(path: str, content: bytes):
+    """文件系统输出回调"""
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def iter_jsonl_frames(content: bytes):
+    """逐行读取JSONL分片中的帧文档
+
+    Args:
+        content: 分片文件内容
+
+    Yields:
+        Dict[str, Any]: 帧文档
+    """
+    for line in content.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+class FrameDocumentReader:
+    """帧文档读取器
+
+    按需将任一输出布局（逐帧JSON/JSONL，是否共享上下文）还原为逐帧JSON文档，
+    任务上下文只解析一次并缓存。
+    """
+
+    def __init__(self, read_file: Callable[[str], bytes], names: Iterable[str]):
+        """
+        Args:
+            read_file: 按路径读取文件内容的回调
+            names: 所有文件路径
+        """
+        self.read_file = read_file
+        self.names = list(names)
+        self._contexts: Dict[Any, Dict[str, Any]] = {}
+        self._jsonl_index: Optional[Dict[str, Any]] = None
+
+        index_names = [n for n in self.names if os.path.basename(n) == JSONL_INDEX_NAME]
+        if index_names:
+            self._index_path = index_names[0]
+            self._jsonl_index = json.loads(self.read_file(self._index_path))
+
+    @classmethod
+    def from_files(cls, files: Dict[str, bytes]) -> 'FrameDocumentReader':
+        """从内存文件字典创建"""
+        return cls(files.__getitem__, files.keys())
+
+    @classmethod
+    def from_zip(cls, zip_file: zipfile.ZipFile) -> 'FrameDocumentReader':
+        """从已打开的ZIP文件创建"""
+        return cls(zip_file.read, zip_file.namelist())
+
+    @classmethod
+    def from_directory(cls, root: str) -> 'FrameDocumentReader':
+        """从输出目录创建"""
+        names = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                names.append(os.path.relpath(os.path.join(dirpath, filename), root))
+
+        def read_file(name):
+            with open(os.path.join(root, name), 'rb') as f:
+                return f.read()
+
+        return cls(read_file, names)
+
+    def _resolve(self, relative: str) -> str:
+        root = os.path.dirname(self._index_path)
+        return os.path.join(root, relative) if root else relative
+
+    def _jsonl_context(self, ref: int) -> Dict[str, Any]:
+        if not self._contexts:
+            content = self.read_file(self._resolve(self._jsonl_index['contexts']))
+            for i, context in enumerate(iter_jsonl_frames(content)):
+                self._contexts[i] = context
+        return self._contexts[ref]
+
+    def _file_context(self, frame_path: str, context_name: str) -> Dict[str, Any]:
+        context_path = os.path.join(os.path.dirname(frame_path), context_name)
+        if context_path not in self._contexts:
+            self._contexts[context_path] = json.loads(self.read_file(context_path))
+        return self._contexts[context_path]
+
+    def frames(self) -> Iterator[Tuple[Any, int, Dict[str, Any]]]:
+        """遍历所有帧
+
+        Yields:
+            Tuple[taskId, 帧序号, 完整帧文档]
+        """
+        if self._jsonl_index is not None:
+            yield from self._jsonl_frames()
+            return
+
+        for name in sorted(self.names):
+            match = FRAME_PATH_PATTERN.search(name)
+            if not match:
+                continue
+            document = json.loads(self.read_file(name))
+            if 'context' in document:
+                context = self._file_context(name, document['context'])
+                document = rebuild_frame_document(context, document)
+            yield document.get('taskId', match.group(1)), int(match.group(2)), document
+
+    def _jsonl_frames(self) -> Iterator[Tuple[Any, int, Dict[str, Any]]]:
+        shared = self._jsonl_index.get('shared_context', False)
+        shard_cache: Dict[str, bytes] = {}
+        for task in self._jsonl_index['tasks']:
+            shard = task['shard']
+            if shard not in shard_cache:
+                shard_cache.clear()
+                shard_cache[shard] = self.read_file(self._resolve(shard))
+            content = shard_cache[shard]
+            for frame_number, offset, length in zip(task['frames'], task['offsets'], task['lengths']):
+                document = json.loads(content[offset:offset + length])
+                if shared:
+                    document = rebuild_frame_document(self._jsonl_context(document['context']), document)
+                yield task['taskId'], frame_number, document
+
+    def frame(self, task_id: Any, frame_number: int) -> Optional[Dict[str, Any]]:
+        """读取指定任务的指定帧，不存在时返回None"""
+        for current_task, current_frame, document in self.frames():
+            if str(current_task) == str(task_id) and current_frame == frame_number:
+                return document
+        return None
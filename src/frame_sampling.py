@@ -0,0 +1,61 @@
+"""
+拆帧抽样策略
+按步长、均匀K帧、指定帧序号或首尾帧选择需要输出的帧，用于QA抽检等只需部分帧的场景
+"""
+
+from typing import Dict, Any, List, Optional, Sequence
+
+
+# 支持的抽样方式
+SAMPLING_MODES = ('all', 'stride', 'uniform', 'indices', 'first_last')
+
+
+def select_frames(frame_numbers: Sequence[int], sampling: Optional[Dict[str, Any]]) -> Sequence[int]:
+    """按抽样配置从候选帧中选择输出帧
+
+    Args:
+        frame_numbers: 候选帧序号（已按帧范围裁剪，升序）
+        sampling: 抽样配置（frame_extraction.sampling），mode为all或未配置时不抽样
+            - stride: 每stride帧取一帧，从第一帧开始
+            - uniform: 均匀取count帧，包含首尾帧
+            - indices: 取indices中指定的帧序号，负数表示从末尾倒数
+            - first_last: 只取首帧和尾帧
+
+    Returns:
+        Sequence[int]: 选中的帧序号（升序）
+    """
+    mode = (sampling or {}).get('mode') or 'all'
+    if mode == 'all' or not frame_numbers:
+        return frame_numbers
+
+    total = len(frame_numbers)
+
+    if mode == 'stride':
+        stride = max(int(sampling.get('stride') or 1), 1)
+        return frame_numbers[::stride]
+
+    if mode == 'uniform':
+        count = max(int(sampling.get('count') or 1), 1)
+        if count >= total:
+            return frame_numbers
+        if count == 1:
+            return [frame_numbers[0]]
+        positions = sorted({round(i * (total - 1) / (count - 1)) for i in range(count)})
+        return [frame_numbers[p] for p in positions]
+
+    if mode == 'indices':
+        last_frame = frame_numbers[-1]
+        candidates = set(frame_numbers)
+        selected = set()
+        for index in sampling.get('indices') or []:
+            index = int(index)
+            if index < 0:
+                index = last_frame + 1 + index
+            if index in candidates:
+                selected.add(index)
+        return sorted(selected)
+
+    if mode == 'first_last':
+        return [frame_numbers[0]] if total == 1 else [frame_numbers[0], frame_numbers[-1]]
+
+    raise ValueError(f"不支持的抽帧方式：{mode}")
@@ -5,11 +5,17 @@
 
 import os
 import json
-import numpy as np
 from glob import glob
-from tqdm import tqdm
 from typing import Union, Optional, List, Dict, Any
 import shutil
+import logging
+# 与内存版共用的模块以顶层名称导入，只加载一次（见src/__init__.py）
+from frame_output import create_frame_writer, write_file, FrameOutputWriter
+from annotation_partition import AnnotationPartition, DEFAULT_FRAME_KEY
+from task_filter import TaskFilter
+from frame_sampling import select_frames
+from checkpoint import Checkpoint
+from event_log import EventLog
 
 
 class Camera:
@@ -55,14 +61,6 @@ def empty(obj):
     return obj is None
 
 
-def frame_name(original_path: str, frame_number: int) -> str:
-    """生成帧文件名"""
-    base_name = os.path.basename(original_path)
-    name_without_ext = os.path.splitext(base_name)[0]
-    dir_name = os.path.dirname(original_path)
-    return os.path.join(dir_name, f"{name_without_ext}_{frame_number:06d}.json")
-
-
 class FrameSplitter:
     """帧数据拆帧器"""
     
@@ -73,8 +71,29 @@ class FrameSplitter:
         "POINTCLOUD_SET_SEQUENCE"
     ]
     
-    def __init__(self):
-        pass
+    def __init__(self, output_config: Optional[Dict[str, Any]] = None,
+                 partition_annotations: bool = False,
+                 task_filter: Optional[TaskFilter] = None,
+                 sampling: Optional[Dict[str, Any]] = None,
+                 annotation_frame_key: str = DEFAULT_FRAME_KEY):
+        """
+        Args:
+            output_config: 输出配置（frame_extraction.output），默认逐帧JSON
+            partition_annotations: 是否将标注条目按帧分配到各帧（默认仅保留空结构）
+            task_filter: 任务过滤条件，不符合条件的任务不拆帧，源文件保留不动
+            sampling: 抽帧配置（frame_extraction.sampling），默认输出全部帧
+            annotation_frame_key: 标注条目中的帧序号字段（frame_extraction.annotation_frame_key）
+        """
+        self.output_config = output_config or {}
+        self.partition_annotations = partition_annotations
+        self.annotation_frame_key = annotation_frame_key or DEFAULT_FRAME_KEY
+        self.task_filter = task_filter
+        self.sampling = sampling
+        self.writer: Optional[FrameOutputWriter] = None
+        # 任务拆帧完成后的回调，设置时由回调负责删除源文件（用于记录检查点）
+        self.on_task_done = None
+        # 逐文件的日志按类型聚合
+        self.events = EventLog('split')
     
     def load_json(self, json_path: str) -> Dict[str, Any]:
         """加载JSON文件"""
@@ -84,14 +103,26 @@ class FrameSplitter:
     def process_file(self, json_path: str) -> bool:
         """处理单个JSON文件"""
         try:
-            data = self.load_json(json_path)
+            if self.task_filter is not None:
+                # 完整解析前先按头部字段过滤
+                with open(json_path, 'rb') as f:
+                    head = f.read(self.task_filter.header_bytes)
+                    if not self.task_filter.accepts_header(head):
+                        self.events.event('filtered', f"过滤条件跳过: {json_path}", label="过滤条件跳过")
+                        return True
+                    data = json.loads(head + f.read())
+                if not self.task_filter.accepts_task(data):
+                    self.events.event('filtered', f"过滤条件跳过: {json_path}", label="过滤条件跳过")
+                    return True
+            else:
+                data = self.load_json(json_path)
             
             # 检查是否是序列类型
             record = data.get('taskParams', {}).get('record', {})
             attachment_type = record.get('attachmentType', '')
             
             if attachment_type not in self.SEQUENCE_TYPES:
-                print(f"跳过非序列文件: {json_path}")
+                self.events.event('skipped_non_sequence', f"跳过非序列文件: {json_path}", label="跳过非序列文件")
                 return True
             
             # 提取基本信息
@@ -113,49 +144,82 @@ class FrameSplitter:
             result_metadata = data.get('result', {}).get('metadata', {})
             
             if attachment_length == 0:
-                print(f"跳过无附件的文件: {json_path}")
+                self.events.event('skipped_no_attachment', f"跳过无附件的文件: {json_path}",
+                                  label="跳过无附件的文件")
                 return True
             
-            # 为每一帧创建新文件
-            for frame_number in range(attachment_length):
-                frame_data = self._create_frame_data(
-                    project_id, dataset_id, pool_id, task_id, status,
-                    attachment_type, attachment, metadata, operators,
-                    result_annotations, result_hints, result_metadata,
-                    frame_number
-                )
-                
-                # 生成新文件路径
-                new_path = frame_name(json_path, frame_number)
-                task_dir = os.path.join(os.path.dirname(new_path), str(task_id))
-                os.makedirs(task_dir, exist_ok=True)
-                
-                final_path = os.path.join(task_dir, os.path.basename(new_path))
-                
-                with open(final_path, 'w', encoding='utf-8') as f:
-                    json.dump(frame_data, f, ensure_ascii=False, indent=2)
+            # 单独调用时自行创建写入器，处理完即关闭
+            owns_writer = self.writer is None
+            if owns_writer:
+                self.writer = create_frame_writer(self.output_config, write_file,
+                                                  os.path.dirname(json_path))
+            
+            # 按帧分配标注：一次遍历建立帧索引
+            partition = None
+            if self.partition_annotations:
+                partition = AnnotationPartition(result_annotations, self._create_empty_annotation,
+                                                self.annotation_frame_key)
+                message = partition.unassigned_message()
+                if message:
+                    self.events.event('unassigned_annotations', f"{json_path}: {message}", logging.WARNING,
+                                      label="标注条目缺少帧序号", file=json_path, items=partition.unassigned)
+            
+            # 序列化前按帧范围裁剪
+            frame_numbers = self.task_filter.frame_range(attachment_length) \
+                if self.task_filter is not None else range(attachment_length)
+            frame_numbers = select_frames(frame_numbers, self.sampling)
+            
+            # 为每一帧创建新文件，任务的输出在end_task时才写出，失败时丢弃
+            try:
+                for frame_number in frame_numbers:
+                    frame_data = self._create_frame_data(
+                        project_id, dataset_id, pool_id, task_id, status,
+                        attachment_type, attachment, metadata, operators,
+                        result_annotations, result_hints, result_metadata,
+                        frame_number, partition
+                    )
+                    self.writer.write_frame(json_path, task_id, frame_number, frame_data)
+                self.writer.end_task(json_path, task_id)
+            except BaseException:
+                self.writer.abort_task()
+                raise
+            finally:
+                if owns_writer:
+                    self.writer.close()
+                    self.writer = None
             
-            # 删除原始文件
-            os.remove(json_path)
-            print(f"已处理: {json_path} -> {attachment_length} 帧")
+            if self.on_task_done is not None:
+                # 检查点保存后再删除原始文件，中断时不会丢失尚未保存的任务
+                self.on_task_done(json_path)
+            else:
+                # 删除原始文件
+                os.remove(json_path)
+            self.events.event('processed', f"已处理: {json_path} -> {len(frame_numbers)} 帧", label="已处理",
+                              frames=len(frame_numbers))
             return True
             
         except Exception as e:
-            print(f"处理文件失败 {json_path}: {str(e)}")
+            self.events.event('failed', f"处理文件失败 {json_path}: {str(e)}", logging.WARNING,
+                              label="处理文件失败", file=json_path, error=str(e))
             return False
     
     def _create_frame_data(self, project_id: int, dataset_id: int, pool_id: int, 
                           task_id: int, status: int, attachment_type: str,
                           attachment: List[Dict], metadata: Dict, operators: List[Dict],
                           result_annotations: List[Dict], result_hints: List[Dict],
-                          result_metadata: Dict, frame_number: int) -> Dict[str, Any]:
+                          result_metadata: Dict, frame_number: int,
+                          partition: Optional[AnnotationPartition] = None) -> Dict[str, Any]:
         """创建单帧数据"""
         
-        # 创建空的标注结构
-        frame_annotations = []
-        for annotation in result_annotations:
-            frame_annotation = self._create_empty_annotation(annotation)
-            frame_annotations.append(frame_annotation)
+        if partition is not None:
+            # 填入属于该帧的标注条目
+            frame_annotations = partition.annotations_for_frame(frame_number)
+        else:
+            # 创建空的标注结构
+            frame_annotations = []
+            for annotation in result_annotations:
+                frame_annotation = self._create_empty_annotation(annotation)
+                frame_annotations.append(frame_annotation)
         
         return {
             "projectId": project_id,
@@ -213,8 +277,13 @@ class FrameSplitter:
                 'color': annotation.get('color', '')
             }
     
-    def split_frames(self, project_path: str) -> bool:
-        """拆帧主函数"""
+    def split_frames(self, project_path: str, checkpoint: Optional[Checkpoint] = None) -> bool:
+        """拆帧主函数
+        
+        Args:
+            project_path: 项目数据路径
+            checkpoint: 检查点，中断后恢复时跳过已完成的任务并恢复写入器状态
+        """
         if not os.path.exists(project_path):
             print(f"项目路径不存在: {project_path}")
             return False
@@ -232,22 +301,54 @@ class FrameSplitter:
         
         print(f"找到 {len(json_files)} 个JSON文件，开始拆帧...")
         
+        self.events = EventLog('split')
+        self.writer = create_frame_writer(self.output_config, write_file, project_path)
+        if checkpoint is not None:
+            json_files = checkpoint.split_sources(json_files)
+            checkpoint.restore_writer(self.writer)
+            self.on_task_done = lambda json_path: checkpoint.record_task(
+                json_path, self.writer, on_saved=lambda: os.remove(json_path))
+        
         # 处理每个文件
+        from tqdm import tqdm
         success_count = 0
         for json_file in tqdm(json_files, desc="拆帧进度"):
+            if checkpoint is not None and (checkpoint.task_done(json_file) or not os.path.exists(json_file)):
+                # 之前的运行已完成（源文件已删除）
+                success_count += 1
+                continue
             if self.process_file(json_file):
                 success_count += 1
         
+        if checkpoint is not None:
+            # 保存剩余任务并删除其源文件
+            checkpoint.save(self.writer)
+        self.writer.close()
+        self.writer = None
+        self.on_task_done = None
+        
+        self.events.summary()
         print(f"拆帧完成！成功处理 {success_count}/{len(json_files)} 个文件")
         return success_count > 0
 
 
-def to_split(project_path: str) -> bool:
+def to_split(project_path: str, output_config: Optional[Dict[str, Any]] = None,
+             partition_annotations: bool = False,
+             task_filter: Optional[TaskFilter] = None,
+             sampling: Optional[Dict[str, Any]] = None,
+             checkpoint: Optional[Checkpoint] = None,
+             annotation_frame_key: str = DEFAULT_FRAME_KEY) -> bool:
     """拆帧的简化接口"""
-    splitter = FrameSplitter()
-    return splitter.split_frames(project_path)
+    splitter = FrameSplitter(output_config, partition_annotations, task_filter, sampling, annotation_frame_key)
+    return splitter.split_frames(project_path, checkpoint)
 
 
-def to_split_new(project_path: str) -> bool:
+def to_split_new(project_path: str, output_config: Optional[Dict[str, Any]] = None,
+                 partition_annotations: bool = False,
+                 task_filter: Optional[TaskFilter] = None,
+                 sampling: Optional[Dict[str, Any]] = None,
+                 checkpoint: Optional[Checkpoint] = None,
+                 annotation_frame_key: str = DEFAULT_FRAME_KEY) -> bool:
     """新的拆帧接口（兼容旧版本）"""
-    return to_split(project_path)
\ No newline at end of file
+    return to_split(project_path, output_config, partition_annotations, task_filter, sampling, checkpoint,
+                    annotation_frame_key)
\ No newline at end of file
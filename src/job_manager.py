@@ -0,0 +1,370 @@
+"""
+后台任务管理器
+进程级的工作线程池，任务在Streamlit脚本重跑和浏览器刷新后继续运行。
+相同参数的请求共享同一个任务，任务状态和结果持久化到磁盘，页面通过任务ID轮询。
+任务经调度器（scheduler.JobScheduler）排队，按并发数和内存令牌准入，各用户轮流出队。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Callable, List, Optional
+
+from result_store import ResultStore, DEFAULT_TTL_HOURS
+from result_manifest import manifest_summary
+from cancellation import CancellationToken, OperationCancelled
+from scheduler import JobScheduler, QueueFull, WAIT_REASON_NAMES
+
+
+# 默认任务目录
+DEFAULT_JOB_ROOT = os.path.join(tempfile.gettempdir(), 'rosetta_jobs')
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+STATE_FILE = 'state.json'
+RESULT_FILE = 'result.json'
+
+# 不参与任务ID计算的参数（不影响处理结果）
+_IGNORED_PARAMS = ('password',)
+
+
+def job_id_for(params: Dict[str, Any]) -> str:
+    """根据处理参数计算任务ID，参数相同的请求得到相同的ID
+
+    Args:
+        params: 处理参数
+
+    Returns:
+        str: 任务ID
+    """
+    normalized = {key: value for key, value in params.items()
+                  if key not in _IGNORED_PARAMS and value is not None}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    # 先写临时文件再替换，避免读到写了一半的状态
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class Job:
+    """后台任务"""
+
+    def __init__(self, job_id: str, project_id: Any = None):
+        self.job_id = job_id
+        self.project_id = project_id
+        self.status = JOB_QUEUED
+        self.progress = 0
+        self.message = '排队中'
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_token = CancellationToken()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'project_id': self.project_id,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'Job':
+        job = cls(state['job_id'], state.get('project_id'))
+        for key in ('status', 'progress', 'message', 'error', 'created_at', 'started_at', 'finished_at'):
+            if key in state:
+                setattr(job, key, state[key])
+        return job
+
+
+class JobManager:
+    """后台任务管理器"""
+
+    def __init__(self, run_job: Callable[[Dict[str, Any], Callable[[int, str], None]], Dict[str, Any]],
+                 root: str = DEFAULT_JOB_ROOT, max_workers: int = 2,
+                 store: Optional[ResultStore] = None, scheduler: Optional[JobScheduler] = None):
+        """
+        Args:
+            run_job: 任务处理函数，参数为处理参数、进度回调和取消令牌，返回处理结果（zip_data为结果压缩包）
+            root: 任务状态的存放目录
+            max_workers: 同时运行的任务数（未指定scheduler时使用）
+            store: 结果压缩包存储，为None时在任务目录下创建
+            scheduler: 任务调度器，为None时按max_workers创建
+        """
+        self.run_job = run_job
+        self.root = root
+        self.store = store or ResultStore(os.path.join(root, '_results'))
+        self.scheduler = scheduler or JobScheduler(max_jobs=max_workers)
+        self.max_workers = self.scheduler.max_jobs
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_persisted()
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _load_persisted(self):
+        """加载磁盘上的历史任务，进程重启前未完成的任务标记为失败"""
+        for job_id in os.listdir(self.root):
+            if job_id.startswith('_'):
+                continue
+            state_path = os.path.join(self._job_dir(job_id), STATE_FILE)
+            if not os.path.isfile(state_path):
+                continue
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    job = Job.from_state(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ 跳过无法读取的任务状态 {state_path}: {str(e)}")
+                continue
+            if job.is_active:
+                job.status = JOB_FAILED
+                job.error = '服务重启，任务已中断，请重新提交（将从检查点继续）'
+                job.message = job.error
+                self._persist_state(job)
+            self._jobs[job.job_id] = job
+
+    def _persist_state(self, job: Job):
+        os.makedirs(self._job_dir(job.job_id), exist_ok=True)
+        _write_json(os.path.join(self._job_dir(job.job_id), STATE_FILE), job.to_state())
+
+    def _store_result(self, job: Job, result: Dict[str, Any]) -> Dict[str, Any]:
+        """结果压缩包写入结果存储，内存中只保留结果信息和句柄"""
+        result = dict(result)
+        zip_data = result.pop('zip_data', None)
+        result.pop('files', None)
+        manifest = result.pop('manifest', None)
+        if manifest is not None:
+            result.update(manifest_summary(manifest))
+        if zip_data is not None:
+            result['handle'] = self.store.put(zip_data, result, manifest)
+            result['size_bytes'] = len(zip_data)
+        _write_json(os.path.join(self._job_dir(job.job_id), RESULT_FILE), result)
+        return result
+
+    def submit(self, params: Dict[str, Any], user: Optional[str] = None) -> Job:
+        """提交任务，参数相同的任务正在排队或运行时直接返回该任务
+
+        Args:
+            params: 处理参数
+            user: 提交任务的用户（公平调度按用户轮转），默认使用params中的username
+
+        Returns:
+            Job: 任务
+
+        Raises:
+            QueueFull: 排队任务数已达上限
+        """
+        job_id = job_id_for(params)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.is_active:
+                print(f"复用进行中的任务 {job_id}（项目 {job.project_id}）")
+                return job
+            previous = job
+            job = Job(job_id, params.get('project_id'))
+            self._persist_state(job)
+            try:
+                self.scheduler.submit(job_id, lambda: self._run(job, params),
+                                      user=user or params.get('username'),
+                                      memory_mb=self.scheduler.estimate_mb(params))
+            except QueueFull:
+                # 队列已满：恢复之前的任务记录
+                if previous is not None:
+                    self._persist_state(previous)
+                else:
+                    shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                raise
+            self._jobs[job_id] = job
+
+        print(f"提交任务 {job_id}（项目 {job.project_id}）")
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中或运行中的任务
+
+        运行中的任务在当前下载分块、解压成员、帧或打包条目结束时退出，
+        共享该任务的其他请求也会一起停止。
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 是否发出了取消请求
+        """
+        job = self._jobs.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        print(f"请求取消任务 {job_id}")
+        job.cancel_token.cancel()
+        if self.scheduler.cancel(job_id):
+            # 还在排队，直接移出队列
+            self._mark_cancelled(job)
+            return True
+        job.message = '正在取消...'
+        self._persist_state(job)
+        return True
+
+    def _run(self, job: Job, params: Dict[str, Any]):
+        if job.cancel_token.is_cancelled:
+            self._mark_cancelled(job)
+            return
+
+        job.status = JOB_RUNNING
+        job.message = '处理中'
+        job.started_at = time.time()
+        self._persist_state(job)
+
+        def update_progress(percent: int, message: str):
+            job.progress = percent
+            job.message = message
+            self._persist_state(job)
+
+        try:
+            job.result = self._store_result(job, self.run_job(params, update_progress, job.cancel_token))
+            self.scheduler.learn(job.project_id, (job.result.get('metrics') or {}).get('memory'))
+            job.status = JOB_COMPLETED
+            job.message = '处理完成'
+        except OperationCancelled:
+            print(f"任务 {job.job_id} 已取消")
+            job.status = JOB_CANCELLED
+            job.message = '任务已取消'
+        except Exception as e:
+            print(f"❌ 任务 {job.job_id} 失败：{str(e)}")
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.message = f'处理失败: {str(e)}'
+        finally:
+            job.finished_at = time.time()
+            self._persist_state(job)
+
+    def _mark_cancelled(self, job: Job):
+        job.status = JOB_CANCELLED
+        job.message = '任务已取消'
+        job.finished_at = time.time()
+        self._persist_state(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """按任务ID获取任务"""
+        return self._jobs.get(job_id)
+
+    def queue_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """排队中任务的位置和等待原因（见JobScheduler.status），另附说明文字message"""
+        status = self.scheduler.status(job_id)
+        if status is not None:
+            status['message'] = (f"排队中：第 {status['position']} 位（前面 {status['ahead']} 个任务），"
+                                 f"{WAIT_REASON_NAMES[status['waiting_for']]}")
+        return status
+
+    def list_jobs(self) -> List[Job]:
+        """所有任务，最新提交的在前"""
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def load_result(self, job: Job) -> Optional[Dict[str, Any]]:
+        """获取已完成任务的结果信息（不含文件数据），内存中没有时从磁盘读取
+
+        结果压缩包通过 store.open(result['handle']) 按需读取。
+
+        Args:
+            job: 任务
+
+        Returns:
+            Optional[Dict[str, Any]]: 结果信息，任务未完成或结果已过期时返回None
+        """
+        if job.status != JOB_COMPLETED:
+            return None
+        if job.result is None:
+            try:
+                with open(os.path.join(self._job_dir(job.job_id), RESULT_FILE), 'r', encoding='utf-8') as f:
+                    job.result = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取任务 {job.job_id} 的结果失败：{str(e)}")
+                return None
+
+        handle = job.result.get('handle')
+        if handle and not self.store.exists(handle):
+            return None
+        if handle:
+            self.store.touch(handle)
+        return job.result
+
+    def expire_jobs(self):
+        """清理超过结果保留时间的已结束任务"""
+        deadline = time.time() - self.store.ttl_seconds
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if not job.is_active and (job.finished_at or job.created_at) < deadline]
+            for job in expired:
+                handle = (job.result or {}).get('handle')
+                if handle and self.store.exists(handle):
+                    # 结果仍在被访问，保留任务
+                    continue
+                del self._jobs[job.job_id]
+                shutil.rmtree(self._job_dir(job.job_id), ignore_errors=True)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(run_job: Callable[[Dict[str, Any], Callable[[int, str], None]], Dict[str, Any]],
+                    root: Optional[str] = None, max_workers: Optional[int] = None) -> JobManager:
+    """获取进程级的任务管理器，首次调用时创建
+
+    Streamlit每次交互都会重新执行页面脚本，但已导入的模块会保留，
+    因此管理器和其中运行的任务不受页面重跑影响。
+
+    Args:
+        run_job: 任务处理函数
+        root: 任务目录，默认使用环境变量ROSETTA_JOB_DIR或系统临时目录
+        max_workers: 同时运行的任务数，默认使用环境变量ROSETTA_JOB_WORKERS或2；
+            其他调度参数见JobScheduler.from_env
+
+    Returns:
+        JobManager: 任务管理器
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            root = root or os.environ.get('ROSETTA_JOB_DIR') or DEFAULT_JOB_ROOT
+            store = ResultStore(
+                os.environ.get('ROSETTA_RESULT_DIR') or os.path.join(root, '_results'),
+                ttl_hours=float(os.environ.get('ROSETTA_RESULT_TTL_HOURS', DEFAULT_TTL_HOURS))
+            )
+            _manager = JobManager(
+                run_job,
+                root=root,
+                store=store,
+                scheduler=JobScheduler.from_env(max_workers)
+            )
+            # 定时清理过期结果和对应的任务记录
+            store.start_sweeper(on_sweep=_manager.expire_jobs)
+        return _manager
@@ -0,0 +1,502 @@
+"""
+内存预算与执行模式
+内存版管道默认把导出压缩包、解压文件、拆帧结果和结果压缩包都放在内存中，大项目会超出容器内存。
+本模块按作业预估大小选择执行模式，并跟踪各缓冲区的实际占用，超出预算时中途转为磁盘：
+- memory：全部放在内存中（小项目，最快）
+- spooled：先放内存，本作业占用超过分配的份额后，后续数据写入临时目录
+- disk：从一开始就写入临时目录，内存中只保留路径；压缩包通过mmap按需映射读取
+
+作业大小在下载时根据Content-Length、OSS对象大小或导出记录中的文件大小预估，
+峰值占用按压缩包大小乘以peak_ratio（解压文件 + 拆帧输出 + 结果压缩包）估算。
+进程内所有作业共享一个预算，任一作业使占用超过预算时，该作业立即转为磁盘模式。
+"""
+
+import io
+import os
+import mmap
+import shutil
+import tempfile
+import threading
+import weakref
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+
+MODES = ('memory', 'spooled', 'disk')
+
+# 峰值占用约为导出压缩包大小的倍数（合成数据：解压约6倍，逐帧输出约17倍）
+DEFAULT_PEAK_RATIO = 20
+# 未配置预算时使用容器（或物理）内存的比例，其余留给解释器、JSON解析和Streamlit
+DEFAULT_BUDGET_FRACTION = 0.6
+DEFAULT_BUDGET_MB = 2048
+
+_MB = 1024 * 1024
+
+_budget_lock = threading.Lock()
+_budget: Optional['MemoryBudget'] = None
+
+
+def detect_memory_limit_mb() -> Optional[float]:
+    """容器内存上限（cgroup v2/v1），不在容器中时返回物理内存，都无法获取时返回None"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # 未限制时为max或接近2^63的值
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) / _MB
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / _MB
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_budget_mb() -> float:
+    """默认进程内存预算：环境变量ROSETTA_MEMORY_BUDGET_MB，否则为内存上限的60%"""
+    configured = os.environ.get('ROSETTA_MEMORY_BUDGET_MB')
+    if configured:
+        return float(configured)
+    limit = detect_memory_limit_mb()
+    return limit * DEFAULT_BUDGET_FRACTION if limit else DEFAULT_BUDGET_MB
+
+
+class _MappedReader(io.RawIOBase):
+    """只读mmap的文件对象（mmap本身缺少zipfile需要的seekable），各读取器的位置互不影响"""
+
+    def __init__(self, data: mmap.mmap):
+        self._data = data
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._data[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._data)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def open_buffer(data) -> io.IOBase:
+    """把压缩包数据（bytes或磁盘缓冲区返回的mmap）包装为可读的文件对象，不复制数据"""
+    if isinstance(data, mmap.mmap):
+        return _MappedReader(data)
+    return io.BytesIO(data)
+
+
+def total_size(files) -> int:
+    """文件集合的总字节数（溢出到磁盘的文件不读回内存）"""
+    if isinstance(files, SpillFiles):
+        return files.total_bytes()
+    return sum(len(content) for content in files.values())
+
+
+def export_record_size(record: Dict[str, Any]) -> Optional[int]:
+    """导出记录中的压缩包大小（字段名随接口版本不同），没有时返回None"""
+    for key in ('fileSize', 'zipFileSize', 'size'):
+        value = record.get(key)
+        if isinstance(value, (int, float)) and value > 0:
+            return int(value)
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+class MemoryBudget:
+    """进程内共享的内存预算（按字节计），记录所有作业缓冲区的实时占用"""
+
+    def __init__(self, limit_mb: float):
+        """
+        Args:
+            limit_mb: 预算（MB）
+        """
+        self.limit = int(limit_mb * _MB)
+        self.in_use = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> int:
+        return max(self.limit - self.in_use, 0)
+
+    def try_charge(self, amount: int, force: bool = False) -> bool:
+        """占用预算，超出时不占用并返回False（force为True时总是占用）"""
+        with self._lock:
+            if self.in_use + amount > self.limit and not force:
+                return False
+            self.in_use += amount
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, amount: int):
+        """释放预算"""
+        with self._lock:
+            self.in_use = max(self.in_use - amount, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'limit_mb': round(self.limit / _MB, 1),
+                'in_use_mb': round(self.in_use / _MB, 1),
+                'peak_mb': round(self.peak / _MB, 1)
+            }
+
+
+def get_memory_budget(limit_mb: Optional[float] = None) -> MemoryBudget:
+    """获取进程内共享的内存预算
+
+    Args:
+        limit_mb: 预算（MB），为None时使用默认值；指定时更新已有实例的预算
+
+    Returns:
+        MemoryBudget: 预算实例
+    """
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget(limit_mb or default_budget_mb())
+        elif limit_mb:
+            _budget.limit = int(limit_mb * _MB)
+        return _budget
+
+
+def _cleanup(budget: MemoryBudget, state: Dict[str, Any]):
+    # 作业结束或对象被回收时释放预算并删除临时目录
+    budget.release(state['used'])
+    state['used'] = 0
+    if state['dir']:
+        shutil.rmtree(state['dir'], ignore_errors=True)
+        state['dir'] = None
+
+
+class JobMemory:
+    """单个作业的内存管理：选择执行模式，创建可溢出到磁盘的文件集合和缓冲区"""
+
+    def __init__(self, budget: MemoryBudget, mode: str = 'auto', peak_ratio: float = DEFAULT_PEAK_RATIO,
+                 spill_root: Optional[str] = None, metrics=None):
+        """
+        Args:
+            budget: 进程内共享的内存预算
+            mode: auto（按预估大小选择）/ memory / spooled / disk
+            peak_ratio: 峰值占用相对导出压缩包大小的倍数
+            spill_root: 临时目录的上级目录，None表示系统临时目录
+            metrics: 运行指标（metrics.RunMetrics），记录选择的模式和溢出量
+        """
+        if mode != 'auto' and mode not in MODES:
+            raise ValueError(f"不支持的执行模式：{mode}")
+        self.budget = budget
+        self.configured_mode = mode
+        # 大小未知时先按spooled执行，份额为当前可用预算
+        self.mode = 'spooled' if mode == 'auto' else mode
+        self.peak_ratio = peak_ratio
+        self.spill_root = spill_root
+        self.metrics = metrics
+        self.share = budget.available
+        self.estimated_bytes: Optional[int] = None
+        self.size_source: Optional[str] = None
+        self.peak_used = 0
+        self.spilled_bytes = 0
+        self.switched = False
+        self._state = {'used': 0, 'dir': None}
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._buffers: Dict[str, 'SpillBuffer'] = {}
+        self._files: List['SpillFiles'] = []
+        self._finalizer = weakref.finalize(self, _cleanup, budget, self._state)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], metrics=None) -> 'JobMemory':
+        """按配置中的memory段创建"""
+        memory_config = config.get('memory') or {}
+        return cls(get_memory_budget(memory_config.get('budget_mb')),
+                   memory_config.get('mode') or 'auto',
+                   memory_config.get('peak_ratio') or DEFAULT_PEAK_RATIO,
+                   memory_config.get('spill_dir'),
+                   metrics)
+
+    @property
+    def used(self) -> int:
+        return self._state['used']
+
+    def plan(self, compressed_bytes: Optional[int], source: str = 'content_length'):
+        """根据导出压缩包大小选择执行模式（只按第一次得到的大小选择）
+
+        Args:
+            compressed_bytes: 压缩包字节数，未知时为None
+            source: 大小来源（content_length / oss / export_log）
+        """
+        if not compressed_bytes or self.estimated_bytes is not None:
+            return
+        with self._lock:
+            self.estimated_bytes = int(compressed_bytes * self.peak_ratio)
+            self.size_source = source
+            available = self.budget.available
+            if self.configured_mode == 'auto' and not self.switched:
+                if self.estimated_bytes <= available:
+                    self.mode = 'memory'
+                elif compressed_bytes <= available:
+                    self.mode = 'spooled'
+                else:
+                    self.mode = 'disk'
+            # 份额包含本作业已占用的部分
+            self.share = available + self.used
+        print(f"🧮 预计峰值占用 {self.estimated_bytes / _MB:.1f} MB（压缩包 {compressed_bytes / _MB:.1f} MB，"
+              f"可用预算 {available / _MB:.1f} MB），执行模式：{self.mode}")
+        self._record()
+
+    def allow(self, amount: int) -> bool:
+        """申请在内存中保存amount字节，超出作业份额或进程预算时转为磁盘模式并返回False"""
+        with self._lock:
+            if self.mode == 'disk':
+                return False
+            # 明确指定memory模式时只记录占用，不转为磁盘
+            pinned = self.configured_mode == 'memory'
+            over_share = self.mode == 'spooled' and self.used + amount > self.share
+            if over_share or not self.budget.try_charge(amount, force=pinned):
+                self.mode = 'disk'
+                self.switched = True
+                reason = "作业份额" if over_share else "进程内存预算"
+                print(f"⚠️ 内存占用达到{reason}（本作业 {self.used / _MB:.1f} MB），后续数据写入磁盘")
+                return False
+            self._state['used'] += amount
+            self.peak_used = max(self.peak_used, self.used)
+            return True
+
+    def release(self, amount: int):
+        """释放内存中的amount字节"""
+        with self._lock:
+            amount = min(amount, self.used)
+            self._state['used'] -= amount
+        self.budget.release(amount)
+
+    def spill_dir(self) -> str:
+        """作业临时目录（第一次溢出时创建）"""
+        with self._lock:
+            if self._state['dir'] is None:
+                self._state['dir'] = tempfile.mkdtemp(prefix='rosetta_spill_', dir=self.spill_root)
+            return self._state['dir']
+
+    def spill_path(self) -> str:
+        """作业临时目录中的新文件路径"""
+        spill_dir = self.spill_dir()
+        with self._lock:
+            self._counter += 1
+            return os.path.join(spill_dir, f"{self._counter:08d}")
+
+    def add_spilled(self, amount: int):
+        with self._lock:
+            self.spilled_bytes += amount
+
+    def files(self) -> 'SpillFiles':
+        """新的可溢出文件集合（路径到内容的映射）"""
+        files = SpillFiles(self)
+        self._files.append(files)
+        return files
+
+    def buffer(self, name: str, total: Optional[int] = None, source: str = 'content_length') -> 'SpillBuffer':
+        """新的可溢出缓冲区，同名的旧缓冲区（如失败后重试的下载）先释放
+
+        Args:
+            name: 缓冲区名称（download / result）
+            total: 预计写入的字节数，用于选择执行模式
+            source: 大小来源
+        """
+        self.plan(total, source)
+        self.release_buffer(name)
+        buffer = self._buffers[name] = SpillBuffer(self)
+        return buffer
+
+    def release_buffer(self, name: str):
+        """释放缓冲区占用的预算（数据已交给下一阶段）"""
+        buffer = self._buffers.pop(name, None)
+        if buffer is not None:
+            buffer.release()
+
+    def discard(self, files: 'SpillFiles'):
+        """丢弃不再需要的文件集合（释放内存并删除其临时文件）"""
+        files.close()
+        if files in self._files:
+            self._files.remove(files)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'configured_mode': self.configured_mode,
+            'switched': self.switched,
+            'estimated_mb': round(self.estimated_bytes / _MB, 1) if self.estimated_bytes is not None else None,
+            'size_source': self.size_source,
+            'peak_mb': round(self.peak_used / _MB, 1),
+            'spilled_mb': round(self.spilled_bytes / _MB, 1),
+            'budget_mb': round(self.budget.limit / _MB, 1)
+        }
+
+    def _record(self):
+        if self.metrics is not None:
+            self.metrics.record(memory=self.summary())
+
+    def close(self):
+        """作业结束：释放全部预算并删除临时文件"""
+        for name in list(self._buffers):
+            self.release_buffer(name)
+        for files in self._files:
+            files.close()
+        self._files = []
+        self._record()
+        self._finalizer()
+
+
+class _SpilledFile:
+    __slots__ = ('path', 'size')
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+
+class SpillFiles(MutableMapping):
+    """路径到文件内容的映射：预算允许时内容放在内存中，否则写入作业临时目录
+
+    与dict用法相同（保持插入顺序），可直接替代解压和拆帧阶段的文件字典。
+    """
+
+    def __init__(self, memory: JobMemory):
+        self.memory = memory
+        self._entries: Dict[str, Union[bytes, _SpilledFile]] = {}
+        self._bytes = 0
+
+    def __setitem__(self, path: str, content: bytes):
+        if path in self._entries:
+            del self[path]
+        size = len(content)
+        if self.memory.allow(size):
+            self._entries[path] = content
+        else:
+            spill_path = self.memory.spill_path()
+            with open(spill_path, 'wb') as f:
+                f.write(content)
+            self._entries[path] = _SpilledFile(spill_path, size)
+            self.memory.add_spilled(size)
+        self._bytes += size
+
+    def __getitem__(self, path: str) -> bytes:
+        entry = self._entries[path]
+        if isinstance(entry, _SpilledFile):
+            with open(entry.path, 'rb') as f:
+                return f.read()
+        return entry
+
+    def __delitem__(self, path: str):
+        entry = self._entries.pop(path)
+        if isinstance(entry, _SpilledFile):
+            self._bytes -= entry.size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        else:
+            self._bytes -= len(entry)
+            self.memory.release(len(entry))
+
+    def __contains__(self, path) -> bool:
+        return path in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def close(self):
+        """清空并释放全部内容"""
+        for path in list(self._entries):
+            del self[path]
+
+
+class SpillBuffer:
+    """可溢出到磁盘的二进制缓冲区（支持顺序写入和zipfile写入所需的seek/tell）
+
+    预算允许时写入内存，否则把已有内容移到临时文件继续写入；
+    getvalue在内存中时返回bytes，在磁盘上时返回只读mmap（用法与bytes相同，不占用进程堆内存）。
+    """
+
+    def __init__(self, memory: JobMemory):
+        self.memory = memory
+        self.on_disk = False
+        self._file = io.BytesIO()
+        self._size = 0
+        self._charged = 0
+
+    def write(self, data) -> int:
+        growth = self._file.tell() + len(data) - self._size
+        if growth > 0 and not self.on_disk:
+            if self.memory.allow(growth):
+                self._charged += growth
+            else:
+                self._spill()
+        written = self._file.write(data)
+        self._size = max(self._size, self._file.tell())
+        return written
+
+    def _spill(self):
+        position = self._file.tell()
+        spilled = tempfile.TemporaryFile(dir=self.memory.spill_dir())
+        spilled.write(self._file.getbuffer())
+        spilled.seek(position)
+        self.memory.add_spilled(self._size)
+        self._file = spilled
+        self.on_disk = True
+        self.release()
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        size = self._file.truncate(size)
+        self._size = min(self._size, size)
+        return size
+
+    def seekable(self) -> bool:
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    def getvalue(self):
+        """全部内容：bytes（内存中）或只读mmap（磁盘上）"""
+        if not self.on_disk:
+            return self._file.getvalue()
+        self._file.flush()
+        if self._size == 0:
+            return b''
+        # 映射后关闭文件：临时文件已删除，映射释放后磁盘空间随之回收
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._file.close()
+        return data
+
+    def release(self):
+        """释放内存部分占用的预算"""
+        if self._charged:
+            self.memory.release(self._charged)
+            self._charged = 0
@@ -3,19 +3,30 @@
 支持在内存中处理数据，不依赖本地文件系统
 """
 
-import io
 import zipfile
 import json
 import os
+import time
+import logging
 from typing import Dict, Any, Optional, List
 from rosetta_client import GetRosData, Auth
+from frame_output import create_frame_writer
+from annotation_partition import AnnotationPartition, DEFAULT_FRAME_KEY
+from task_filter import TaskFilter
+from frame_sampling import select_frames
+from progress import ProgressReporter, ensure_progress, read_response
+from checkpoint import Checkpoint
+from endpoints import service_url
+from event_log import EventLog
+from memory_budget import open_buffer
 
 
 class MemoryRosettaClient(GetRosData):
     """内存版Rosetta数据客户端"""
     
     def __init__(self, project_id, pool_id: list, _type=1, 
-                 is_check_pool=False, use_dev=False, username=None, password=None):
+                 is_check_pool=False, use_dev=False, username=None, password=None,
+                 metrics=None, memory=None):
         """
         Args:
             project_id: 项目ID
@@ -25,19 +36,20 @@ class MemoryRosettaClient(GetRosData):
             use_dev: 是否使用开发环境
             username: 用户名
             password: 密码
+            metrics: 运行指标（metrics.RunMetrics），记录登录耗时、首字节耗时和实际使用的接口
+            memory: 作业内存管理（memory_budget.JobMemory），下载按大小选择执行模式并写入可溢出缓冲区
         """
         # 直接初始化父类的属性，避免文件系统操作
         Auth.__init__(self, use_dev)
         
-        if use_dev:
-            self.get_url = 'https://dev-server.rosettalab.top/rosetta-service/project/doneTask/export'
-        else:
-            self.get_url = 'https://server.rosettalab.top/rosetta-service/project/doneTask/export'
+        self.get_url = service_url('project/doneTask/export', use_dev)
 
         self.project_id = project_id
         self.pool_id = pool_id
         self.username = username
         self.password = password
+        self.metrics = metrics
+        self.memory = memory
         
         self.req_data = {"projectId": project_id, "poolId": pool_id, "type": _type}
         if is_check_pool:
@@ -46,19 +58,32 @@ class MemoryRosettaClient(GetRosData):
         # 不设置文件系统相关属性
         self.save_path = None
         self.save_file = None
+
+    def _record(self, stage: Optional[str] = None, **values):
+        """记录运行指标，未传入运行指标时忽略"""
+        if self.metrics is not None:
+            self.metrics.record(stage, **values)
     
-    def get_data_to_memory(self) -> bytes:
+    def get_data_to_memory(self, progress: Optional[ProgressReporter] = None) -> bytes:
         """下载数据到内存
         
+        Args:
+            progress: 进度上报器，按已下载字节数上报
+            
         Returns:
             bytes: ZIP文件的二进制数据
         """
         import requests
         
-        resq = requests.post(self.get_url, json=self.req_data, headers=self._get_headers())
+        progress = ensure_progress(progress)
+        started = time.perf_counter()
+        headers = self._get_headers()
+        self._record('download', login_seconds=round(time.perf_counter() - started, 3))
+        request_started = time.perf_counter()
+        resq = requests.post(self.get_url, json=self.req_data, headers=headers, stream=True)
+        self._record('download', ttfb_seconds=round(time.perf_counter() - request_started, 3))
         
         print(f"API响应状态码: {resq.status_code}")
-        print(f"API响应大小: {len(resq.content)} bytes")
         
         if resq.status_code != 200:
             error_msg = f"API请求失败，状态码: {resq.status_code}"
@@ -70,53 +95,81 @@ class MemoryRosettaClient(GetRosData):
                 error_msg += f", 响应: {resq.text[:200]}"
             raise ValueError(error_msg)
         
+        content = read_response(resq, progress, memory=self.memory)
+        print(f"API响应大小: {len(content)} bytes")
+        
         # 检查是否为空ZIP
-        if self._is_zip_data_empty(resq.content):
+        if self._is_zip_data_empty(content):
             raise ValueError("下载的数据为空或格式错误，请检查项目ID和池子ID是否正确")
         
-        return resq.content
+        self._record('download', endpoint='standard')
+        return content
     
     def _is_zip_data_empty(self, zip_data: bytes) -> bool:
         """检查ZIP数据是否为空"""
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_file:
+            with zipfile.ZipFile(open_buffer(zip_data)) as zip_file:
                 return len(zip_file.namelist()) == 0
         except zipfile.BadZipFile:
             return True
     
-    def extract_zip_to_memory(self, zip_data: bytes) -> Dict[str, bytes]:
+    def extract_zip_to_memory(self, zip_data: bytes, task_filter=None,
+                              progress: Optional[ProgressReporter] = None,
+                              result_files: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
         """将ZIP数据解压到内存
         
         Args:
             zip_data: ZIP文件的二进制数据
+            task_filter: 任务过滤条件，被过滤的成员不解压或只解压头部
+            progress: 进度上报器，按已解压成员数上报
+            result_files: 解压结果写入的映射（如可溢出到磁盘的memory_budget.SpillFiles），为None时新建字典
             
         Returns:
             Dict[str, bytes]: 文件路径到文件内容的映射
         """
-        result_files = {}
+        result_files = {} if result_files is None else result_files
+        skipped_count = 0
+        progress = ensure_progress(progress)
         
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_file:
-                for file_info in zip_file.filelist:
-                    if not file_info.is_dir():
+            with zipfile.ZipFile(open_buffer(zip_data)) as zip_file:
+                members = [file_info for file_info in zip_file.filelist if not file_info.is_dir()]
+                progress.start_stage('unzip', len(members), unit_label='个文件')
+                for file_info in members:
+                    progress.advance()
+                    if task_filter is not None:
+                        file_content = task_filter.read_zip_member(zip_file, file_info)
+                        if file_content is None:
+                            skipped_count += 1
+                            continue
+                    else:
                         file_content = zip_file.read(file_info.filename)
-                        result_files[file_info.filename] = file_content
+                    result_files[file_info.filename] = file_content
         except Exception as e:
             raise ValueError(f"解压ZIP数据失败: {str(e)}")
+        progress.finish_stage()
+        
+        if skipped_count:
+            print(f"过滤条件跳过 {skipped_count} 个文件（未完整解压）")
         
         return result_files
     
-    def get_project_data_to_memory(self) -> Dict[str, bytes]:
+    def get_project_data_to_memory(self, task_filter=None,
+                                   progress: Optional[ProgressReporter] = None) -> Dict[str, bytes]:
         """获取项目数据到内存（下载并解压）
         
+        Args:
+            task_filter: 任务过滤条件
+            progress: 进度上报器
+            
         Returns:
             Dict[str, bytes]: 文件路径到文件内容的映射
         """
         print("开始下载数据到内存...")
-        zip_data = self.get_data_to_memory()
+        zip_data = self.get_data_to_memory(progress)
         print("数据下载完成，开始解压到内存...")
         
-        files = self.extract_zip_to_memory(zip_data)
+        files = self.extract_zip_to_memory(zip_data, task_filter, progress)
         print(f"数据解压完成，共 {len(files)} 个文件")
         
         return files
@@ -125,18 +178,28 @@ class MemoryRosettaClient(GetRosData):
 class MemoryFrameExtractor:
     """内存版帧提取器"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], task_filter: Optional[TaskFilter] = None, metrics=None):
         """
         Args:
             config: 配置字典
+            task_filter: 任务过滤条件，为None时使用配置中的filter段
+            metrics: 运行指标（metrics.RunMetrics），记录拆帧的任务数、帧数和解析/序列化耗时
         """
         self.config = config
+        self.task_filter = task_filter or TaskFilter.from_config(config.get('filter'))
+        self.metrics = metrics
     
-    def extract_frames_from_memory(self, files_dict: Dict[str, bytes]) -> Dict[str, bytes]:
+    def extract_frames_from_memory(self, files_dict: Dict[str, bytes],
+                                   progress: Optional[ProgressReporter] = None,
+                                   checkpoint: Optional[Checkpoint] = None,
+                                   result_files: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
         """从内存文件中提取帧
         
         Args:
             files_dict: 文件路径到文件内容的映射
+            progress: 进度上报器，按已处理任务数上报，附带已写出帧数
+            checkpoint: 检查点，已完成的任务直接载入之前的输出
+            result_files: 拆帧结果写入的映射（如可溢出到磁盘的memory_budget.SpillFiles），为None时新建字典
             
         Returns:
             Dict[str, bytes]: 包含提取结果的新文件字典
@@ -145,18 +208,25 @@ class MemoryFrameExtractor:
             return files_dict
         
         # 实现与原始frame_splitter完全相同的逻辑，但在内存中
-        return self._split_frames_in_memory(files_dict)
+        return self._split_frames_in_memory(files_dict, progress, checkpoint, result_files)
     
-    def _split_frames_in_memory(self, files_dict: Dict[str, bytes]) -> Dict[str, bytes]:
+    def _split_frames_in_memory(self, files_dict: Dict[str, bytes],
+                                progress: Optional[ProgressReporter] = None,
+                                checkpoint: Optional[Checkpoint] = None,
+                                result_files: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
         """在内存中执行拆帧操作，保持与原始frame_splitter完全相同的文件结构
         
         Args:
             files_dict: 文件路径到文件内容的映射
+            progress: 进度上报器
+            checkpoint: 检查点
+            result_files: 拆帧结果写入的映射，为None时新建字典
             
         Returns:
             Dict[str, bytes]: 包含拆帧结果的新文件字典
         """
-        result_files = {}
+        result_files = {} if result_files is None else result_files
+        progress = ensure_progress(progress)
         
         # 查找所有JSON文件，按文件名字典序排序（与os.walk保持一致）
         json_files = []
@@ -172,20 +242,55 @@ class MemoryFrameExtractor:
             return files_dict
         
         print(f"找到 {len(json_files)} 个JSON文件，开始拆帧...")
+        progress.start_stage('split', len(json_files), unit_label='个任务')
+        # 逐文件的日志按类型聚合，避免每个文件同步写一次标准输出
+        events = EventLog('split')
+        
+        # 输出布局由写入器决定（逐帧JSON或JSONL分片）
+        emit = result_files.__setitem__
+        if checkpoint is not None:
+            # 载入之前运行已输出的文件，新输出随检查点保存
+            result_files.update(checkpoint.load_outputs())
+            emit = checkpoint.track_outputs(emit)
+        writer = create_frame_writer(self.config['frame_extraction'].get('output'), emit)
+        if checkpoint is not None:
+            checkpoint.restore_writer(writer)
         
         # 处理每个文件
         success_count = 0
+        filtered_count = 0
+        resumed_count = 0
+        parse_seconds = 0.0
+        serialize_seconds = 0.0
+        task_filter = self.task_filter
         for json_file in json_files:
+            progress.advance()
+            if checkpoint is not None and checkpoint.task_done(json_file):
+                resumed_count += 1
+                success_count += 1
+                continue
             try:
+                # 完整解析前先按头部字段过滤
+                if task_filter is not None and \
+                        not task_filter.accepts_header(files_dict[json_file][:task_filter.header_bytes]):
+                    filtered_count += 1
+                    continue
+                
                 # 加载JSON数据
+                parse_started = time.perf_counter()
                 json_data = json.loads(files_dict[json_file].decode('utf-8'))
+                parse_seconds += time.perf_counter() - parse_started
+                
+                if task_filter is not None and not task_filter.accepts_task(json_data):
+                    filtered_count += 1
+                    continue
                 
                 # 检查是否是序列类型
                 record = json_data.get('taskParams', {}).get('record', {})
                 attachment_type = record.get('attachmentType', '')
                 
                 if attachment_type not in ["IMAGE_SEQUENCE", "IMAGE_SET_SEQUENCE", "POINTCLOUD_SEQUENCE", "POINTCLOUD_SET_SEQUENCE"]:
-                    print(f"跳过非序列文件: {json_file}")
+                    events.event('skipped_non_sequence', f"跳过非序列文件: {json_file}", label="跳过非序列文件")
                     # 保留非序列文件（与原始版本一致，非序列文件不会被删除）
                     result_files[json_file] = files_dict[json_file]
                     success_count += 1
@@ -210,43 +315,69 @@ class MemoryFrameExtractor:
                 result_metadata = json_data.get('result', {}).get('metadata', {})
                 
                 if attachment_length == 0:
-                    print(f"跳过无附件的文件: {json_file}")
+                    events.event('skipped_no_attachment', f"跳过无附件的文件: {json_file}", label="跳过无附件的文件")
                     # 保留无附件的序列文件（与原始版本一致）
                     result_files[json_file] = files_dict[json_file]
                     success_count += 1
                     continue
                 
+                # 按帧分配标注：一次遍历建立帧索引
+                partition = None
+                if self.config['frame_extraction'].get('partition_annotations', False):
+                    partition = AnnotationPartition(
+                        result_annotations, self._create_empty_annotation,
+                        self.config['frame_extraction'].get('annotation_frame_key') or DEFAULT_FRAME_KEY)
+                    message = partition.unassigned_message()
+                    if message:
+                        events.event('unassigned_annotations', f"{json_file}: {message}", logging.WARNING,
+                                     label="标注条目缺少帧序号", file=json_file, items=partition.unassigned)
+                
+                # 序列化前按帧范围裁剪
+                frame_numbers = task_filter.frame_range(attachment_length) \
+                    if task_filter is not None else range(attachment_length)
+                frame_numbers = select_frames(frame_numbers, self.config['frame_extraction'].get('sampling'))
+                
                 # 为每一帧创建新文件
-                for frame_number in range(attachment_length):
+                serialize_started = time.perf_counter()
+                for frame_number in frame_numbers:
+                    progress.check_cancelled()
                     frame_data = self._create_frame_data(
                         project_id, dataset_id, pool_id, task_id, status,
                         attachment_type, attachment, metadata, operators,
                         result_annotations, result_hints, result_metadata,
-                        frame_number
+                        frame_number, partition
                     )
-                    
-                    # 生成新文件路径（保持与原始frame_splitter相同的结构）
-                    new_path = self._frame_name(json_file, frame_number)
-                    
-                    # 创建task_id目录结构
-                    task_dir = os.path.join(os.path.dirname(new_path), str(task_id))
-                    final_path = os.path.join(task_dir, os.path.basename(new_path))
-                    
-                    # 保存帧数据到内存
-                    frame_content = json.dumps(frame_data, ensure_ascii=False, indent=2).encode('utf-8')
-                    result_files[final_path] = frame_content
+                    writer.write_frame(json_file, task_id, frame_number, frame_data)
+                writer.end_task(json_file, task_id)
+                serialize_seconds += time.perf_counter() - serialize_started
+                progress.count('帧', len(frame_numbers))
+                if checkpoint is not None:
+                    checkpoint.record_task(json_file, writer)
                 
                 # 删除原始文件（与原始frame_splitter保持一致）
                 # 不将原始文件加入结果，保持与原始版本相同的行为
-                print(f"已处理: {json_file} -> {attachment_length} 帧")
+                events.event('processed', f"已处理: {json_file} -> {len(frame_numbers)} 帧", label="已处理",
+                             frames=len(frame_numbers))
                 success_count += 1
                 
             except Exception as e:
-                print(f"处理文件失败 {json_file}: {str(e)}")
-                # 处理失败的文件也保留
+                events.event('failed', f"处理文件失败 {json_file}: {str(e)}", logging.WARNING, label="处理文件失败",
+                             file=json_file, error=str(e))
+                # 处理失败的文件也保留，已生成的帧丢弃，避免与原始文件重复
+                writer.abort_task()
                 result_files[json_file] = files_dict[json_file]
         
-        print(f"拆帧完成！成功处理 {success_count}/{len(json_files)} 个文件")
+        writer.close()
+        progress.finish_stage()
+        if self.metrics is not None:
+            self.metrics.record('split', tasks=success_count, frames=writer.frame_count, events=events.summary(),
+                                parse_seconds=round(parse_seconds, 3),
+                                serialize_seconds=round(serialize_seconds, 3))
+        if resumed_count:
+            print(f"从检查点恢复 {resumed_count} 个已完成的任务")
+        if filtered_count:
+            print(f"过滤条件排除 {filtered_count} 个任务")
+        print(f"拆帧完成！成功处理 {success_count}/{len(json_files) - filtered_count} 个文件")
         
         # 保留所有非JSON文件
         for file_path, file_content in files_dict.items():
@@ -257,25 +388,23 @@ class MemoryFrameExtractor:
         # 文件应该按照处理的先后顺序自然排列
         return result_files
     
-    def _frame_name(self, original_path: str, frame_number: int) -> str:
-        """生成帧文件名（与原始frame_splitter相同逻辑）"""
-        base_name = os.path.basename(original_path)
-        name_without_ext = os.path.splitext(base_name)[0]
-        dir_name = os.path.dirname(original_path)
-        return os.path.join(dir_name, f"{name_without_ext}_{frame_number:06d}.json")
-    
     def _create_frame_data(self, project_id: int, dataset_id: int, pool_id: int, 
                           task_id: int, status: int, attachment_type: str,
                           attachment: list, metadata: dict, operators: list,
                           result_annotations: list, result_hints: list,
-                          result_metadata: dict, frame_number: int) -> Dict[str, Any]:
+                          result_metadata: dict, frame_number: int,
+                          partition: Optional[AnnotationPartition] = None) -> Dict[str, Any]:
         """创建单帧数据（与原始frame_splitter相同逻辑）"""
         
-        # 创建空的标注结构
-        frame_annotations = []
-        for annotation in result_annotations:
-            frame_annotation = self._create_empty_annotation(annotation)
-            frame_annotations.append(frame_annotation)
+        if partition is not None:
+            # 填入属于该帧的标注条目
+            frame_annotations = partition.annotations_for_frame(frame_number)
+        else:
+            # 创建空的标注结构
+            frame_annotations = []
+            for annotation in result_annotations:
+                frame_annotation = self._create_empty_annotation(annotation)
+                frame_annotations.append(frame_annotation)
         
         return {
             "projectId": project_id,
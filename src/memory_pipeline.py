@@ -4,22 +4,68 @@
 """
 
 import io
+import copy
 import json
-from typing import Dict, Any, Optional
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, Callable, Tuple
 from memory_client import MemoryRosettaClient, MemoryFrameExtractor
 from smart_memory_client import SmartMemoryRosettaClient
+from task_filter import TaskFilter
+from batch_executor import BatchExecutor
+from staged_pipeline import Stage, StagedPipeline, StageFailure
+from resource_budget import ResourceBudget
+from result_cache import get_result_cache, content_hash, cache_key, identity_cache_key
+from progress import ProgressReporter
+from cancellation import CancellationToken
+from checkpoint import Checkpoint
+from metrics import RunMetrics
+from memory_budget import JobMemory, SpillFiles, total_size
+
+
+def _deliver_result(result: Dict[str, Any], on_result: Optional[Callable[[Dict[str, Any]], Any]]):
+    """把打包好的结果交给接收函数，结果中只保留其返回的output"""
+    if on_result is None:
+        return
+    result['output'] = on_result(result)
+    result.pop('zip_data', None)
 
 
 class MemoryExtractionPipeline:
     """内存版拆帧处理管道"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], task_filter: Optional[TaskFilter] = None,
+                 connection_budget: Optional[ResourceBudget] = None,
+                 progress: Optional[ProgressReporter] = None,
+                 batch_only: bool = False):
         """初始化管道
         
         Args:
             config: 配置字典
+            task_filter: 任务过滤条件，为None时使用配置中的filter段
+            connection_budget: 全局下载连接预算，多个管道并发时共享
+            progress: 进度上报器，下载、解压、拆帧、打包各阶段按字节数或条目数上报
+            batch_only: 只用于批处理（process_multiple_projects）：各项目使用for_project创建的独立管道，
+                本管道不创建下载客户端、内存管理和检查点，也不占用第一个项目的检查点锁
         """
         self.config = config
+        self.task_filter = task_filter or TaskFilter.from_config(config.get('filter'))
+        self.connection_budget = connection_budget
+        if batch_only:
+            self.progress = progress if progress is not None else ProgressReporter()
+            self.metrics = self.memory = self.result_cache = self.checkpoint = None
+            self.downloader = self.extractor = None
+            return
+        # 运行指标和作业内存管理显式传给下载客户端和拆帧器
+        self.metrics = RunMetrics.from_config(config)
+        self.progress = progress if progress is not None else ProgressReporter()
+        # 按导出大小选择内存/溢出/磁盘执行模式，下载、解压、拆帧和打包的数据都按预算存放
+        self.memory = JobMemory.from_config(config, self.metrics)
+        self.result_cache = get_result_cache(config.get('cache'))
+        self.checkpoint = Checkpoint.from_config(config)
+        # 下载阶段计算的导出内容哈希，检查点和结果缓存共用
+        self.export_hash = None
+        # 压缩包对应的大文件接口导出记录（标准接口下载时为None），用作结果缓存别名
+        self.archive_identity = None
         
         # 根据配置选择使用智能客户端还是普通内存客户端
         if config['download'].get('smart_download', True):
@@ -30,7 +76,9 @@ class MemoryExtractionPipeline:
                 _type=config['download']['download_type'],
                 is_check_pool=config['download']['check_pool'],
                 username=config['rosetta']['username'],
-                password=config['rosetta']['password']
+                password=config['rosetta']['password'],
+                metrics=self.metrics,
+                memory=self.memory
             )
         else:
             print("📦 使用标准内存下载模式")
@@ -40,10 +88,12 @@ class MemoryExtractionPipeline:
                 _type=config['download']['download_type'],
                 is_check_pool=config['download']['check_pool'],
                 username=config['rosetta']['username'],
-                password=config['rosetta']['password']
+                password=config['rosetta']['password'],
+                metrics=self.metrics,
+                memory=self.memory
             )
         
-        self.extractor = MemoryFrameExtractor(config)
+        self.extractor = MemoryFrameExtractor(config, self.task_filter, self.metrics)
     
     def process_single_project(self, 
                              project_id: int = None,
@@ -66,48 +116,124 @@ class MemoryExtractionPipeline:
         
         # 调试模式检查
         if self.config['debug']['test_mode']:
-            print("【测试模式】跳过数据下载，使用模拟数据")
-            # 返回模拟数据
-            return {
-                'project_id': str(project_id),
-                'files': self._generate_test_data(),
-                'frame_extraction': self.config['frame_extraction']['enabled'],
-                'status': 'completed_test_mode',
-                'message': '测试模式：使用模拟数据'
-            }
+            return self._with_metrics(self._test_mode_result(project_id))
         
         # 下载数据到内存
         print(f"开始下载项目 {project_id} 的数据到内存...")
         try:
-            files_dict = self.downloader.get_project_data_to_memory()
+            zip_data, cache_keys, cached = self.fetch_stage(project_id)
+            if cached is not None:
+                return self._with_metrics(cached)
+            files_dict = self.unzip_stage(zip_data)
+            del zip_data
             print(f"数据下载完成，共 {len(files_dict)} 个文件")
         except Exception as e:
-            error_msg = str(e)
-            if "504" in error_msg or "Gateway Time-out" in error_msg:
-                print(f"❌ 网关超时错误 (504): {error_msg}")
-                return {
-                    'project_id': str(project_id),
-                    'error': error_msg,
-                    'status': 'failed_gateway_timeout',
-                    'message': '下载超时：网关错误 (504)，请稍后重试或检查网络连接'
-                }
-            elif "所有下载接口都失败" in error_msg:
-                print(f"❌ 所有下载接口都失败: {error_msg}")
-                return {
-                    'project_id': str(project_id),
-                    'error': error_msg,
-                    'status': 'failed_all_interfaces',
-                    'message': '所有下载接口都失败，请检查项目ID、池子ID和网络连接'
-                }
+            return self._with_metrics(self._download_failure(project_id, e))
+        
+        result = self.split_stage(project_id, files_dict)
+        result.update(cache_keys)
+        return self._with_metrics(result)
+    
+    def _with_metrics(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """附加运行指标快照（打包后在create_result_zip中更新）"""
+        result['metrics'] = self.metrics.to_dict()
+        return result
+    
+    def fetch_stage(self, project_id) -> Tuple[Optional[bytes], Dict[str, Optional[str]], Optional[Dict[str, Any]]]:
+        """下载并查找结果缓存
+        
+        下载前先按大文件接口的导出记录查找，下载后再按导出内容哈希查找，
+        都未命中时才保存检查点，命中缓存的项目不写压缩包
+        
+        Args:
+            project_id: 项目ID
+            
+        Returns:
+            Tuple: (压缩包数据, 结果缓存键（合并到处理结果）, 命中缓存时的处理结果)；命中时压缩包数据为None
+        """
+        cache_keys = {'cache_key': None, 'cache_alias': None}
+        identity = None
+        if isinstance(self.downloader, SmartMemoryRosettaClient) and (
+                self.result_cache is not None or
+                (self.checkpoint is not None and self.checkpoint.archive_identity() is not None)):
+            identity = self.downloader.query_export_identity()
+        if identity is not None and self.result_cache is not None:
+            cached = self._cached_result(project_id, identity_cache_key(self.config, identity))
+            if cached is not None:
+                return None, cache_keys, cached
+        
+        zip_data = self.download_stage(identity)
+        if self.result_cache is not None:
+            cache_keys['cache_key'] = cache_key(self.config, self.export_hash)
+            if self.archive_identity is not None:
+                cache_keys['cache_alias'] = identity_cache_key(self.config, self.archive_identity)
+            cached = self._cached_result(project_id, cache_keys['cache_key'])
+            if cached is not None:
+                return None, cache_keys, cached
+        if self.checkpoint is not None:
+            # 导出内容变化时丢弃之前的拆帧进度
+            self.checkpoint.verify_archive(self.export_hash)
+            self.checkpoint.save_archive(zip_data, self.export_hash, self.archive_identity)
+        return zip_data, cache_keys, None
+    
+    def download_stage(self, identity: Optional[Dict[str, Any]] = None) -> bytes:
+        """下载阶段：下载项目导出压缩包到内存
+        
+        Args:
+            identity: 大文件接口当前的导出记录（fetch_stage已查询），与检查点保存时一致才使用保存的压缩包
+        
+        Returns:
+            bytes: ZIP文件的二进制数据
+        """
+        smart = isinstance(self.downloader, SmartMemoryRosettaClient)
+        if self.checkpoint is not None and identity is not None:
+            # 导出记录与保存时不一致时重新下载，再按内容哈希确认
+            zip_data = self.checkpoint.load_archive(identity)
+            if zip_data is not None:
+                print(f"从检查点恢复已下载的压缩包（{len(zip_data)} 字节），跳过下载")
+                self.metrics.record('download', endpoint='checkpoint', bytes=len(zip_data))
+                self.export_hash = self.checkpoint.stage_info('download')['sha256']
+                self.archive_identity = identity
+                return zip_data
+        
+        connection = self.connection_budget.reserve(1) if self.connection_budget else nullcontext()
+        with connection, self.metrics.stage('download'):
+            if smart:
+                zip_data = self.downloader.smart_download(self.progress)
             else:
-                print(f"❌ 数据下载失败: {error_msg}")
-                return {
-                    'project_id': str(project_id),
-                    'error': error_msg,
-                    'status': 'failed_download',
-                    'message': f'数据下载失败: {error_msg}'
-                }
+                zip_data = self.downloader.get_data_to_memory(self.progress)
+        self.metrics.record('download', bytes=len(zip_data))
+        self.export_hash = content_hash(zip_data)
+        self.archive_identity = self.downloader.export_identity if smart else None
+        return zip_data
+    
+    def unzip_stage(self, zip_data: bytes) -> Dict[str, bytes]:
+        """解压阶段：解压到内存，过滤条件下推到解压阶段，不符合条件的成员不解压
+        
+        Args:
+            zip_data: ZIP文件的二进制数据
+            
+        Returns:
+            Dict[str, bytes]: 文件路径到文件内容的映射
+        """
+        with self.metrics.stage('unzip'):
+            files = self.downloader.extract_zip_to_memory(zip_data, self.task_filter, self.progress,
+                                                          self.memory.files())
+        # 压缩包已解压，不再计入预算
+        self.memory.release_buffer('download')
+        self.metrics.record('unzip', bytes_in=len(zip_data), files=len(files), bytes_out=total_size(files))
+        return files
+    
+    def split_stage(self, project_id, files_dict: Dict[str, bytes]) -> Dict[str, Any]:
+        """拆帧阶段：在内存中拆帧并生成处理结果
         
+        Args:
+            project_id: 项目ID
+            files_dict: 解压后的文件
+            
+        Returns:
+            Dict[str, Any]: 包含处理结果的字典
+        """
         # 检查是否启用拆帧
         if not self.config['frame_extraction']['enabled']:
             print("拆帧功能已禁用，跳过拆帧步骤")
@@ -121,7 +247,13 @@ class MemoryExtractionPipeline:
         
         # 执行拆帧（在内存中）
         print("开始在内存中执行拆帧...")
-        processed_files = self.extractor.extract_frames_from_memory(files_dict)
+        with self.metrics.stage('split'):
+            processed_files = self.extractor.extract_frames_from_memory(files_dict, self.progress, self.checkpoint,
+                                                                        self.memory.files())
+        if processed_files is not files_dict and isinstance(files_dict, SpillFiles):
+            # 解压文件已拆帧，立即释放内存和临时文件
+            self.memory.discard(files_dict)
+        self.metrics.record('split', bytes_out=total_size(processed_files))
         print(f"拆帧完成，共 {len(processed_files)} 个文件")
         
         return {
@@ -132,44 +264,215 @@ class MemoryExtractionPipeline:
             'message': '处理完成'
         }
     
-    def process_multiple_projects(self, projects: list) -> list:
+    def _cached_result(self, project_id, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """查找结果缓存，命中时返回包含zip_data的处理结果"""
+        if key is None:
+            return None
+        cached = self.result_cache.get(key)
+        if cached is None:
+            return None
+        zip_data, meta = cached
+        print(f"♻️ 命中结果缓存，直接返回已有的结果压缩包（{len(zip_data)} 字节）")
+        self.metrics.record(cache_hit=True)
+        return dict(meta, project_id=str(project_id), zip_data=zip_data, cache_hit=True)
+    
+    def _test_mode_result(self, project_id) -> Dict[str, Any]:
+        """测试模式：跳过数据下载，返回模拟数据"""
+        print("【测试模式】跳过数据下载，使用模拟数据")
+        return {
+            'project_id': str(project_id),
+            'files': self._generate_test_data(),
+            'frame_extraction': self.config['frame_extraction']['enabled'],
+            'status': 'completed_test_mode',
+            'message': '测试模式：使用模拟数据'
+        }
+    
+    def _download_failure(self, project_id, error: Exception) -> Dict[str, Any]:
+        """将下载/解压异常转换为失败结果"""
+        error_msg = str(error)
+        if "504" in error_msg or "Gateway Time-out" in error_msg:
+            print(f"❌ 网关超时错误 (504): {error_msg}")
+            return {
+                'project_id': str(project_id),
+                'error': error_msg,
+                'status': 'failed_gateway_timeout',
+                'message': '下载超时：网关错误 (504)，请稍后重试或检查网络连接'
+            }
+        elif "所有下载接口都失败" in error_msg:
+            print(f"❌ 所有下载接口都失败: {error_msg}")
+            return {
+                'project_id': str(project_id),
+                'error': error_msg,
+                'status': 'failed_all_interfaces',
+                'message': '所有下载接口都失败，请检查项目ID、池子ID和网络连接'
+            }
+        else:
+            print(f"❌ 数据下载失败: {error_msg}")
+            return {
+                'project_id': str(project_id),
+                'error': error_msg,
+                'status': 'failed_download',
+                'message': f'数据下载失败: {error_msg}'
+            }
+    
+    def process_multiple_projects(self, projects: list, max_workers: int = None,
+                                  pipelined: bool = None, package: bool = False,
+                                  cancel_token: Optional[CancellationToken] = None,
+                                  on_result: Optional[Callable[[Dict[str, Any]], Any]] = None) -> list:
         """批量处理多个项目
         
+        每个项目使用独立的管道和下载客户端，可按配置并发处理，
+        并发项目共享全局内存预算和下载连接预算。
+        
         Args:
             projects: 项目列表，每个项目包含project_id, pool_ids, project_name
+            max_workers: 最大并发项目数，为None时使用配置中的batch.max_workers（默认1）
+            pipelined: 是否使用流水线模式，为None时使用配置中的batch.pipelined
+            package: 是否在工作线程中直接打包（结果包含zip_data，不再保留files），
+                流水线模式和指定on_result时总会打包
+            cancel_token: 取消令牌，为None时使用本管道进度上报器的令牌；取消后抛出OperationCancelled
+            on_result: 结果接收函数，每个项目打包完成后立即以包含zip_data的结果调用（如写入输出目录或结果存储），
+                返回值（文件路径或结果句柄）记为结果的output，结果不再保留zip_data，
+                批处理的内存占用不随项目数增长
             
         Returns:
-            list: 所有项目的处理结果
+            list: 所有项目的处理结果，顺序与输入一致
         """
-        results = []
+        batch_config = self.config.get('batch') or {}
+        if pipelined is None:
+            pipelined = batch_config.get('pipelined', False)
+        if pipelined:
+            return self.process_projects_pipelined(projects, max_workers, cancel_token, on_result)
+        
+        connection_budget = self._shared_connection_budget()
+        cancel_token = cancel_token or self.progress.cancel_token
+        
+        def run_project(project):
+            pipeline = self.for_project(project, connection_budget, cancel_token)
+            result = pipeline.process_single_project(
+                project_id=project['project_id'],
+                pool_ids=project['pool_ids'],
+                project_name=project['project_name']
+            )
+            if (package or on_result is not None) and ('files' in result or result.get('cache_hit')):
+                result['zip_data'] = pipeline.create_result_zip(result)
+                result.pop('files', None)
+                _deliver_result(result, on_result)
+            return result
         
-        for i, project in enumerate(projects, 1):
-            print(f"\n【{i}/{len(projects)}】处理项目：{project['project_name']} (ID: {project['project_id']})")
+        executor = BatchExecutor.from_config(run_project, batch_config, max_workers, cancel_token=cancel_token)
+        return executor.run(projects)
+    
+    def process_projects_pipelined(self, projects: list, split_workers: int = None,
+                                   cancel_token: Optional[CancellationToken] = None,
+                                   on_result: Optional[Callable[[Dict[str, Any]], Any]] = None) -> list:
+        """以流水线方式批量处理多个项目
+        
+        下载 → 解压 → 拆帧 → 打包 四个阶段并行运行，阶段之间以有界队列连接：
+        一个项目拆帧时，下一个项目已在下载，下游阻塞时上游自动等待（背压）。
+        
+        Args:
+            projects: 项目列表，每个项目包含project_id, pool_ids, project_name
+            split_workers: 拆帧阶段并发数，为None时使用配置中的batch.max_workers
+            cancel_token: 取消令牌，为None时使用本管道进度上报器的令牌；取消后抛出OperationCancelled
+            on_result: 结果接收函数，打包阶段每完成一个项目立即调用（见process_multiple_projects）
             
+        Returns:
+            list: 所有项目的处理结果，顺序与输入一致；指定on_result时包含output，否则包含zip_data
+        """
+        batch_config = self.config.get('batch') or {}
+        connection_budget = self._shared_connection_budget()
+        cancel_token = cancel_token or self.progress.cancel_token
+        
+        def download(project):
+            pipeline = self.for_project(project, connection_budget, cancel_token)
+            item = {'project': project, 'pipeline': pipeline}
+            if pipeline.config['debug']['test_mode']:
+                item['result'] = pipeline._test_mode_result(project['project_id'])
+                return item
+            print(f"开始下载项目 {project['project_id']} 的数据到内存...")
             try:
-                # 更新下载器配置
-                self.downloader.project_id = project['project_id']
-                self.downloader.pool_id = project['pool_ids']
-                
-                result = self.process_single_project(
-                    project_id=project['project_id'],
-                    pool_ids=project['pool_ids'],
-                    project_name=project['project_name']
-                )
-                results.append(result)
-                print(f"✅ 项目 {project['project_id']} 处理完成")
-                
+                item['zip_data'], item['cache_keys'], cached = pipeline.fetch_stage(project['project_id'])
+                if cached is not None:
+                    item['result'] = cached
             except Exception as e:
-                print(f"❌ 项目 {project['project_id']} 处理失败：{str(e)}")
+                item['result'] = pipeline._download_failure(project['project_id'], e)
+            return item
+        
+        def unzip(item):
+            if 'result' not in item:
+                try:
+                    item['files'] = item['pipeline'].unzip_stage(item.pop('zip_data'))
+                    print(f"项目 {item['project']['project_id']} 解压完成，共 {len(item['files'])} 个文件")
+                except Exception as e:
+                    item['result'] = item['pipeline']._download_failure(item['project']['project_id'], e)
+            return item
+        
+        def split(item):
+            if 'result' not in item:
+                item['result'] = item['pipeline'].split_stage(item['project']['project_id'], item.pop('files'))
+                item['result'].update(item['cache_keys'])
+            return item
+        
+        def package(item):
+            result = item['result']
+            if 'files' in result or result.get('cache_hit'):
+                result['zip_data'] = item['pipeline'].create_result_zip(result)
+                _deliver_result(result, on_result)
+            print(f"项目 {item['project']['project_id']} 流水线处理结束：{result.get('status')}")
+            return result
+        
+        max_connections = batch_config.get('max_connections') or 1
+        stages = [
+            Stage('download', download, workers=max_connections),
+            Stage('unzip', unzip),
+            Stage('split', split, workers=split_workers or batch_config.get('max_workers', 1)),
+            Stage('package', package)
+        ]
+        outputs = StagedPipeline(stages, batch_config.get('queue_size', 2), cancel_token).run(projects)
+        
+        results = []
+        for project, output in zip(projects, outputs):
+            if isinstance(output, StageFailure):
                 results.append({
                     'project_id': str(project['project_id']),
-                    'error': str(e),
+                    'error': str(output.error),
                     'status': 'failed',
-                    'message': f'处理失败: {str(e)}'
+                    'message': f'处理失败（{output.stage}阶段）: {str(output.error)}'
                 })
-        
+            else:
+                results.append(output)
         return results
     
+    def _shared_connection_budget(self) -> Optional[ResourceBudget]:
+        """批处理时各项目共享的下载连接预算"""
+        if self.connection_budget is not None:
+            return self.connection_budget
+        max_connections = (self.config.get('batch') or {}).get('max_connections')
+        return ResourceBudget(max_connections, 'connections') if max_connections else None
+    
+    def for_project(self, project: Dict[str, Any],
+                    connection_budget: Optional[ResourceBudget] = None,
+                    cancel_token: Optional[CancellationToken] = None) -> 'MemoryExtractionPipeline':
+        """创建处理指定项目的独立管道（独立配置、下载客户端和进度上报器）
+        
+        Args:
+            project: 项目字典，包含project_id, pool_ids, project_name
+            connection_budget: 共享的下载连接预算
+            cancel_token: 取消令牌，项目管道的各阶段检查该令牌
+            
+        Returns:
+            MemoryExtractionPipeline: 新的管道实例
+        """
+        config = copy.deepcopy(self.config)
+        config['project']['project_id'] = project['project_id']
+        config['project']['pool_ids'] = project['pool_ids']
+        if project.get('project_name'):
+            config['project']['project_name_cn'] = project['project_name']
+        return MemoryExtractionPipeline(config, self.task_filter,
+                                        connection_budget or self.connection_budget,
+                                        ProgressReporter(cancel_token=cancel_token))
+    
     def _generate_test_data(self) -> Dict[str, bytes]:
         """生成测试数据
         
@@ -214,11 +517,46 @@ class MemoryExtractionPipeline:
         Returns:
             bytes: ZIP文件的二进制数据
         """
+        # 下载或解压失败的结果没有文件，检查点保留，重新提交时从已保存的导出和进度继续
+        completed = 'files' in result or result.get('cache_hit')
+        try:
+            zip_data = self._create_result_zip(result)
+            if self.checkpoint is not None and completed:
+                # 结果已生成，不再需要从检查点恢复；打包失败时保留，重新提交可从检查点继续
+                self.checkpoint.clear()
+        finally:
+            # 释放内存预算、临时文件和检查点锁（打包失败时同样释放）
+            result.pop('files', None)
+            self.memory.close()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+        result['metrics'] = self.metrics.finish(result.get('status'))
+        return zip_data
+    
+    def _create_result_zip(self, result: Dict[str, Any]) -> bytes:
         from utils import create_zip_archive_in_memory
         
+        if result.get('zip_data') is not None:
+            # 命中结果缓存，压缩包已就绪
+            return result['zip_data']
+        
         if 'files' in result:
             # 直接使用文件数据创建ZIP，保持原始文件结构
-            return create_zip_archive_in_memory(result['files'])
+            # 拆帧结果追加帧随机访问索引，下游可直接定位单帧
+            frame_index = result.get('frame_extraction', False) and \
+                self.config['frame_extraction'].get('output', {}).get('frame_index', True)
+            with self.metrics.stage('compress'):
+                zip_data = create_zip_archive_in_memory(result['files'], frame_index=frame_index,
+                                                        progress=self.progress,
+                                                        output=self.memory.buffer('result'))
+            self.metrics.record('compress', bytes_out=len(zip_data), bytes_in=total_size(result['files']))
+            if result.get('cache_key') and self.result_cache is not None:
+                self.result_cache.put(result['cache_key'], zip_data, {
+                    'status': result.get('status'),
+                    'message': result.get('message'),
+                    'frame_extraction': result.get('frame_extraction', False)
+                }, alias=result.get('cache_alias'))
+            return zip_data
         else:
             # 如果没有文件数据，创建包含结果信息的ZIP
             result_data = {
@@ -0,0 +1,159 @@
+"""
+运行指标
+记录每次处理各阶段的耗时、字节数和内存，附加到处理结果（result['metrics']）并追加写入JSONL日志，
+用于分析生产环境中时间花在哪里：
+- 下载：登录耗时、首字节时间、吞吐量、实际使用的接口（标准接口/OSS）
+- 解压、拆帧（解析和序列化耗时、输出帧数）、打包（压缩比）
+- 每个阶段的CPU时间和结束时的常驻内存；开启trace_memory时额外记录tracemalloc峰值
+  （tracemalloc有明显开销且为进程级，多个任务并发时峰值相互包含，默认关闭）
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+# 默认日志路径，可用环境变量ROSETTA_METRICS_LOG覆盖
+DEFAULT_LOG_PATH = os.path.join(tempfile.gettempdir(), 'rosetta_metrics.jsonl')
+
+_MB = 1024 * 1024
+
+_log_lock = threading.Lock()
+_trace_lock = threading.Lock()
+_trace_users = 0
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），Linux读取/proc，其他平台返回None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / _MB, 1)
+
+
+def start_tracing():
+    """开始（或加入）tracemalloc跟踪并重置峰值，可被多个使用方嵌套调用"""
+    global _trace_users
+    with _trace_lock:
+        if _trace_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _trace_users += 1
+        tracemalloc.reset_peak()
+
+
+def stop_tracing() -> float:
+    """退出跟踪，返回自上次重置以来的内存峰值（MB），最后一个使用方退出时停止tracemalloc"""
+    global _trace_users
+    with _trace_lock:
+        peak = tracemalloc.get_traced_memory()[1] / _MB
+        _trace_users -= 1
+        if _trace_users == 0:
+            tracemalloc.stop()
+    return round(peak, 1)
+
+
+class RunMetrics:
+    """单次处理的运行指标"""
+
+    def __init__(self, project_id=None, trace_memory: bool = False, log_path: Optional[str] = None):
+        """
+        Args:
+            project_id: 项目ID
+            trace_memory: 是否用tracemalloc记录各阶段的内存峰值
+            log_path: JSONL日志路径，为None时不写日志
+        """
+        self.project_id = project_id
+        self.trace_memory = trace_memory
+        self.log_path = log_path
+        self.started_at = time.time()
+        self.values: Dict[str, Any] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._logged = False
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'RunMetrics':
+        """按配置中的metrics段创建"""
+        metrics_config = config.get('metrics') or {}
+        log_path = None
+        if metrics_config.get('log', True):
+            log_path = metrics_config.get('log_path') or os.environ.get('ROSETTA_METRICS_LOG') or DEFAULT_LOG_PATH
+        return cls(config['project']['project_id'], metrics_config.get('trace_memory', False), log_path)
+
+    @contextmanager
+    def stage(self, name: str):
+        """计量一个阶段：耗时、CPU时间、结束时的常驻内存和（可选）内存峰值"""
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        if self.trace_memory:
+            start_tracing()
+        try:
+            yield
+        finally:
+            values = {
+                'seconds': round(time.perf_counter() - started, 3),
+                'cpu_seconds': round(time.thread_time() - cpu_started, 3),
+                'rss_mb': current_rss_mb()
+            }
+            if self.trace_memory:
+                values['peak_traced_mb'] = stop_tracing()
+            self.record(name, **values)
+
+    def record(self, stage: Optional[str] = None, **values):
+        """记录指标，stage为None时记录为整体指标"""
+        with self._lock:
+            target = self.values if stage is None else self.stages.setdefault(stage, {})
+            target.update(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """指标快照（附带吞吐量、压缩比等派生值）"""
+        with self._lock:
+            stages = {name: dict(values) for name, values in self.stages.items()}
+            metrics = dict(self.values)
+
+        download = stages.get('download', {})
+        if download.get('bytes') and download.get('seconds'):
+            download['mb_per_s'] = round(download['bytes'] / _MB / download['seconds'], 2)
+        compress = stages.get('compress', {})
+        if compress.get('bytes_in') and compress.get('bytes_out'):
+            compress['compression_ratio'] = round(compress['bytes_in'] / compress['bytes_out'], 2)
+        split = stages.get('split', {})
+        if split.get('frames') and split.get('seconds'):
+            split['frames_per_s'] = round(split['frames'] / split['seconds'], 1)
+
+        metrics.update({
+            'project_id': str(self.project_id),
+            'started_at': self.started_at,
+            'total_seconds': round(time.time() - self.started_at, 3),
+            'stages': stages
+        })
+        return metrics
+
+    def finish(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """结束计量并写入日志（只写一次）
+
+        Args:
+            status: 处理状态
+
+        Returns:
+            Dict[str, Any]: 指标
+        """
+        if status is not None:
+            self.record(status=status)
+        metrics = self.to_dict()
+        if self.log_path and not self._logged:
+            self._logged = True
+            try:
+                line = json.dumps(dict(metrics, logged_at=time.time()), ensure_ascii=False, default=str)
+                with _log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                print(f"⚠️ 写入运行指标日志失败：{str(e)}")
+        return metrics
@@ -6,22 +6,33 @@
 import os
 import yaml
 import time
+from contextlib import nullcontext
 from typing import Optional, List, Dict
 from .downloader import RosettaDownloader
 from .extractor import FrameExtractor
+# 与内存版共用的模块以顶层名称导入，只加载一次（见src/__init__.py）
+from task_filter import TaskFilter
+from batch_executor import BatchExecutor
+from resource_budget import ResourceBudget
+from checkpoint import Checkpoint
 
 
 class ExtractionPipeline:
     """拆帧处理管道"""
     
-    def __init__(self, config_path: str = "config.yaml"):
+    def __init__(self, config_path: str = "config.yaml", task_filter: Optional[TaskFilter] = None):
         """初始化管道
         
         Args:
             config_path: 配置文件路径
+            task_filter: 任务过滤条件，为None时使用配置文件中的filter段
         """
         self.config_path = config_path
         self.config = self._load_config()
+        self.task_filter = task_filter or TaskFilter.from_config(self.config.get('filter'))
+        # 并发批处理时限制同时进行的下载数
+        max_connections = (self.config.get('batch') or {}).get('max_connections')
+        self.connection_budget = ResourceBudget(max_connections, 'connections') if max_connections else None
         self.downloader = RosettaDownloader(config_path)
         self.extractor = FrameExtractor(config_path)
     
@@ -58,16 +69,30 @@ class ExtractionPipeline:
             )
             if not os.path.exists(project_path):
                 raise FileNotFoundError(f"测试模式下路径不存在：{project_path}")
+            checkpoint = None
         else:
-            # 下载数据
-            project_path = self.downloader.download_project_data(
-                project_id=project_id,
-                pool_ids=pool_ids
-            )
+            checkpoint = Checkpoint.from_config(self.config, project_id, pool_ids)
+            project_path = checkpoint.stage_info('download').get('project_path') if checkpoint else None
+            if project_path and os.path.exists(project_path):
+                print(f"从检查点恢复已下载的项目数据：{project_path}，跳过下载")
+            else:
+                # 下载数据
+                connection = self.connection_budget.reserve(1) if self.connection_budget else nullcontext()
+                with connection:
+                    project_path = self.downloader.download_project_data(
+                        project_id=project_id,
+                        pool_ids=pool_ids,
+                        task_filter=self.task_filter
+                    )
+                if checkpoint is not None:
+                    checkpoint.activate()
+                    checkpoint.complete_stage('download', project_path=project_path)
         
         # 检查是否启用拆帧
         if not self.config['frame_extraction']['enabled']:
             print("拆帧功能已禁用，跳过拆帧步骤")
+            if checkpoint is not None:
+                checkpoint.clear()
             return {
                 'project_id': str(project_id),
                 'project_path': project_path,
@@ -76,7 +101,10 @@ class ExtractionPipeline:
             }
         
         # 执行拆帧
-        extracted_path = self.extractor.extract_frames(project_path)
+        extracted_path = self.extractor.extract_frames(project_path, task_filter=self.task_filter,
+                                                       checkpoint=checkpoint)
+        if checkpoint is not None:
+            checkpoint.clear()
         
         # 构建导出路径
         if self.config['frame_extraction']['output']['add_timestamp']:
@@ -99,37 +127,25 @@ class ExtractionPipeline:
             'status': 'completed'
         }
     
-    def process_multiple_projects(self, projects: List[Dict]) -> List[Dict[str, str]]:
+    def process_multiple_projects(self, projects: List[Dict], max_workers: int = None) -> List[Dict[str, str]]:
         """批量处理多个项目
         
         Args:
             projects: 项目列表，每个项目包含project_id, pool_ids, project_name
+            max_workers: 最大并发项目数，为None时使用配置中的batch.max_workers（默认1）
             
         Returns:
-            List[Dict[str, str]]: 所有项目的处理结果
+            List[Dict[str, str]]: 所有项目的处理结果，顺序与输入一致
         """
-        results = []
-        
-        for i, project in enumerate(projects, 1):
-            print(f"\n【{i}/{len(projects)}】处理项目：{project['project_name']} (ID: {project['project_id']})")
-            
-            try:
-                result = self.process_single_project(
-                    project_id=project['project_id'],
-                    pool_ids=project['pool_ids'],
-                    project_name=project['project_name']
-                )
-                results.append(result)
-                print(f"✅ 项目 {project['project_id']} 处理完成")
-            except Exception as e:
-                print(f"❌ 项目 {project['project_id']} 处理失败：{str(e)}")
-                results.append({
-                    'project_id': str(project['project_id']),
-                    'error': str(e),
-                    'status': 'failed'
-                })
+        def run_project(project):
+            return self.process_single_project(
+                project_id=project['project_id'],
+                pool_ids=project['pool_ids'],
+                project_name=project['project_name']
+            )
         
-        return results
+        executor = BatchExecutor.from_config(run_project, self.config.get('batch'), max_workers)
+        return executor.run(projects)
     
     def get_project_info(self, project_path: str) -> Dict:
         """获取项目详细信息
@@ -0,0 +1,222 @@
+"""
+运行性能分析
+按需对单次处理做性能分析，结果随结果压缩包一起下载（_profile/目录），
+无法登录服务器（如Streamlit Cloud）时也能拿到真实的性能数据：
+- CPU：安装了pyinstrument时使用采样分析（开销小），否则使用cProfile（确定性分析）
+- 内存：tracemalloc在开始和结束时各取一次快照，输出分配最多的代码行和两次快照的差异
+
+分析只覆盖执行处理的线程；tracemalloc为进程级，多个任务并发时分配统计相互包含。
+"""
+
+import io
+import sys
+import json
+import time
+import pstats
+import marshal
+import zipfile
+import platform
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+from metrics import start_tracing, stop_tracing
+
+
+PROFILE_DIR = '_profile'
+DEFAULT_TOP_N = 30
+
+# 复制已有压缩包时每次写入的字节数
+_COPY_CHUNK = 1024 * 1024
+
+# 不计入内存统计的模块（分析工具自身）
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+
+def _sampling_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler(async_mode='disabled')
+
+
+def add_files_to_zip(zip_data: bytes, files: Dict[str, bytes], output=None) -> bytes:
+    """在已有压缩包末尾追加文件（已有成员的偏移不变，帧随机访问索引仍然有效）
+
+    Args:
+        zip_data: 压缩包（bytes或只读mmap）
+        files: 文件路径到内容的映射
+        output: 写入的缓冲区（支持read/write/seek/truncate，如src/memory_budget.py中可溢出到磁盘的SpillBuffer），
+            为None时使用BytesIO；原压缩包分块复制进来，不整体复制到内存
+
+    Returns:
+        bytes: 追加后的压缩包（output溢出到磁盘时为只读mmap）
+    """
+    buffer = output if output is not None else io.BytesIO()
+    view = memoryview(zip_data)
+    for offset in range(0, len(view), _COPY_CHUNK):
+        buffer.write(view[offset:offset + _COPY_CHUNK])
+    view.release()
+    buffer.seek(0)
+    with zipfile.ZipFile(buffer, 'a', zipfile.ZIP_DEFLATED) as zipf:
+        for path, content in files.items():
+            zipf.writestr(path, content)
+    return buffer.getvalue()
+
+
+class RunProfiler:
+    """单次处理的性能分析器"""
+
+    def __init__(self, mode: str = 'auto', top_n: int = DEFAULT_TOP_N, trace_memory: bool = True):
+        """
+        Args:
+            mode: CPU分析方式，auto（有pyinstrument时采样，否则cProfile）/ sampling / cprofile
+            top_n: 报告中列出的函数和代码行数量
+            trace_memory: 是否记录tracemalloc快照
+        """
+        self.mode = mode
+        self.top_n = top_n
+        self.trace_memory = trace_memory
+        self.profiler = None
+        self.cpu_profiler = None
+        self.errors: List[str] = []
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self.peak_traced_mb: Optional[float] = None
+        self._start_snapshot = None
+        self._end_snapshot = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['RunProfiler']:
+        """按配置中的profiling段创建，未启用时返回None"""
+        profiling_config = config.get('profiling')
+        if not profiling_config or not profiling_config.get('enabled', False):
+            return None
+        return cls(profiling_config.get('mode', 'auto'), profiling_config.get('top_n', DEFAULT_TOP_N),
+                   profiling_config.get('trace_memory', True))
+
+    def start(self):
+        """开始分析（在执行处理的线程中调用）"""
+        if self.mode in ('auto', 'sampling'):
+            self.profiler = _sampling_profiler()
+            if self.profiler is not None:
+                self.cpu_profiler = 'pyinstrument'
+            elif self.mode == 'sampling':
+                self.errors.append("未安装pyinstrument，改用cProfile")
+        if self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.cpu_profiler = 'cprofile'
+
+        try:
+            if self.cpu_profiler == 'pyinstrument':
+                self.profiler.start()
+            else:
+                self.profiler.enable()
+        except (ValueError, RuntimeError) as e:
+            # 同一时间只能有一个分析器（如另一个任务正在分析）
+            self.errors.append(f"CPU分析未启动：{str(e)}")
+            self.profiler = None
+            self.cpu_profiler = None
+
+        if self.trace_memory:
+            start_tracing()
+            self._start_snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        self.started_at = time.perf_counter()
+        print(f"🔬 性能分析已开启（CPU：{self.cpu_profiler or '无'}，内存：{'tracemalloc' if self.trace_memory else '无'}）")
+
+    def stop(self):
+        """结束分析"""
+        self.elapsed = time.perf_counter() - self.started_at
+        if self.profiler is not None:
+            if self.cpu_profiler == 'pyinstrument':
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+        if self.trace_memory:
+            self._end_snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            self.peak_traced_mb = stop_tracing()
+
+    def __enter__(self) -> 'RunProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _cprofile_files(self) -> Dict[str, bytes]:
+        stats = pstats.Stats(self.profiler)
+        text = io.StringIO()
+        stats.stream = text
+        text.write(f"=== 按累计耗时排序（前 {self.top_n} 个）===\n")
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        text.write(f"\n=== 按自身耗时排序（前 {self.top_n} 个）===\n")
+        stats.sort_stats('tottime').print_stats(self.top_n)
+
+        # 与pstats.Stats.dump_stats相同的格式，可用 python -m pstats 或 snakeviz 打开
+        return {
+            f"{PROFILE_DIR}/cpu_profile.txt": text.getvalue().encode('utf-8'),
+            f"{PROFILE_DIR}/cpu_profile.prof": marshal.dumps(stats.stats)
+        }
+
+    def _sampling_files(self) -> Dict[str, bytes]:
+        return {
+            f"{PROFILE_DIR}/cpu_profile.txt": self.profiler.output_text(unicode=True, color=False).encode('utf-8'),
+            f"{PROFILE_DIR}/cpu_profile.html": self.profiler.output_html().encode('utf-8')
+        }
+
+    def _allocation_report(self) -> bytes:
+        lines = [f"内存峰值（tracemalloc）：{self.peak_traced_mb} MB", "",
+                 f"=== 结束时仍在占用的内存，按代码行（前 {self.top_n} 行）==="]
+        for stat in self._end_snapshot.statistics('lineno')[:self.top_n]:
+            lines.append(str(stat))
+        lines += ["", f"=== 相对开始时的增长，按代码行（前 {self.top_n} 行）==="]
+        for stat in self._end_snapshot.compare_to(self._start_snapshot, 'lineno')[:self.top_n]:
+            lines.append(str(stat))
+        lines += ["", f"=== 结束时仍在占用的内存，按调用栈（前 {min(self.top_n, 10)} 个）==="]
+        for stat in self._end_snapshot.statistics('traceback')[:min(self.top_n, 10)]:
+            lines.append(f"{stat.count} 个内存块，{stat.size / 1024:.1f} KiB")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return '\n'.join(lines).encode('utf-8')
+
+    def output_files(self) -> Dict[str, bytes]:
+        """分析结果文件（路径位于_profile/目录下）"""
+        files: Dict[str, bytes] = {}
+        if self.cpu_profiler == 'pyinstrument':
+            files.update(self._sampling_files())
+        elif self.cpu_profiler == 'cprofile':
+            files.update(self._cprofile_files())
+        if self._end_snapshot is not None:
+            files[f"{PROFILE_DIR}/allocations.txt"] = self._allocation_report()
+
+        summary = {
+            'cpu_profiler': self.cpu_profiler,
+            'trace_memory': self.trace_memory,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'peak_traced_mb': self.peak_traced_mb,
+            'top_n': self.top_n,
+            'python': sys.version,
+            'platform': platform.platform(),
+            'errors': self.errors,
+            'files': sorted(files)
+        }
+        files[f"{PROFILE_DIR}/summary.json"] = json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8')
+        return files
+
+    def attach(self, zip_data: bytes, output=None) -> bytes:
+        """把分析结果追加到结果压缩包
+
+        Args:
+            zip_data: 结果压缩包
+            output: 写入的缓冲区，见add_files_to_zip
+        """
+        try:
+            return add_files_to_zip(zip_data, self.output_files(), output)
+        except Exception as e:
+            print(f"⚠️ 写入性能分析结果失败：{str(e)}")
+            return zip_data
@@ -0,0 +1,245 @@
+"""
+进度事件通道
+下载、解压、拆帧、打包各阶段按字节数或条目数上报进度，
+汇总为总体百分比、吞吐量和预计剩余时间，供界面进度条显示。
+上报器可携带取消令牌，各阶段在上报进度时顺带检查取消。
+"""
+
+import time
+import threading
+from typing import Dict, Any, Callable, Optional
+
+from cancellation import CancellationToken
+
+
+# 各阶段在总体进度中的区间（起点, 终点），单位为百分比
+DEFAULT_STAGE_SPANS = {
+    'download': (0, 40),
+    'unzip': (40, 50),
+    'split': (50, 85),
+    'compress': (85, 100)
+}
+
+STAGE_LABELS = {
+    'download': '下载',
+    'unzip': '解压',
+    'split': '拆帧',
+    'compress': '打包'
+}
+
+# 默认读取块大小
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def _format_amount(amount: float, unit: str) -> str:
+    if unit != 'bytes':
+        return f"{int(amount)}"
+    for suffix in ['B', 'KB', 'MB', 'GB']:
+        if amount < 1024.0:
+            return f"{amount:.1f} {suffix}"
+        amount /= 1024.0
+    return f"{amount:.1f} TB"
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}时{seconds % 3600 // 60}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    """把进度事件格式化为一行说明，如：下载 12.0 MB / 50.0 MB · 2.0 MB/s · 剩余 19秒"""
+    unit = event['unit']
+    parts = [STAGE_LABELS.get(event['stage'], event['stage'])]
+    if event['total']:
+        parts[0] += f" {_format_amount(event['done'], unit)} / {_format_amount(event['total'], unit)}"
+    else:
+        parts[0] += f" {_format_amount(event['done'], unit)}"
+    if unit != 'bytes':
+        parts[0] += f" {event['unit_label']}"
+    if event['rate']:
+        rate_unit = '/s' if unit == 'bytes' else f" {event['unit_label']}/s"
+        parts.append(f"{_format_amount(event['rate'], unit)}{rate_unit}")
+    if event['eta'] is not None:
+        parts.append(f"剩余 {_format_duration(event['eta'])}")
+    for name, value in event['counters'].items():
+        parts.append(f"{name} {value}")
+    return ' · '.join(parts)
+
+
+class ProgressReporter:
+    """进度上报器（线程安全，上报频率受min_interval限制）"""
+
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 stage_spans: Optional[Dict[str, tuple]] = None, min_interval: float = 0.5,
+                 cancel_token: Optional[CancellationToken] = None):
+        """
+        Args:
+            callback: 进度事件回调，为None时只计数不上报
+            stage_spans: 各阶段在总体进度中的区间
+            min_interval: 两次上报的最小间隔（秒），阶段开始和结束总会上报
+            cancel_token: 取消令牌，请求取消后start_stage/advance/check_cancelled抛出OperationCancelled
+        """
+        self.callback = callback
+        self.cancel_token = cancel_token
+        self.stage_spans = stage_spans or DEFAULT_STAGE_SPANS
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_emit = 0.0
+        self.stage: Optional[str] = None
+        self.unit = ''
+        self.unit_label = ''
+        self.total: Optional[float] = None
+        self.done = 0.0
+        self.started_at = 0.0
+        self.counters: Dict[str, int] = {}
+
+    def start_stage(self, stage: str, total: Optional[float] = None,
+                    unit: str = 'items', unit_label: str = '项'):
+        """开始新阶段
+
+        Args:
+            stage: 阶段名（download/unzip/split/compress）
+            total: 总量，未知时为None
+            unit: 计量单位，bytes按字节格式化
+            unit_label: 非字节单位的显示名称
+        """
+        self.check_cancelled()
+        with self._lock:
+            self.stage = stage
+            self.total = total or None
+            self.unit = unit
+            self.unit_label = unit_label
+            self.done = 0.0
+            self.started_at = time.time()
+            self.counters = {}
+        self._emit(force=True)
+
+    def set_total(self, total: Optional[float]):
+        with self._lock:
+            self.total = total or None
+
+    def advance(self, amount: float = 1):
+        """累加当前阶段的完成量，同时检查取消"""
+        self.check_cancelled()
+        with self._lock:
+            self.done += amount
+        self._emit()
+
+    def check_cancelled(self):
+        """已请求取消时抛出OperationCancelled（用于没有进度可报的内层循环，如逐帧生成）"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def count(self, name: str, amount: int = 1):
+        """累加附加计数（如已写出的帧数），随进度事件一起上报"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish_stage(self):
+        """结束当前阶段，完成量补齐到总量"""
+        with self._lock:
+            if self.total:
+                self.done = self.total
+        self._emit(force=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前进度事件"""
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            rate = self.done / elapsed if elapsed > 0 and self.done else 0.0
+            fraction = min(self.done / self.total, 1.0) if self.total else 0.0
+            eta = (self.total - self.done) / rate if self.total and rate else None
+            start, end = self.stage_spans.get(self.stage, (0, 100))
+            return {
+                'stage': self.stage,
+                'done': self.done,
+                'total': self.total,
+                'unit': self.unit,
+                'unit_label': self.unit_label,
+                'rate': rate,
+                'eta': eta,
+                'elapsed': elapsed,
+                'percent': int(start + (end - start) * fraction),
+                'counters': dict(self.counters)
+            }
+
+    def _emit(self, force: bool = False):
+        if self.callback is None or self.stage is None:
+            return
+        now = time.time()
+        if not force and now - self._last_emit < self.min_interval:
+            return
+        self._last_emit = now
+        self.callback(self.snapshot())
+
+
+def ensure_progress(progress: Optional[ProgressReporter]) -> ProgressReporter:
+    """未传入上报器时返回只计数不上报的上报器，调用方无需判空"""
+    return progress if progress is not None else ProgressReporter()
+
+
+def read_stream(read: Callable[[int], bytes], total: Optional[int],
+                progress: Optional[ProgressReporter], stage: str = 'download',
+                chunk_size: int = DEFAULT_CHUNK_SIZE, memory=None) -> bytes:
+    """分块读取数据流并按字节上报进度
+
+    Args:
+        read: 读取函数，参数为最大字节数，读完时返回空
+        total: 总字节数（如Content-Length），未知时为None
+        progress: 进度上报器
+        stage: 阶段名
+        chunk_size: 每次读取的字节数
+        memory: 作业内存管理（memory_budget.JobMemory），传入时写入按预算选择存放位置的缓冲区
+
+    Returns:
+        bytes: 读取到的全部数据（传入作业内存管理且溢出到磁盘时为只读mmap，用法与bytes相同）
+    """
+    progress = ensure_progress(progress)
+    progress.start_stage(stage, total, unit='bytes')
+    if memory is not None:
+        # 按总字节数选择执行模式，超出预算时转为写入临时文件
+        buffer = memory.buffer(stage, total)
+        write = buffer.write
+    else:
+        buffer = bytearray()
+        write = buffer.extend
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        write(chunk)
+        progress.advance(len(chunk))
+    progress.finish_stage()
+    return buffer.getvalue() if memory is not None else bytes(buffer)
+
+
+def read_response(response, progress: Optional[ProgressReporter], stage: str = 'download',
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, memory=None) -> bytes:
+    """分块读取requests流式响应（stream=True）并按字节上报下载进度
+
+    Args:
+        response: requests响应对象
+        progress: 进度上报器
+        stage: 阶段名
+        chunk_size: 每次读取的字节数
+        memory: 作业内存管理，传入时按预算存放响应内容
+
+    Returns:
+        bytes: 响应内容
+    """
+    total = response.headers.get('Content-Length')
+    chunks = response.iter_content(chunk_size)
+
+    def read(_):
+        return next(chunks, b'')
+
+    try:
+        return read_stream(read, int(total) if total and total.isdigit() else None, progress, stage, chunk_size,
+                           memory)
+    finally:
+        # 取消或出错时立即释放连接
+        response.close()
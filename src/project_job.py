@@ -0,0 +1,79 @@
+"""
+单项目处理任务
+下载、拆帧并打包一个项目，供后台任务管理器在工作线程中执行
+"""
+
+from typing import Dict, Any, Callable, Optional
+
+from config import StreamlitConfig
+from memory_pipeline import MemoryExtractionPipeline
+from utils import format_file_size
+from result_manifest import manifest_from_zip
+from progress import ProgressReporter, format_event
+from profiling import RunProfiler
+from cancellation import CancellationToken
+from memory_budget import open_buffer
+from scheduler import get_download_budget
+
+
+def run_project_job(params: Dict[str, Any], progress_callback: Callable[[int, str], None],
+                    cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+    """处理项目（内存版）
+
+    Args:
+        params: 处理参数（与StreamlitConfig.create_memory_config的参数一致）
+        progress_callback: 进度回调，参数为百分比和说明
+        cancel_token: 取消令牌，取消后抛出OperationCancelled
+
+    Returns:
+        Dict[str, Any]: 处理结果，zip_data为结果压缩包，manifest为文件清单
+    """
+    try:
+        # 创建内存配置（不写入文件）
+        config = StreamlitConfig().create_memory_config(params)
+        progress_callback(0, "配置准备完成")
+
+        # 各阶段按实际字节数和条目数上报进度，附带吞吐量和预计剩余时间
+        progress = ProgressReporter(lambda event: progress_callback(event['percent'], format_event(event)),
+                                    cancel_token=cancel_token)
+
+        # 初始化内存管道（下载阶段占用进程内共享的下载连接预算）
+        pipeline = MemoryExtractionPipeline(config, connection_budget=get_download_budget(), progress=progress)
+
+        # 按需对整个处理过程做性能分析，分析结果追加到结果压缩包的_profile/目录
+        profiler = RunProfiler.from_config(config)
+        if profiler is not None:
+            profiler.start()
+        try:
+            # 处理项目
+            result = pipeline.process_single_project()
+
+            # 创建结果ZIP文件
+            zip_data = pipeline.create_result_zip(result)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            if pipeline.checkpoint is not None:
+                # 处理失败时同样释放检查点锁，保留的检查点供重新提交时继续
+                pipeline.checkpoint.close()
+        progress.check_cancelled()
+        if profiler is not None:
+            # 追加后的压缩包同样按内存预算存放，超出时写入磁盘
+            zip_data = profiler.attach(zip_data, pipeline.memory.buffer('profile'))
+
+        progress_callback(100, "处理完成")
+
+        return {
+            'project_id': result['project_id'],
+            'manifest': manifest_from_zip(open_buffer(zip_data)),
+            'zip_data': zip_data,
+            'status': result['status'],
+            'size': format_file_size(len(zip_data)),
+            'frame_extraction': result.get('frame_extraction', False),
+            'cache_hit': result.get('cache_hit', False),
+            'message': result.get('message', '处理完成'),
+            'metrics': result.get('metrics')
+        }
+
+    except Exception as e:
+        raise Exception(f"项目处理失败: {str(e)}")
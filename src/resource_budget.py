@@ -0,0 +1,83 @@
+"""
+资源预算
+带权重的计数信号量，用于限制并发任务占用的内存、连接数等全局资源
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+
+# 等待资源时检查取消的间隔（秒）
+CANCEL_POLL_SECONDS = 0.2
+
+
+class ResourceBudget:
+    """资源预算（带权重的信号量）"""
+
+    def __init__(self, capacity: float, name: str = ''):
+        """
+        Args:
+            capacity: 资源总量（如内存MB数、连接数）
+            name: 资源名称，用于日志
+        """
+        if capacity <= 0:
+            raise ValueError(f"资源预算必须为正数：{capacity}")
+        self.capacity = capacity
+        self.name = name
+        self.in_use = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def available(self) -> float:
+        return self.capacity - self.in_use
+
+    def _clamp(self, amount: float) -> float:
+        # 单个请求超过总量时按总量计，避免永远无法满足
+        return min(max(amount, 0), self.capacity)
+
+    def acquire(self, amount: float = 1, timeout: Optional[float] = None) -> bool:
+        """申请资源，资源不足时阻塞等待
+
+        Args:
+            amount: 申请数量
+            timeout: 超时时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否申请成功
+        """
+        amount = self._clamp(amount)
+        with self._condition:
+            acquired = self._condition.wait_for(lambda: self.in_use + amount <= self.capacity, timeout)
+            if acquired:
+                self.in_use += amount
+            return acquired
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        """非阻塞申请资源"""
+        return self.acquire(amount, timeout=0)
+
+    def release(self, amount: float = 1):
+        """释放资源"""
+        amount = self._clamp(amount)
+        with self._condition:
+            self.in_use = max(self.in_use - amount, 0)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, amount: float = 1, cancel_token=None):
+        """在with块内占用资源
+
+        Args:
+            amount: 占用数量
+            cancel_token: 取消令牌（cancellation.CancellationToken），等待期间取消时抛出OperationCancelled
+        """
+        if cancel_token is None:
+            self.acquire(amount)
+        else:
+            while not self.acquire(amount, timeout=CANCEL_POLL_SECONDS):
+                cancel_token.raise_if_cancelled()
+        try:
+            yield
+        finally:
+            self.release(amount)
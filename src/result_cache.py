@@ -0,0 +1,223 @@
+"""
+结果压缩包缓存
+以 规范化处理参数 + 导出内容哈希 为键，把打包好的结果压缩包缓存在本地磁盘，
+按总字节数上限做LRU淘汰，相同的请求可以直接返回已有的压缩包。
+结果来自大文件接口的导出时，另以导出记录（文件名、大小、记录ID）为别名，下载前即可命中
+"""
+
+import os
+import json
+import time
+import zipfile
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from memory_budget import open_buffer
+
+
+# 默认缓存目录和容量
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'rosetta_result_cache')
+DEFAULT_MAX_MB = 2048
+
+
+def content_hash(data: bytes) -> str:
+    """导出压缩包的内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(config: Dict[str, Any], export_hash: str) -> str:
+    """计算缓存键：只包含影响结果内容的参数，账号、下载方式等不参与
+
+    Args:
+        config: 管道配置
+        export_hash: 导出压缩包的内容哈希
+
+    Returns:
+        str: 缓存键
+    """
+    normalized = {
+        'project_id': str(config['project']['project_id']),
+        'pool_ids': sorted(str(pool_id) for pool_id in config['project']['pool_ids']),
+        'check_pool': bool(config['download'].get('check_pool', False)),
+        'frame_extraction': config['frame_extraction'],
+        'filter': config.get('filter'),
+        'export': export_hash
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def identity_cache_key(config: Dict[str, Any], identity: Dict[str, Any]) -> str:
+    """按导出记录计算缓存别名：处理参数相同、导出记录相同的请求不下载即可命中
+
+    Args:
+        config: 管道配置
+        identity: 导出标识（SmartMemoryRosettaClient.query_export_identity）
+
+    Returns:
+        str: 缓存键
+    """
+    return cache_key(config, 'export-log:' + json.dumps(identity, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class ResultCache:
+    """结果压缩包的磁盘缓存（按总字节数LRU淘汰）"""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            root: 缓存目录
+            max_bytes: 缓存总字节数上限
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 缓存键 -> (大小, 最近访问时间)
+        self._entries: Dict[str, Tuple[int, float]] = {}
+
+        os.makedirs(self.root, exist_ok=True)
+        self._scan()
+
+    def _zip_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.zip")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _alias_path(self, alias: str) -> str:
+        return os.path.join(self.root, f"{alias}.alias")
+
+    def _resolve(self, key: str) -> str:
+        """别名指向的缓存键，不是别名时原样返回"""
+        if key in self._entries or not os.path.isfile(self._alias_path(key)):
+            return key
+        try:
+            with open(self._alias_path(key), 'r', encoding='utf-8') as f:
+                target = f.read().strip()
+        except OSError:
+            return key
+        if target not in self._entries:
+            # 指向的条目已被淘汰
+            os.remove(self._alias_path(key))
+        return target
+
+    def _scan(self):
+        """从磁盘恢复缓存条目，以文件修改时间作为最近访问时间"""
+        for name in os.listdir(self.root):
+            if not name.endswith('.zip'):
+                continue
+            key = name[:-len('.zip')]
+            if not os.path.isfile(self._meta_path(key)):
+                continue
+            stat = os.stat(self._zip_path(key))
+            self._entries[key] = (stat.st_size, stat.st_mtime)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for size, _ in self._entries.values())
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """读取缓存
+
+        Args:
+            key: 缓存键或别名
+
+        Returns:
+            Optional[Tuple[bytes, Dict[str, Any]]]: (压缩包数据, 结果信息)，未命中时返回None
+        """
+        with self._lock:
+            key = self._resolve(key)
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._zip_path(key), 'rb') as f:
+                    zip_data = f.read()
+                with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取结果缓存失败，丢弃该条目：{str(e)}")
+                self._remove(key)
+                return None
+
+            now = time.time()
+            os.utime(self._zip_path(key), (now, now))
+            self._entries[key] = (len(zip_data), now)
+            return zip_data, meta
+
+    def put(self, key: str, zip_data: bytes, meta: Dict[str, Any], alias: Optional[str] = None):
+        """写入缓存，超过容量时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            zip_data: 结果压缩包数据
+            meta: 结果信息（状态、说明等，不含文件数据）
+            alias: 指向该条目的别名（identity_cache_key），为None时不写别名
+        """
+        if not zip_data or not zipfile.is_zipfile(open_buffer(zip_data)):
+            print("⚠️ 结果压缩包为空或无法打开，不缓存")
+            return
+        if len(zip_data) > self.max_bytes:
+            print(f"结果压缩包超过缓存容量，不缓存（{len(zip_data)} 字节）")
+            return
+
+        with self._lock:
+            temp_path = f"{self._zip_path(key)}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(zip_data)
+                with open(self._meta_path(key), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(temp_path, self._zip_path(key))
+                if alias:
+                    with open(self._alias_path(alias), 'w', encoding='utf-8') as f:
+                        f.write(key)
+            except OSError as e:
+                print(f"⚠️ 写入结果缓存失败：{str(e)}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+
+            self._entries[key] = (len(zip_data), time.time())
+            self._evict()
+
+    def _evict(self):
+        total = self.total_bytes
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            print(f"结果缓存淘汰 {key[:12]}（{size} 字节）")
+            self._remove(key)
+            total -= size
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        for path in (self._zip_path(key), self._meta_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(cache_config: Optional[Dict[str, Any]]) -> Optional[ResultCache]:
+    """按配置获取进程内共享的缓存实例，同一目录只创建一个实例
+
+    Args:
+        cache_config: 配置中的cache段
+
+    Returns:
+        Optional[ResultCache]: 缓存实例，未启用时返回None
+    """
+    if not cache_config or not cache_config.get('enabled', True):
+        return None
+    root = cache_config.get('dir') or DEFAULT_CACHE_DIR
+    max_bytes = int(cache_config.get('max_mb', DEFAULT_MAX_MB) * 1024 * 1024)
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = ResultCache(root, max_bytes)
+        cache.max_bytes = max_bytes
+        return cache
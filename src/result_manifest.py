@@ -0,0 +1,93 @@
+"""
+结果文件清单
+从结果压缩包生成轻量清单（路径、大小、taskId、帧序号），以列式结构保存，
+结果页面据此分页、搜索和按任务汇总，无需加载文件内容
+"""
+
+import os
+import re
+import json
+import zipfile
+from typing import Dict, Any, BinaryIO, Callable, List, Union
+
+from frame_output import JSONL_INDEX_NAME
+
+
+# 清单列
+MANIFEST_COLUMNS = ('path', 'size', 'taskId', 'frame')
+
+# 逐帧布局：<原目录>/<taskId>/<原文件名>_<帧序号>.json；共享上下文文件：<taskId>/<原文件名>_context.json
+_FRAME_PATH = re.compile(r'(?:^|/)([^/]+)/[^/]*_(\d{6})\.json$')
+_CONTEXT_PATH = re.compile(r'(?:^|/)([^/]+)/[^/]*_context\.json$')
+
+
+def _task_id(value: str) -> Union[int, str]:
+    return int(value) if value.isdigit() else value
+
+
+def build_manifest(sizes: Dict[str, int], read_file: Callable[[str], bytes]) -> Dict[str, List[Any]]:
+    """生成结果文件清单
+
+    逐帧布局每个帧文件一行；JSONL布局按分片索引展开为每帧一行（路径为所在分片，大小为该帧行长度），
+    分片文件本身不再单独列出，避免按任务汇总时重复计算。
+
+    Args:
+        sizes: 文件路径到大小的映射
+        read_file: 按路径读取文件内容的回调（只用于读取JSONL分片索引）
+
+    Returns:
+        Dict[str, List[Any]]: 列式清单，键为MANIFEST_COLUMNS
+    """
+    manifest: Dict[str, List[Any]] = {column: [] for column in MANIFEST_COLUMNS}
+
+    def add(path, size, task_id=None, frame=None):
+        manifest['path'].append(path)
+        manifest['size'].append(size)
+        manifest['taskId'].append(task_id)
+        manifest['frame'].append(frame)
+
+    expanded_shards = set()
+    for name in sizes:
+        if os.path.basename(name) != JSONL_INDEX_NAME:
+            continue
+        root = os.path.dirname(name)
+        index = json.loads(read_file(name))
+        for task in index.get('tasks', []):
+            shard = f"{root}/{task['shard']}" if root else task['shard']
+            expanded_shards.add(shard)
+            for frame, length in zip(task['frames'], task['lengths']):
+                add(shard, length, task['taskId'], frame)
+
+    for name, size in sizes.items():
+        if name in expanded_shards:
+            continue
+        match = _FRAME_PATH.search(name)
+        if match:
+            add(name, size, _task_id(match.group(1)), int(match.group(2)))
+            continue
+        match = _CONTEXT_PATH.search(name)
+        add(name, size, _task_id(match.group(1)) if match else None)
+
+    return manifest
+
+
+def manifest_from_zip(archive: Union[str, BinaryIO]) -> Dict[str, List[Any]]:
+    """从结果压缩包生成清单，只读取中央目录和分片索引
+
+    Args:
+        archive: 压缩包路径或文件对象
+
+    Returns:
+        Dict[str, List[Any]]: 列式清单
+    """
+    with zipfile.ZipFile(archive) as zip_file:
+        sizes = {info.filename: info.file_size for info in zip_file.infolist() if not info.is_dir()}
+        return build_manifest(sizes, zip_file.read)
+
+
+def manifest_summary(manifest: Dict[str, List[Any]]) -> Dict[str, int]:
+    """清单汇总：文件（帧）条目数和总大小"""
+    return {
+        'file_count': len(manifest['path']),
+        'total_size': sum(manifest['size'])
+    }
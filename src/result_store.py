@@ -0,0 +1,163 @@
+"""
+结果文件存储
+结果压缩包写入本地磁盘，会话中只保存句柄，下载时直接从文件读取；
+超过保留时间未被访问的结果由后台定时清理
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from typing import Dict, Any, BinaryIO, List, Optional
+
+
+# 默认存储目录和保留时间
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), 'rosetta_results')
+DEFAULT_TTL_HOURS = 24
+DEFAULT_SWEEP_INTERVAL = 600
+
+ARCHIVE_NAME = 'result.zip'
+META_NAME = 'meta.json'
+MANIFEST_NAME = 'manifest.json'
+
+
+class ResultStore:
+    """结果文件存储"""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, ttl_hours: float = DEFAULT_TTL_HOURS):
+        """
+        Args:
+            root: 存储目录
+            ttl_hours: 结果保留时间（小时），从最后一次访问开始计算
+        """
+        self.root = root
+        self.ttl_seconds = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, handle: str) -> str:
+        # 句柄只允许十六进制字符，防止越出存储目录
+        if not handle or not all(c in '0123456789abcdef' for c in handle):
+            raise ValueError(f"无效的结果句柄：{handle}")
+        return os.path.join(self.root, handle)
+
+    def archive_path(self, handle: str) -> str:
+        """结果压缩包的文件路径"""
+        return os.path.join(self._entry_dir(handle), ARCHIVE_NAME)
+
+    def put(self, zip_data: bytes, meta: Optional[Dict[str, Any]] = None,
+            manifest: Optional[Dict[str, List[Any]]] = None) -> str:
+        """保存结果压缩包
+
+        Args:
+            zip_data: 结果压缩包数据
+            meta: 结果信息（不含文件数据）
+            manifest: 列式文件清单
+
+        Returns:
+            str: 结果句柄
+        """
+        handle = uuid.uuid4().hex
+        entry_dir = self._entry_dir(handle)
+        os.makedirs(entry_dir)
+        with open(os.path.join(entry_dir, ARCHIVE_NAME), 'wb') as f:
+            f.write(zip_data)
+        if manifest is not None:
+            with open(os.path.join(entry_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        meta = dict(meta or {}, handle=handle, size_bytes=len(zip_data))
+        with open(os.path.join(entry_dir, META_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return handle
+
+    def exists(self, handle: str) -> bool:
+        return os.path.isfile(self.archive_path(handle))
+
+    def meta(self, handle: str) -> Optional[Dict[str, Any]]:
+        """读取结果信息，结果不存在或已过期时返回None"""
+        try:
+            with open(os.path.join(self._entry_dir(handle), META_NAME), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.touch(handle)
+        return meta
+
+    def manifest(self, handle: str) -> Optional[Dict[str, List[Any]]]:
+        """读取列式文件清单，不存在时返回None"""
+        try:
+            with open(os.path.join(self._entry_dir(handle), MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def open(self, handle: str) -> BinaryIO:
+        """打开结果压缩包用于读取（下载时按需读取，不整体载入会话）
+
+        Args:
+            handle: 结果句柄
+
+        Returns:
+            BinaryIO: 文件对象，调用方负责关闭
+        """
+        self.touch(handle)
+        return open(self.archive_path(handle), 'rb')
+
+    def touch(self, handle: str):
+        """刷新最后访问时间，延长保留期"""
+        try:
+            os.utime(self._entry_dir(handle))
+        except OSError:
+            pass
+
+    def remove(self, handle: str):
+        shutil.rmtree(self._entry_dir(handle), ignore_errors=True)
+
+    def sweep(self) -> int:
+        """清理超过保留时间未被访问的结果
+
+        Returns:
+            int: 清理的结果数
+        """
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for handle in os.listdir(self.root):
+                entry_dir = os.path.join(self.root, handle)
+                try:
+                    age = now - os.path.getmtime(entry_dir)
+                except OSError:
+                    continue
+                if age > self.ttl_seconds:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    removed += 1
+        if removed:
+            print(f"清理过期结果 {removed} 个")
+        return removed
+
+    def start_sweeper(self, interval: float = DEFAULT_SWEEP_INTERVAL, on_sweep=None):
+        """启动后台定时清理线程（重复调用只启动一次）
+
+        Args:
+            interval: 清理间隔（秒）
+            on_sweep: 每次清理后额外执行的回调
+        """
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.sweep()
+                    if on_sweep is not None:
+                        on_sweep()
+                except Exception as e:
+                    print(f"⚠️ 清理过期结果失败：{str(e)}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=run, name='result-sweeper', daemon=True)
+        self._sweeper.start()
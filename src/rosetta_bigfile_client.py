@@ -11,6 +11,12 @@ import os
 import json
 import shutil
 from typing import Optional, Dict, Any
+from credentials import get_oss_credentials
+from endpoints import service_url, service_host, oss_endpoint, oss_object_key, OSS_BUCKET
+from event_log import get_logger
+
+# 完整的请求参数和接口响应只在DEBUG级别输出
+log = get_logger('client')
 
 
 class Auth:
@@ -21,7 +27,7 @@ class Auth:
         Args:
             use_dev: 是否使用开发环境
         """
-        self.login_url = 'https://server.rosettalab.top/rosetta-service/user/login'
+        self.login_url = service_url('user/login')
 
     def get_authorize(self, username=None, password=None):
         """获取认证token
@@ -84,7 +90,7 @@ class RosettaBigFileClient(Auth):
         """
         super().__init__(use_dev)
         
-        self.get_url = 'https://server.rosettalab.top/rosetta-service/backDoor/queryProjectExportLog'
+        self.get_url = service_url('backDoor/queryProjectExportLog')
 
         self.project_id = project_id
         self.pool_id = pool_id
@@ -122,7 +128,7 @@ class RosettaBigFileClient(Auth):
             'Content-Type': 'application/json',
             'Accept': '*/*',
             'Cache-Control': 'no-cache',
-            'Host': 'server.rosettalab.top',
+            'Host': service_host(),
             'Connection': 'keep-alive',
         }
 
@@ -135,22 +141,8 @@ class RosettaBigFileClient(Auth):
             return True
 
     def _get_oss_config(self):
-        """获取OSS配置 - 仅从Streamlit Cloud secrets获取"""
-        try:
-            # 从Streamlit Cloud的secrets获取OSS配置
-            import streamlit as st
-            oss_config = {
-                'access_key': st.secrets["oss_credentials"]["access_key"],
-                'secret_key': st.secrets["oss_credentials"]["secret_key"]
-            }
-            print("✅ 成功从Streamlit Cloud secrets获取OSS配置")
-            return oss_config
-        except ImportError:
-            raise ValueError("Streamlit库未安装，无法获取OSS配置")
-        except KeyError as e:
-            raise ValueError(f"OSS配置未在Streamlit Cloud secrets中设置：{str(e)}。请在Streamlit Cloud的Secrets中添加[oss_credentials]配置")
-        except FileNotFoundError:
-            raise ValueError("Streamlit Cloud secrets文件未找到，请确保应用在Streamlit Cloud环境中运行")
+        """获取OSS配置（环境变量 → 凭据文件 → Streamlit secrets）"""
+        return get_oss_credentials()
 
     def _download_from_oss(self, oss_file_name: str, save_path: str) -> bool:
         """从OSS下载文件
@@ -171,13 +163,10 @@ class RosettaBigFileClient(Auth):
             
             # 创建OSS认证和桶对象
             auth = oss2.Auth(oss_config['access_key'], oss_config['secret_key'])
-            bucket_name = 'rosetta-data'
-            end_point = 'https://oss-cn-beijing.aliyuncs.com'
-            bucket = oss2.Bucket(auth, end_point, bucket_name)
+            bucket = oss2.Bucket(auth, oss_endpoint(), OSS_BUCKET)
             
             # 处理OSS文件路径
-            if oss_file_name.startswith('oss://rosetta-data/'):
-                oss_file_name = oss_file_name.lstrip('oss://rosetta-data/')
+            oss_file_name = oss_object_key(oss_file_name)
             
             # 下载文件
             object_stream = bucket.get_object(oss_file_name)
@@ -227,9 +216,9 @@ class RosettaBigFileClient(Auth):
 
         # 第一步：获取OSS文件信息
         resq = requests.post(self.get_url, json=self.req_data, headers=self._get_headers())
-        print("请求参数:", self.req_data)
+        log.debug(f"请求参数: {self.req_data}")
         print(f"API响应状态码: {resq.status_code}")
-        print("API原始响应文本:", resq.text[:500])  # 防止太长只打印前500字符
+        log.debug(f"API原始响应文本: {resq.text[:500]}")  # 防止太长只打印前500字符
 
         if resq.status_code != 200:
             error_msg = f"API请求失败，状态码: {resq.status_code}"
@@ -247,14 +236,12 @@ class RosettaBigFileClient(Auth):
         except Exception as e:
             raise ValueError(f"响应不是合法的JSON: {str(e)}, 原始响应: {resq.text[:200]}")
 
-        print("解析后的JSON:", json.dumps(data, ensure_ascii=False, indent=2))
+        log.debug(f"解析后的JSON: {json.dumps(data, ensure_ascii=False, indent=2)}")
 
         if 'data' not in data or len(data['data']) == 0:
             raise ValueError("API响应中没有文件数据")
 
         # 获取OSS文件路径
-        # ⚠️ 这里先打印出 data['data'][0]，确认字段名
-        print("data['data'][0]内容:", json.dumps(data['data'][0], ensure_ascii=False, indent=2))
 
         oss_file_name = data['data'][0].get('zipFileName')  # 用get避免KeyError
         if not oss_file_name:
@@ -11,6 +11,8 @@ import os
 import json
 import shutil
 
+from endpoints import service_url, service_host
+
 
 class Auth:
     """认证类"""
@@ -20,10 +22,8 @@ class Auth:
         Args:
             use_dev: 是否使用开发环境
         """
-        if use_dev:
-            self.login_url = 'https://dev-server.rosettalab.top/rosetta-service/user/login'
-        else:
-            self.login_url = 'https://server.rosettalab.top/rosetta-service/user/login'
+        self.use_dev = use_dev
+        self.login_url = service_url('user/login', use_dev)
 
     def get_authorize(self, username=None, password=None):
         """获取认证token
@@ -87,10 +87,7 @@ class GetRosData(Auth):
         """
         super().__init__(use_dev)
         
-        if use_dev:
-            self.get_url = 'https://dev-server.rosettalab.top/rosetta-service/project/doneTask/export'
-        else:
-            self.get_url = 'https://server.rosettalab.top/rosetta-service/project/doneTask/export'
+        self.get_url = service_url('project/doneTask/export', use_dev)
 
         self.project_id = project_id
         self.pool_id = pool_id
@@ -120,7 +117,7 @@ class GetRosData(Auth):
     def _get_headers(self):
         """获取请求头"""
         return {
-            "authority": "server.rosettalab.top",
+            "authority": service_host(self.use_dev),
             "accept": "application/json, text/plain, */*",
             "accept-language": "zh-CN",
             "authorize": self.get_authorize(self.username, self.password),
@@ -156,14 +153,31 @@ class GetRosData(Auth):
         self.save_file = f"{self.save_path}/{self.project_id}/{self.pool_id[0]}.zip"
         return resq
 
-    def unzip_data(self):
-        """解压数据"""
+    def unzip_data(self, task_filter=None):
+        """解压数据
+        
+        Args:
+            task_filter: 任务过滤条件，被过滤的成员不解压
+        """
         if not self.save_path:
             raise AttributeError("没有save_path")
         
+        target_path = os.path.join(self.save_path, str(self.project_id))
+        
         # 使用Python内置的zipfile解压
         with zipfile.ZipFile(self.save_file, 'r') as zip_ref:
-            zip_ref.extractall(os.path.join(self.save_path, str(self.project_id)))
+            if task_filter is None:
+                zip_ref.extractall(target_path)
+                return
+            
+            skipped_count = 0
+            for member in zip_ref.infolist():
+                if member.is_dir() or task_filter.accepts_zip_member(zip_ref, member):
+                    zip_ref.extract(member, target_path)
+                else:
+                    skipped_count += 1
+            if skipped_count:
+                print(f"过滤条件跳过 {skipped_count} 个文件（未完整解压）")
 
     def delete_data(self):
         """删除数据"""
@@ -200,12 +214,16 @@ class GetRosData(Auth):
         if self._is_zip_file_empty(self.save_file) or os.path.getsize(self.save_file) == 160:
             raise ValueError("下载的数据为空或格式错误，请检查项目ID和池子ID是否正确")
 
-    def get_unziped_data(self):
-        """下载并解压数据"""
+    def get_unziped_data(self, task_filter=None):
+        """下载并解压数据
+        
+        Args:
+            task_filter: 任务过滤条件
+        """
         print("开始下载数据...")
         self.get_data()
         print("数据下载完成，开始解压...")
-        self.unzip_data()
+        self.unzip_data(task_filter)
         print("数据解压完成")
 
     def get_unziped_data_specified_path(self):
@@ -0,0 +1,337 @@
+"""
+任务调度
+进程级的准入控制和公平调度，放在任务管理器和处理管道之间：
+1. 并发：同时运行的任务数固定（工作线程数），其余任务排队
+2. 内存令牌：按任务预估的内存占用申请令牌，总量为进程内存预算，预估来自同一项目上次运行的
+   实际需求，没有记录时按默认值；令牌不足时任务继续排队，而不是一起挤进内存被杀掉
+3. 下载令牌：所有任务共享的下载连接预算，限制同时下载导出文件的任务数（带宽按连接数分配）
+4. 公平：每个用户一个先进先出队列，各用户轮流出队（正在运行任务少的、最久没有出队的用户优先），
+   一个用户提交再多任务也不会挡住其他用户；
+   排队超过等待上限的任务优先，避免大任务一直因为内存不足被小任务插队
+5. 过载保护：排队总数和每个用户的排队数有上限，超出时直接拒绝提交
+"""
+
+import os
+import time
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from resource_budget import ResourceBudget
+from memory_budget import default_budget_mb
+
+
+# 没有历史记录时每个任务预估的内存需求（MB）
+DEFAULT_JOB_MEMORY_MB = 1024
+# 磁盘模式的任务只在内存中保留少量数据
+DISK_JOB_MEMORY_MB = 128
+# 按历史记录预估时的下限（解释器和客户端的固定开销）
+MIN_JOB_MEMORY_MB = 64
+DEFAULT_MAX_DOWNLOADS = 2
+DEFAULT_MAX_QUEUE = 20
+DEFAULT_MAX_QUEUED_PER_USER = 3
+DEFAULT_MAX_WAIT_SECONDS = 300
+
+# 排队原因
+WAIT_SLOT = 'slot'
+WAIT_MEMORY = 'memory'
+WAIT_TURN = 'turn'
+
+WAIT_REASON_NAMES = {
+    WAIT_SLOT: '等待空闲的处理槽位',
+    WAIT_MEMORY: '等待内存',
+    WAIT_TURN: '等待轮到'
+}
+
+ANONYMOUS_USER = 'anonymous'
+
+
+class QueueFull(Exception):
+    """排队任务数已达上限，拒绝提交"""
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+class _Ticket:
+    """排队中的任务"""
+
+    def __init__(self, job_id: str, user: str, memory_mb: float, run: Callable[[], Any]):
+        self.job_id = job_id
+        self.user = user
+        self.memory_mb = memory_mb
+        self.run = run
+        self.enqueued_at = time.time()
+
+
+class JobScheduler:
+    """任务调度器：准入控制（并发数、内存令牌）和按用户轮转的公平出队"""
+
+    def __init__(self, max_jobs: int = 2, memory_mb: Optional[float] = None,
+                 default_job_mb: float = DEFAULT_JOB_MEMORY_MB, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_queued_per_user: int = DEFAULT_MAX_QUEUED_PER_USER,
+                 max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS):
+        """
+        Args:
+            max_jobs: 同时运行的任务数
+            memory_mb: 内存令牌总量（MB），为None时使用进程内存预算
+            default_job_mb: 没有历史记录时每个任务预估的内存需求（MB）
+            max_queue: 排队任务总数上限
+            max_queued_per_user: 每个用户的排队任务数上限
+            max_wait_seconds: 排队超过该时间的任务优先出队（其他任务暂停准入，直到它拿到内存）
+        """
+        self.max_jobs = max(int(max_jobs or 1), 1)
+        self.memory = ResourceBudget(memory_mb or default_budget_mb(), 'memory_mb')
+        self.default_job_mb = default_job_mb
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self.running: Dict[str, _Ticket] = {}
+        # 用户 -> 排队任务
+        self._queues: Dict[str, deque] = {}
+        # 用户 -> 最近一次出队的序号，用于轮转
+        self._served: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._history: Dict[Any, float] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix='job')
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def estimate_mb(self, params: Dict[str, Any]) -> float:
+        """预估任务的内存需求（MB）
+
+        同一项目上次运行时的实际需求优先，磁盘模式的任务按较小的固定值计。
+
+        Args:
+            params: 处理参数
+
+        Returns:
+            float: 内存需求（MB），不超过令牌总量
+        """
+        if params.get('memory_mode') == 'disk':
+            estimate = DISK_JOB_MEMORY_MB
+        else:
+            estimate = self._history.get(params.get('project_id'), self.default_job_mb)
+        return min(estimate, self.memory.capacity)
+
+    def learn(self, project_id: Any, memory: Optional[Dict[str, Any]]):
+        """记录项目的实际内存需求，供下次预估
+
+        Args:
+            project_id: 项目ID
+            memory: 运行指标中的内存信息（JobMemory.summary）
+        """
+        if project_id is None or not memory:
+            return
+        needed = max(memory.get('estimated_mb') or 0, memory.get('peak_mb') or 0)
+        if needed > 0:
+            self._history[project_id] = max(needed, MIN_JOB_MEMORY_MB)
+
+    def submit(self, job_id: str, run: Callable[[], Any], user: Optional[str] = None,
+               memory_mb: Optional[float] = None):
+        """任务排队，有空闲槽位和足够的内存令牌时立即开始
+
+        Args:
+            job_id: 任务ID
+            run: 任务函数，在工作线程中执行
+            user: 提交任务的用户，用于公平调度
+            memory_mb: 任务预估的内存需求（MB），为None时使用默认值
+
+        Raises:
+            QueueFull: 排队任务总数或该用户的排队任务数已达上限
+        """
+        user = user or ANONYMOUS_USER
+        ticket = _Ticket(job_id, user, min(memory_mb or self.default_job_mb, self.memory.capacity), run)
+        with self._lock:
+            queue = self._queues.get(user)
+            if self.queued >= self.max_queue:
+                raise QueueFull(f"排队任务已满（{self.max_queue} 个），请稍后再试")
+            if queue is not None and len(queue) >= self.max_queued_per_user:
+                raise QueueFull(f"你已有 {len(queue)} 个任务在排队，请等待完成后再提交")
+            if queue is None:
+                queue = self._queues[user] = deque()
+            queue.append(ticket)
+            self._dispatch()
+
+    def cancel(self, job_id: str) -> bool:
+        """从队列中移除尚未开始的任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 任务是否在排队（已移除）
+        """
+        with self._lock:
+            for user, queue in self._queues.items():
+                for ticket in queue:
+                    if ticket.job_id == job_id:
+                        queue.remove(ticket)
+                        if not queue:
+                            del self._queues[user]
+                            self._forget(user)
+                        self._dispatch()
+                        return True
+        return False
+
+    def _users(self) -> List[str]:
+        """有排队任务的用户，按出队优先级排序：正在运行的任务数少的优先，其次是最久没有出队的"""
+        running: Dict[str, int] = {}
+        for ticket in self.running.values():
+            running[ticket.user] = running.get(ticket.user, 0) + 1
+        return sorted(self._queues, key=lambda user: (running.get(user, 0), self._served.get(user, -1)))
+
+    def _order(self) -> List[_Ticket]:
+        """按轮转顺序展开的排队任务（即预计的出队顺序）"""
+        queues = [list(self._queues[user]) for user in self._users()]
+        order = []
+        for index in range(max((len(queue) for queue in queues), default=0)):
+            order.extend(queue[index] for queue in queues if index < len(queue))
+        return order
+
+    def _overdue(self) -> Optional[_Ticket]:
+        heads = [queue[0] for queue in self._queues.values()]
+        oldest = min(heads, key=lambda ticket: ticket.enqueued_at, default=None)
+        if oldest is not None and time.time() - oldest.enqueued_at > self.max_wait_seconds:
+            return oldest
+        return None
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """下一个可以开始的任务：各用户队首按轮转顺序，第一个内存令牌足够的"""
+        overdue = self._overdue()
+        if overdue is not None:
+            # 超时的任务独占下一个名额，其他任务等它拿到内存后再准入
+            return overdue if overdue.memory_mb <= self.memory.available else None
+        for user in self._users():
+            head = self._queues[user][0]
+            if head.memory_mb <= self.memory.available:
+                return head
+        return None
+
+    def _dispatch(self):
+        # 调用方持有锁
+        while len(self.running) < self.max_jobs:
+            ticket = self._next_ticket()
+            if ticket is None or not self.memory.try_acquire(ticket.memory_mb):
+                return
+            queue = self._queues[ticket.user]
+            queue.popleft()
+            if not queue:
+                del self._queues[ticket.user]
+            self._served[ticket.user] = next(self._sequence)
+            self.running[ticket.job_id] = ticket
+            waited = time.time() - ticket.enqueued_at
+            print(f"任务 {ticket.job_id} 开始（用户 {ticket.user}，排队 {waited:.1f} 秒，"
+                  f"内存令牌 {ticket.memory_mb:.0f} MB，剩余 {self.memory.available:.0f} MB）")
+            self._executor.submit(self._run, ticket)
+
+    def _run(self, ticket: _Ticket):
+        try:
+            ticket.run()
+        finally:
+            with self._lock:
+                self.running.pop(ticket.job_id, None)
+                self.memory.release(ticket.memory_mb)
+                self._forget(ticket.user)
+                self._dispatch()
+
+    def _forget(self, user: str):
+        # 没有排队和运行中任务的用户不再参与轮转
+        if user not in self._queues and all(ticket.user != user for ticket in self.running.values()):
+            self._served.pop(user, None)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """排队中任务的位置和等待原因
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, Any]]: position（从1开始）、ahead（前面的任务数）、
+                waiting_for（slot/memory/turn）、memory_mb；任务不在排队时返回None
+        """
+        with self._lock:
+            order = self._order()
+            for index, ticket in enumerate(order):
+                if ticket.job_id != job_id:
+                    continue
+                if len(self.running) >= self.max_jobs:
+                    waiting_for = WAIT_SLOT
+                elif ticket.memory_mb > self.memory.available:
+                    waiting_for = WAIT_MEMORY
+                else:
+                    waiting_for = WAIT_TURN
+                return {
+                    'position': index + 1,
+                    'ahead': index,
+                    'waiting_for': waiting_for,
+                    'memory_mb': round(ticket.memory_mb, 1),
+                    'waited_seconds': round(time.time() - ticket.enqueued_at, 1)
+                }
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """调度器当前负载"""
+        with self._lock:
+            downloads = get_download_budget()
+            return {
+                'running': len(self.running),
+                'max_jobs': self.max_jobs,
+                'queued': self.queued,
+                'users': len(self._queues),
+                'memory_in_use_mb': round(self.memory.in_use, 1),
+                'memory_capacity_mb': round(self.memory.capacity, 1),
+                'downloads_in_use': int(downloads.in_use),
+                'max_downloads': int(downloads.capacity)
+            }
+
+    def shutdown(self, wait: bool = True):
+        """清空队列并停止工作线程"""
+        with self._lock:
+            self._queues.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    @classmethod
+    def from_env(cls, max_jobs: Optional[int] = None) -> 'JobScheduler':
+        """按环境变量创建
+
+        ROSETTA_JOB_WORKERS（并发任务数）、ROSETTA_SCHEDULER_MEMORY_MB（内存令牌总量）、
+        ROSETTA_JOB_MEMORY_MB（默认的单任务内存预估）、ROSETTA_MAX_QUEUE、
+        ROSETTA_MAX_QUEUED_PER_USER、ROSETTA_MAX_QUEUE_WAIT（秒）。
+        """
+        return cls(
+            max_jobs=max_jobs or int(_env_number('ROSETTA_JOB_WORKERS', 2)),
+            memory_mb=_env_number('ROSETTA_SCHEDULER_MEMORY_MB', 0) or None,
+            default_job_mb=_env_number('ROSETTA_JOB_MEMORY_MB', DEFAULT_JOB_MEMORY_MB),
+            max_queue=int(_env_number('ROSETTA_MAX_QUEUE', DEFAULT_MAX_QUEUE)),
+            max_queued_per_user=int(_env_number('ROSETTA_MAX_QUEUED_PER_USER', DEFAULT_MAX_QUEUED_PER_USER)),
+            max_wait_seconds=_env_number('ROSETTA_MAX_QUEUE_WAIT', DEFAULT_MAX_WAIT_SECONDS)
+        )
+
+
+_download_budget: Optional[ResourceBudget] = None
+_download_lock = threading.Lock()
+
+
+def get_download_budget() -> ResourceBudget:
+    """获取进程内所有任务共享的下载连接预算
+
+    容量为环境变量ROSETTA_MAX_DOWNLOADS（默认2），作为下载连接预算传给处理管道，
+    超出时任务在下载阶段前等待，已下载完成的任务继续解压和拆帧。
+
+    Returns:
+        ResourceBudget: 下载连接预算
+    """
+    global _download_budget
+    with _download_lock:
+        if _download_budget is None:
+            _download_budget = ResourceBudget(
+                int(_env_number('ROSETTA_MAX_DOWNLOADS', DEFAULT_MAX_DOWNLOADS)), 'downloads')
+        return _download_budget
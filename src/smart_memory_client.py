@@ -3,7 +3,6 @@
 支持自动故障转移，优先使用标准接口，失败后切换到大文件接口
 """
 
-import io
 import zipfile
 import json
 import os
@@ -15,12 +14,21 @@ from typing import Dict, Any, Optional, List
 # 导入本地客户端模块
 from rosetta_client import GetRosData as StandardClient
 from rosetta_bigfile_client import RosettaBigFileClient as BigFileClient
+from progress import ProgressReporter, ensure_progress, read_response, read_stream
+from credentials import get_oss_credentials
+from endpoints import oss_endpoint, oss_object_key, export_timeout, query_timeout, OSS_BUCKET
+from event_log import get_logger
+from memory_budget import open_buffer, export_record_size
+
+# 完整的请求参数和接口响应只在DEBUG级别输出
+log = get_logger('client')
 
 class SmartMemoryRosettaClient:
     """智能内存版Rosetta数据客户端 - 支持自动故障转移"""
     
     def __init__(self, project_id, pool_id: list, _type=1, 
-                 is_check_pool=False, use_dev=False, username=None, password=None):
+                 is_check_pool=False, use_dev=False, username=None, password=None,
+                 metrics=None, memory=None):
         """
         Args:
             project_id: 项目ID
@@ -30,6 +38,8 @@ class SmartMemoryRosettaClient:
             use_dev: 是否使用开发环境
             username: 用户名
             password: 密码
+            metrics: 运行指标（metrics.RunMetrics），记录登录耗时、首字节耗时和实际使用的接口
+            memory: 作业内存管理（memory_budget.JobMemory），下载按大小选择执行模式并写入可溢出缓冲区
         """
         self.project_id = project_id
         self.pool_id = pool_id
@@ -38,12 +48,26 @@ class SmartMemoryRosettaClient:
         self.use_dev = use_dev
         self.username = username
         self.password = password
+        self.metrics = metrics
+        self.memory = memory
         
         # 初始化两个客户端
         self.standard_client = None
         self.bigfile_client = None
         self._init_clients()
+        # 最近一次从大文件接口下载的导出标识，检查点恢复前用来确认导出没有变化
+        self.export_identity = None
     
+    def _record(self, stage: Optional[str] = None, **values):
+        """记录运行指标，未传入运行指标时忽略"""
+        if self.metrics is not None:
+            self.metrics.record(stage, **values)
+
+    def _plan_memory(self, size: Optional[int], source: str):
+        """已知导出压缩包大小时选择执行模式，未传入作业内存管理时忽略"""
+        if self.memory is not None:
+            self.memory.plan(size, source)
+
     def _init_clients(self):
         """初始化两个客户端实例"""
         try:
@@ -79,44 +103,60 @@ class SmartMemoryRosettaClient:
             print(f"⚠️  大文件客户端初始化失败: {str(e)}")
             self.bigfile_client = None
     
-    def smart_download(self) -> bytes:
+    def smart_download(self, progress: Optional[ProgressReporter] = None) -> bytes:
         """智能下载，自动选择最优接口
         
+        Args:
+            progress: 进度上报器，按已下载字节数上报
+            
         Returns:
             bytes: ZIP文件的二进制数据
         """
         print(f"🚀 开始智能下载，项目ID: {self.project_id}, 池子ID: {self.pool_id}")
+        progress = ensure_progress(progress)
+        started = time.perf_counter()
+        self.export_identity = None
         
         # 首先尝试标准接口
         if self.standard_client:
             try:
                 print("🚀 尝试标准下载接口...")
                 
+                # 请求头中包含登录获取的token
+                headers = self.standard_client._get_headers()
+                self._record('download', login_seconds=round(time.perf_counter() - started, 3))
+                
                 # 获取数据（不保存到文件）
+                request_started = time.perf_counter()
                 response = requests.post(
                     self.standard_client.get_url,
                     json=self.standard_client.req_data,
-                    headers=self.standard_client._get_headers(),
-                    timeout=30  # 添加超时设置
+                    headers=headers,
+                    timeout=export_timeout(),  # 添加超时设置
+                    stream=True  # 分块读取，按字节上报下载进度
                 )
+                self._record('download', ttfb_seconds=round(time.perf_counter() - request_started, 3))
                 
                 print(f"标准接口响应状态码: {response.status_code}")
-                print(f"标准接口响应大小: {len(response.content)} bytes")
+                content = (read_response(response, progress, memory=self.memory)
+                           if response.status_code == 200 else response.content)
+                print(f"标准接口响应大小: {len(content)} bytes")
                 
                 # 处理504网关超时错误
                 if response.status_code == 504:
                     print("⚠️  标准接口504网关超时，立即切换到大文件接口")
-                elif response.status_code == 200 and len(response.content) > 160:
+                elif response.status_code == 200 and len(content) > 160:
                     # 检查是否为空ZIP
-                    if not self._is_zip_data_empty(response.content):
+                    if not self._is_zip_data_empty(content):
                         print("✅ 标准接口下载成功")
-                        return response.content
+                        self._record('download', endpoint='standard')
+                        return content
                     else:
                         print("⚠️  标准接口返回空ZIP，尝试大文件接口")
                 else:
                     print(f"⚠️  标准接口响应异常，状态码: {response.status_code}")
                     if response.status_code == 200:
-                        print(f"响应内容预览: {response.content[:200]}...")
+                        print(f"响应内容预览: {content[:200]}...")
                     
             except requests.exceptions.Timeout:
                 print("⚠️  标准接口请求超时，切换到大文件接口")
@@ -128,18 +168,21 @@ class SmartMemoryRosettaClient:
             print("⚠️  标准客户端不可用，直接尝试大文件接口")
         
         # 标准接口失败，尝试大文件接口
+        self._record('download', failover_after_seconds=round(time.perf_counter() - started, 3))
         if self.bigfile_client:
             try:
                 print("🔄 切换到大文件接口...")
-                print(f"请求数据: {self.bigfile_client.req_data}")
+                log.debug(f"请求数据: {self.bigfile_client.req_data}")
                 
                 # 获取OSS下载信息
+                query_started = time.perf_counter()
                 response = requests.post(
                     self.bigfile_client.get_url,
                     json=self.bigfile_client.req_data,
                     headers=self.bigfile_client._get_headers(),
-                    timeout=60  # 大文件接口可能需要更长时间
+                    timeout=query_timeout()  # 大文件接口可能需要更长时间
                 )
+                self._record('download', query_seconds=round(time.perf_counter() - query_started, 3))
                 
                 print(f"大文件接口响应状态码: {response.status_code}")
                 
@@ -148,22 +191,26 @@ class SmartMemoryRosettaClient:
                 elif response.status_code == 200:
                     try:
                         data = response.json()
-                        print(f"大文件接口响应数据: {data}")
+                        log.debug(f"大文件接口响应数据: {data}")
                         
                         if 'data' in data and len(data['data']) > 0:
                             oss_file_name = data['data'][0]['zipFileName']
                             print(f"获取到OSS文件: {oss_file_name}")
+                            # 导出记录带有文件大小时，下载前即可选择执行模式
+                            self._plan_memory(export_record_size(data['data'][0]), 'export_log')
                             
                             # 下载OSS文件到内存
-                            zip_data = self._download_oss_file_to_memory(oss_file_name)
+                            zip_data = self._download_oss_file_to_memory(oss_file_name, progress)
                             if zip_data and not self._is_zip_data_empty(zip_data):
                                 print("✅ 大文件接口下载成功")
+                                self._record('download', endpoint='oss')
+                                self.export_identity = self._export_identity(data['data'][0])
                                 return zip_data
                             else:
                                 print("⚠️  大文件接口返回空数据")
                         else:
                             print("⚠️  大文件接口无数据返回")
-                            print(f"响应数据结构: {data}")
+                            log.debug(f"响应数据结构: {data}")
                     except json.JSONDecodeError as e:
                         print(f"❌ 大文件接口响应不是有效的JSON: {str(e)}")
                         print(f"原始响应内容: {response.text[:500]}...")
@@ -185,11 +232,46 @@ class SmartMemoryRosettaClient:
         # 所有接口都失败
         raise Exception("所有下载接口都失败了，请检查项目ID、池子ID和网络连接")
     
-    def _download_oss_file_to_memory(self, oss_file_name: str) -> bytes:
+    @staticmethod
+    def _export_identity(record: Dict[str, Any]) -> Dict[str, Any]:
+        """导出记录中标识导出内容的字段：文件名、大小和记录ID"""
+        return {
+            'zip_file': record.get('zipFileName'),
+            'size': export_record_size(record),
+            'id': record.get('id')
+        }
+    
+    def query_export_identity(self) -> Optional[Dict[str, Any]]:
+        """查询大文件接口当前的导出记录，不下载导出
+        
+        Returns:
+            Optional[Dict[str, Any]]: 导出标识，接口不可用或没有导出记录时返回None
+        """
+        if not self.bigfile_client:
+            return None
+        try:
+            response = requests.post(
+                self.bigfile_client.get_url,
+                json=self.bigfile_client.req_data,
+                headers=self.bigfile_client._get_headers(),
+                timeout=query_timeout()
+            )
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            if 'data' in data and len(data['data']) > 0:
+                return self._export_identity(data['data'][0])
+        except Exception as e:
+            print(f"⚠️  查询导出记录失败: {str(e)}")
+        return None
+    
+    def _download_oss_file_to_memory(self, oss_file_name: str,
+                                     progress: Optional[ProgressReporter] = None) -> bytes:
         """下载OSS文件到内存
         
         Args:
             oss_file_name: OSS文件路径
+            progress: 进度上报器
             
         Returns:
             bytes: 文件内容
@@ -198,38 +280,35 @@ class SmartMemoryRosettaClient:
             # 导入OSS相关库（延迟导入，避免不必要的依赖）
             import oss2
             
-            # OSS配置 - 从Streamlit Cloud secrets获取
-            import streamlit as st
-            oss_config = {
-                'access_key': st.secrets["oss_credentials"]["access_key"],
-                'secret_key': st.secrets["oss_credentials"]["secret_key"]
-            }
-            print("✅ 成功从Streamlit Cloud secrets获取OSS配置")
+            # OSS配置（环境变量 → 凭据文件 → Streamlit secrets）
+            oss_config = get_oss_credentials()
             
             auth = oss2.Auth(oss_config['access_key'], oss_config['secret_key'])
-            bucket_name = 'rosetta-data'
-            end_point = 'https://oss-cn-beijing.aliyuncs.com'
-            bucket = oss2.Bucket(auth, end_point, bucket_name)
+            bucket = oss2.Bucket(auth, oss_endpoint(), OSS_BUCKET)
             
             # 处理OSS文件路径
-            if oss_file_name.startswith('oss://rosetta-data/'):
-                oss_file_name = oss_file_name.lstrip('oss://rosetta-data/')
+            oss_file_name = oss_object_key(oss_file_name)
             
             # 下载到内存
+            request_started = time.perf_counter()
             object_stream = bucket.get_object(oss_file_name)
-            file_content = object_stream.read()
+            progress = ensure_progress(progress)
+            self._record('download', ttfb_seconds=round(time.perf_counter() - request_started, 3))
+            self._plan_memory(object_stream.content_length, 'oss')
+            try:
+                file_content = read_stream(object_stream.read, object_stream.content_length, progress,
+                                           memory=self.memory)
+            finally:
+                object_stream.close()
             
             print(f"OSS文件下载完成，大小: {len(file_content)} bytes")
             return file_content
             
         except ImportError:
-            print("❌ Streamlit库未安装，无法获取OSS配置")
+            print("❌ oss2库未安装，无法从OSS下载")
             return None
-        except KeyError as e:
-            print(f"❌ OSS配置未在Streamlit Cloud secrets中设置：{str(e)}")
-            return None
-        except FileNotFoundError:
-            print("❌ Streamlit Cloud secrets文件未找到，请确保应用在Streamlit Cloud环境中运行")
+        except ValueError as e:
+            print(f"❌ {str(e)}")
             return None
         except Exception as e:
             print(f"❌ OSS文件下载失败: {str(e)}")
@@ -238,44 +317,68 @@ class SmartMemoryRosettaClient:
     def _is_zip_data_empty(self, zip_data: bytes) -> bool:
         """检查ZIP数据是否为空"""
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_file:
+            with zipfile.ZipFile(open_buffer(zip_data)) as zip_file:
                 return len(zip_file.namelist()) == 0
         except zipfile.BadZipFile:
             return True
     
-    def extract_zip_to_memory(self, zip_data: bytes) -> Dict[str, bytes]:
+    def extract_zip_to_memory(self, zip_data: bytes, task_filter=None,
+                              progress: Optional[ProgressReporter] = None,
+                              result_files: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
         """将ZIP数据解压到内存
         
         Args:
             zip_data: ZIP文件的二进制数据
+            task_filter: 任务过滤条件，被过滤的成员不解压或只解压头部
+            progress: 进度上报器，按已解压成员数上报
+            result_files: 解压结果写入的映射（如可溢出到磁盘的memory_budget.SpillFiles），为None时新建字典
             
         Returns:
             Dict[str, bytes]: 文件路径到文件内容的映射
         """
-        result_files = {}
+        result_files = {} if result_files is None else result_files
+        skipped_count = 0
+        progress = ensure_progress(progress)
         
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_file:
-                for file_info in zip_file.filelist:
-                    if not file_info.is_dir():
+            with zipfile.ZipFile(open_buffer(zip_data)) as zip_file:
+                members = [file_info for file_info in zip_file.filelist if not file_info.is_dir()]
+                progress.start_stage('unzip', len(members), unit_label='个文件')
+                for file_info in members:
+                    progress.advance()
+                    if task_filter is not None:
+                        file_content = task_filter.read_zip_member(zip_file, file_info)
+                        if file_content is None:
+                            skipped_count += 1
+                            continue
+                    else:
                         file_content = zip_file.read(file_info.filename)
-                        result_files[file_info.filename] = file_content
+                    result_files[file_info.filename] = file_content
         except Exception as e:
             raise ValueError(f"解压ZIP数据失败: {str(e)}")
+        progress.finish_stage()
+        
+        if skipped_count:
+            print(f"过滤条件跳过 {skipped_count} 个文件（未完整解压）")
         
         return result_files
     
-    def get_project_data_to_memory(self) -> Dict[str, bytes]:
+    def get_project_data_to_memory(self, task_filter=None,
+                                   progress: Optional[ProgressReporter] = None) -> Dict[str, bytes]:
         """获取项目数据到内存（智能下载并解压）
         
+        Args:
+            task_filter: 任务过滤条件
+            progress: 进度上报器
+            
         Returns:
             Dict[str, bytes]: 文件路径到文件内容的映射
         """
         print("开始智能下载数据到内存...")
-        zip_data = self.smart_download()
+        zip_data = self.smart_download(progress)
         print("数据下载完成，开始解压到内存...")
         
-        files = self.extract_zip_to_memory(zip_data)
+        files = self.extract_zip_to_memory(zip_data, task_filter, progress)
         print(f"数据解压完成，共 {len(files)} 个文件")
         
         return files
\ No newline at end of file
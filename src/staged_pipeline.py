@@ -0,0 +1,141 @@
+"""
+流水线式阶段执行器
+各阶段由独立的工作线程处理，阶段之间通过有界队列连接（背压），
+多个项目像流水线一样依次流过 下载 → 解压 → 拆帧 → 打包，
+总耗时接近最慢阶段的耗时而不是各阶段耗时之和。
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, List
+
+
+# 队列结束标记
+_STOP = object()
+
+
+class StageFailure:
+    """阶段执行失败，后续阶段直接跳过"""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """流水线阶段"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        """
+        Args:
+            name: 阶段名称
+            func: 阶段处理函数，输入上一阶段的输出，返回本阶段输出
+            workers: 本阶段并发工作线程数
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(int(workers or 1), 1)
+
+
+class StagedPipeline:
+    """流水线式阶段执行器"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 2, cancel_token=None):
+        """
+        Args:
+            stages: 阶段列表，按执行顺序排列
+            queue_size: 阶段之间队列的容量，决定在途项目数上限
+            cancel_token: 取消令牌（cancellation.CancellationToken），取消后各阶段不再处理新的项目，
+                中断（Ctrl+C）时由流水线请求取消
+        """
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.queue_size = max(int(queue_size or 1), 1)
+        self.cancel_token = cancel_token
+
+    def _worker(self, stage: Stage, in_queue: queue.Queue, out_queue: queue.Queue,
+                remaining: List[int], lock: threading.Lock):
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                # 通知同阶段的其他工作线程，最后一个线程负责通知下一阶段
+                in_queue.put(_STOP)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    out_queue.put(_STOP)
+                return
+
+            index, value = item
+            if not isinstance(value, StageFailure):
+                try:
+                    if self.cancel_token is not None:
+                        self.cancel_token.raise_if_cancelled()
+                    value = stage.func(value)
+                except Exception as e:
+                    print(f"❌ 流水线阶段 {stage.name} 失败：{str(e)}")
+                    value = StageFailure(stage.name, e)
+                except BaseException as e:
+                    # 取消（OperationCancelled）：项目照常流到结果队列，由run在结束后重新抛出
+                    value = StageFailure(stage.name, e)
+            out_queue.put((index, value))
+
+    def run(self, items: List[Any]) -> List[Any]:
+        """让所有输入依次流过各阶段
+
+        Args:
+            items: 第一阶段的输入
+
+        Returns:
+            List[Any]: 最后一阶段的输出，顺序与输入一致；失败的项目为StageFailure
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages))]
+        queues.append(queue.Queue())  # 结果队列不限容量
+
+        threads = []
+        for stage, in_queue, out_queue in zip(self.stages, queues, queues[1:]):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for i in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, in_queue, out_queue, remaining, lock),
+                    name=f"stage-{stage.name}-{i}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # 输入放入第一个有界队列，队列满时阻塞（背压）
+        def feed():
+            for index, item in enumerate(items):
+                queues[0].put((index, item))
+            queues[0].put(_STOP)
+
+        feeder = threading.Thread(target=feed, name='stage-feeder', daemon=True)
+        feeder.start()
+
+        results: Dict[int, Any] = {}
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _STOP:
+                    break
+                index, value = item
+                results[index] = value
+        except BaseException:
+            # 中断：通知各阶段尽快退出（工作线程为守护线程，不会阻止进程退出）
+            if self.cancel_token is not None:
+                self.cancel_token.cancel()
+            raise
+
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        outputs = [results[i] for i in range(len(items))]
+        for value in outputs:
+            if isinstance(value, StageFailure) and not isinstance(value.error, Exception):
+                raise value.error
+        return outputs
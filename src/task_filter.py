@@ -0,0 +1,317 @@
+"""
+任务过滤条件（谓词下推）
+按任务状态、数据集ID、任务ID范围、附件类型和帧范围筛选任务，并尽可能提前过滤：
+1. 解压前按成员名过滤
+2. 完整解压/解析前按文件头部字段过滤
+3. 序列化前按帧范围裁剪
+"""
+
+import re
+import fnmatch
+import json
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+
+# 解压时读取的头部字节数，用于头部字段过滤
+DEFAULT_HEADER_BYTES = 64 * 1024
+
+# 头部过滤读取的字段（按JSON路径）及需要进入的对象
+_RECORD_PATH = ('taskParams', 'record')
+_HEADER_FIELDS = {('status',), ('datasetId',), ('taskId',), _RECORD_PATH + ('attachmentType',)}
+_HEADER_OBJECTS = {('taskParams',), _RECORD_PATH}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _HeaderComplete(Exception):
+    """过滤用的字段已全部读到，不再解析剩余内容"""
+
+
+def header_fields(head: bytes) -> Dict[Tuple[str, ...], Any]:
+    """按JSON结构从文件头部读取过滤用的字段，只匹配对应路径上的键，嵌套或其他位置的同名键不会误匹配
+
+    头部在任意位置截断时停止读取，只返回截断前已读到的字段。
+
+    Args:
+        head: 文件开头的若干字节
+
+    Returns:
+        Dict[Tuple[str, ...], Any]: 字段路径到值的映射；进入了taskParams.record对象时包含_RECORD_PATH（值为None）
+    """
+    text = head.decode('utf-8', errors='ignore')
+    found: Dict[Tuple[str, ...], Any] = {}
+
+    def skip(idx: int) -> int:
+        return _WHITESPACE.match(text, idx).end()
+
+    def walk(idx: int, path: Tuple[str, ...]) -> int:
+        # idx指向对象的'{'，返回对象结束后的位置
+        idx = skip(idx + 1)
+        if text[idx] == '}':
+            return idx + 1
+        while True:
+            key, idx = _decoder.raw_decode(text, idx)
+            idx = skip(idx)
+            if text[idx] != ':':
+                raise ValueError("缺少冒号")
+            idx = skip(idx + 1)
+            child = path + (key,)
+            if child in _HEADER_OBJECTS and text[idx] == '{':
+                if child == _RECORD_PATH:
+                    found[child] = None
+                idx = walk(idx, child)
+            else:
+                value, idx = _decoder.raw_decode(text, idx)
+                if child in _HEADER_FIELDS:
+                    found[child] = value
+                    if _HEADER_FIELDS.issubset(found):
+                        raise _HeaderComplete()
+            idx = skip(idx)
+            if text[idx] == '}':
+                return idx + 1
+            if text[idx] != ',':
+                raise ValueError("缺少逗号")
+            idx = skip(idx + 1)
+
+    try:
+        start = skip(0)
+        if text[start] == '{':
+            walk(start, ())
+    except (ValueError, IndexError):
+        # 头部截断或不是JSON对象
+        pass
+    except _HeaderComplete:
+        pass
+    return found
+
+
+class TaskFilter:
+    """任务过滤条件"""
+
+    def __init__(self,
+                 statuses: Optional[Iterable[int]] = None,
+                 dataset_ids: Optional[Iterable[int]] = None,
+                 task_id_min: Optional[int] = None,
+                 task_id_max: Optional[int] = None,
+                 attachment_types: Optional[Iterable[str]] = None,
+                 member_patterns: Optional[Iterable[str]] = None,
+                 task_id_pattern: Optional[str] = None,
+                 frame_start: Optional[int] = None,
+                 frame_end: Optional[int] = None,
+                 header_bytes: int = DEFAULT_HEADER_BYTES):
+        """
+        Args:
+            statuses: 保留的任务状态
+            dataset_ids: 保留的数据集ID
+            task_id_min: 任务ID下限（含）
+            task_id_max: 任务ID上限（含）
+            attachment_types: 保留的附件类型，如IMAGE_SEQUENCE
+            member_patterns: JSON成员名通配符（fnmatch），解压前过滤
+            task_id_pattern: 从成员名提取任务ID的正则（第一个分组），解压前按ID范围过滤
+            frame_start: 帧范围起点（含）
+            frame_end: 帧范围终点（不含）
+            header_bytes: 头部字段过滤读取的字节数
+        """
+        self.statuses: Optional[Set[int]] = set(int(x) for x in statuses) if statuses else None
+        self.dataset_ids: Optional[Set[int]] = set(int(x) for x in dataset_ids) if dataset_ids else None
+        self.task_id_min = task_id_min
+        self.task_id_max = task_id_max
+        self.attachment_types: Optional[Set[str]] = set(attachment_types) if attachment_types else None
+        self.member_patterns = list(member_patterns) if member_patterns else None
+        self.task_id_pattern = re.compile(task_id_pattern) if task_id_pattern else None
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.header_bytes = header_bytes
+
+
+    @classmethod
+    def from_config(cls, filter_config: Optional[Dict[str, Any]]) -> Optional['TaskFilter']:
+        """从配置创建过滤条件，未配置任何条件时返回None
+
+        Args:
+            filter_config: 配置中的filter段
+
+        Returns:
+            Optional[TaskFilter]: 过滤条件
+        """
+        if not filter_config:
+            return None
+        task_filter = cls(
+            statuses=filter_config.get('statuses'),
+            dataset_ids=filter_config.get('dataset_ids'),
+            task_id_min=filter_config.get('task_id_min'),
+            task_id_max=filter_config.get('task_id_max'),
+            attachment_types=filter_config.get('attachment_types'),
+            member_patterns=filter_config.get('member_patterns'),
+            task_id_pattern=filter_config.get('task_id_pattern'),
+            frame_start=filter_config.get('frame_start'),
+            frame_end=filter_config.get('frame_end'),
+            header_bytes=filter_config.get('header_bytes', DEFAULT_HEADER_BYTES)
+        )
+        return None if task_filter.is_empty else task_filter
+
+    @property
+    def is_empty(self) -> bool:
+        return not any([
+            self.statuses, self.dataset_ids, self.task_id_min is not None, self.task_id_max is not None,
+            self.attachment_types, self.member_patterns, self.frame_start is not None,
+            self.frame_end is not None
+        ])
+
+    @property
+    def has_task_predicates(self) -> bool:
+        """是否有需要读取任务内容才能判断的条件"""
+        return any([
+            self.statuses, self.dataset_ids, self.task_id_min is not None,
+            self.task_id_max is not None, self.attachment_types
+        ])
+
+    def _task_id_in_range(self, task_id: int) -> bool:
+        if self.task_id_min is not None and task_id < self.task_id_min:
+            return False
+        if self.task_id_max is not None and task_id > self.task_id_max:
+            return False
+        return True
+
+    def accepts_member(self, name: str) -> bool:
+        """解压前按成员名判断，非JSON成员始终保留
+
+        Args:
+            name: 压缩包成员名
+
+        Returns:
+            bool: 是否保留
+        """
+        if not name.endswith('.json'):
+            return True
+        if self.member_patterns and not any(fnmatch.fnmatch(name, p) for p in self.member_patterns):
+            return False
+        if self.task_id_pattern is not None:
+            match = self.task_id_pattern.search(name)
+            if match and not self._task_id_in_range(int(match.group(1))):
+                return False
+        return True
+
+    def accepts_header(self, head: bytes) -> bool:
+        """完整解析前按头部字段判断
+
+        按JSON结构读取顶层的status、datasetId、taskId和taskParams.record.attachmentType（见header_fields），
+        只在读到字段值且不符合条件时拒绝，字段在头部截断之后时返回True，交由完整解析后判断。
+        头部中没有taskParams.record对象的文件（如metadata.json）无法确定是任务，直接通过。
+
+        Args:
+            head: 文件开头的若干字节
+
+        Returns:
+            bool: 是否可能保留
+        """
+        if not self.has_task_predicates:
+            return True
+        fields = header_fields(head)
+        if _RECORD_PATH not in fields:
+            return True
+
+        if self.statuses is not None and not self._header_int_accepted(
+                fields.get(('status',)), self.statuses.__contains__):
+            return False
+        if self.dataset_ids is not None and not self._header_int_accepted(
+                fields.get(('datasetId',)), self.dataset_ids.__contains__):
+            return False
+        if (self.task_id_min is not None or self.task_id_max is not None) and \
+                not self._header_int_accepted(fields.get(('taskId',)), self._task_id_in_range):
+            return False
+
+        attachment_type = fields.get(_RECORD_PATH + ('attachmentType',))
+        if self.attachment_types is not None and isinstance(attachment_type, str) and \
+                attachment_type not in self.attachment_types:
+            return False
+        return True
+
+    @staticmethod
+    def _header_int_accepted(value: Any, predicate) -> bool:
+        if not isinstance(value, int) or isinstance(value, bool):
+            return True
+        return predicate(value)
+
+    @staticmethod
+    def is_task(data: Any) -> bool:
+        """JSON文档是否为任务（含taskParams.record），元数据等其他文档不受任务条件约束"""
+        if not isinstance(data, dict):
+            return False
+        task_params = data.get('taskParams')
+        return isinstance(task_params, dict) and isinstance(task_params.get('record'), dict)
+
+    def accepts_task(self, data: Dict[str, Any]) -> bool:
+        """完整解析后按任务字段判断，不是任务的文档（见is_task）原样保留
+
+        Args:
+            data: 任务JSON数据
+
+        Returns:
+            bool: 是否保留
+        """
+        if not self.is_task(data):
+            return True
+        if self.statuses is not None and data.get('status') not in self.statuses:
+            return False
+        if self.dataset_ids is not None and data.get('datasetId') not in self.dataset_ids:
+            return False
+        if self.task_id_min is not None or self.task_id_max is not None:
+            task_id = data.get('taskId')
+            if not isinstance(task_id, int) or not self._task_id_in_range(task_id):
+                return False
+        if self.attachment_types is not None:
+            record = data.get('taskParams', {}).get('record', {})
+            if record.get('attachmentType', '') not in self.attachment_types:
+                return False
+        return True
+
+    def frame_range(self, attachment_length: int) -> range:
+        """序列化前按帧范围裁剪
+
+        Args:
+            attachment_length: 任务帧数
+
+        Returns:
+            range: 需要输出的帧序号
+        """
+        start = self.frame_start if self.frame_start is not None else 0
+        end = self.frame_end if self.frame_end is not None else attachment_length
+        return range(max(start, 0), min(end, attachment_length))
+
+    def accepts_zip_member(self, zip_file, info) -> bool:
+        """解压前判断压缩包成员：先按成员名，再只解压头部字节按头部字段判断
+
+        Args:
+            zip_file: 已打开的ZipFile
+            info: 成员信息ZipInfo
+
+        Returns:
+            bool: 是否保留
+        """
+        return self.read_zip_member(zip_file, info, head_only=True) is not None
+
+    def read_zip_member(self, zip_file, info, head_only: bool = False) -> Optional[bytes]:
+        """按过滤条件读取压缩包成员，被过滤的成员只解压头部甚至完全不解压
+
+        Args:
+            zip_file: 已打开的ZipFile
+            info: 成员信息ZipInfo
+            head_only: 只判断不读取全部内容（通过时返回头部字节）
+
+        Returns:
+            Optional[bytes]: 成员内容，被过滤时返回None
+        """
+        if not self.accepts_member(info.filename):
+            return None
+        if not info.filename.endswith('.json') or not self.has_task_predicates:
+            return b'' if head_only else zip_file.read(info.filename)
+
+        with zip_file.open(info) as member:
+            head = member.read(self.header_bytes)
+            if not self.accepts_header(head):
+                return None
+            if head_only:
+                return head
+            return head + member.read()
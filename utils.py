@@ -4,49 +4,89 @@ Streamlit应用工具函数
 
 import os
 import zipfile
-import shutil
 import io
 import json
 from typing import List, Optional, Dict, Any
-import streamlit as st
+from frame_index import append_frame_index, member_compress_type
 
 
-def create_zip_archive(source_dir: str, output_path: str) -> bool:
+def _notify(level: str, message: str):
+    """输出提示：在Streamlit页面中运行时显示在页面上，命令行和后台线程中只打印
+
+    Args:
+        level: 提示级别（error/warning）
+        message: 提示内容
+    """
+    print(message)
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        getattr(st, level)(message)
+
+
+def create_zip_archive(source_dir: str, output_path: str, frame_index: bool = False) -> bool:
     """
     创建ZIP压缩包（文件系统版本）
     
     Args:
         source_dir: 源目录路径
         output_path: 输出ZIP文件路径
+        frame_index: 是否追加帧随机访问索引
         
     Returns:
         bool: 是否成功
     """
+    def read_source(arcname):
+        file_path = os.path.join(source_dir, arcname)
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+    
     try:
         with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for root, dirs, files in os.walk(source_dir):
                 for file in files:
                     file_path = os.path.join(root, file)
                     arcname = os.path.relpath(file_path, source_dir)
-                    zipf.write(file_path, arcname)
+                    zipf.write(file_path, arcname,
+                               compress_type=member_compress_type(arcname) if frame_index else None)
+            if frame_index:
+                append_frame_index(zipf, read_source)
         return True
     except Exception as e:
-        st.error(f"创建压缩包失败: {str(e)}")
+        _notify('error', f"创建压缩包失败: {str(e)}")
         return False
 
 
-def create_zip_archive_in_memory(data_dict: Dict[str, Any]) -> bytes:
+def create_zip_archive_in_memory(data_dict: Dict[str, Any], frame_index: bool = False,
+                                 progress=None, output=None) -> bytes:
     """
     在内存中创建ZIP压缩包
     
     Args:
         data_dict: 包含文件数据的字典，格式为 {文件路径: 文件内容}
+        frame_index: 是否追加帧随机访问索引（frame_index.json，位置记录在压缩包注释中）
+        progress: 进度上报器（src/progress.py中的ProgressReporter），按已压缩的原始字节数上报
+        output: 写入的缓冲区（支持write/seek/tell/getvalue，如src/memory_budget.py中可溢出到磁盘的SpillBuffer），
+            为None时使用BytesIO
         
     Returns:
-        bytes: ZIP文件的二进制数据
+        bytes: ZIP文件的二进制数据（output溢出到磁盘时为只读mmap）
+
+    Raises:
+        Exception: 打包失败（含取消），不返回不完整的压缩包
     """
     try:
-        zip_buffer = io.BytesIO()
+        zip_buffer = output if output is not None else io.BytesIO()
+        if progress is not None:
+            # 可溢出的文件集合直接给出总大小，不把磁盘上的文件读回内存
+            total = data_dict.total_bytes() if hasattr(data_dict, 'total_bytes') else \
+                sum(len(content) for content in data_dict.values())
+            progress.start_stage('compress', total, unit='bytes')
         
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for file_path, file_content in data_dict.items():
@@ -56,12 +96,23 @@ def create_zip_archive_in_memory(data_dict: Dict[str, Any]) -> bytes:
                 elif isinstance(file_content, dict):
                     file_content = json.dumps(file_content, ensure_ascii=False, indent=2).encode('utf-8')
                 
-                zipf.writestr(file_path, file_content)
+                zipf.writestr(file_path, file_content,
+                              compress_type=member_compress_type(file_path) if frame_index else None)
+                if progress is not None:
+                    progress.advance(len(file_content))
+            
+            if frame_index:
+                def read_member(name):
+                    content = data_dict.get(name)
+                    return content.encode('utf-8') if isinstance(content, str) else content
+                append_frame_index(zipf, read_member)
         
+        if progress is not None:
+            progress.finish_stage()
         return zip_buffer.getvalue()
     except Exception as e:
-        st.error(f"创建内存压缩包失败: {str(e)}")
-        return b''
+        _notify('error', f"创建内存压缩包失败: {str(e)}")
+        raise
 
 
 def create_zip_from_folder_in_memory(folder_path: str) -> bytes:
@@ -89,11 +140,11 @@ def create_zip_from_folder_in_memory(folder_path: str) -> bytes:
                             file_content = f.read()
                         zipf.writestr(arcname, file_content)
                     except Exception as e:
-                        st.warning(f"跳过文件 {file_path}: {str(e)}")
+                        _notify('warning', f"跳过文件 {file_path}: {str(e)}")
         
         return zip_buffer.getvalue()
     except Exception as e:
-        st.error(f"创建文件夹内存压缩包失败: {str(e)}")
+        _notify('error', f"创建文件夹内存压缩包失败: {str(e)}")
         return b''
 
 
@@ -136,46 +187,6 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} TB"
 
 
-def cleanup_temp_files(config_path: str, output_dir: str, max_age_hours: int = 24):
-    """
-    清理临时文件
-    
-    Args:
-        config_path: 配置文件路径
-        output_dir: 输出目录路径
-        max_age_hours: 最大保留时间（小时）
-    """
-    import time
-    
-    current_time = time.time()
-    max_age_seconds = max_age_hours * 3600
-    
-    # 清理配置文件
-    try:
-        if os.path.exists(config_path):
-            file_age = current_time - os.path.getmtime(config_path)
-            if file_age > max_age_seconds:
-                os.remove(config_path)
-    except Exception:
-        pass
-    
-    # 清理输出目录中的旧文件
-    try:
-        if os.path.exists(output_dir):
-            for item in os.listdir(output_dir):
-                item_path = os.path.join(output_dir, item)
-                if os.path.isfile(item_path):
-                    file_age = current_time - os.path.getmtime(item_path)
-                    if file_age > max_age_seconds:
-                        os.remove(item_path)
-                elif os.path.isdir(item_path):
-                    dir_age = current_time - os.path.getmtime(item_path)
-                    if dir_age > max_age_seconds:
-                        shutil.rmtree(item_path)
-    except Exception:
-        pass
-
-
 def validate_inputs(project_id: str, pool_ids: List[int], username: str, password: str) -> Optional[str]:
     """
     验证用户输入
@@ -213,4 +224,59 @@ def validate_inputs(project_id: str, pool_ids: List[int], username: str, passwor
     if not password or not password.strip():
         return "密码不能为空"
     
-    return None
\ No newline at end of file
+    return None
+
+
+def parse_int_list(text: str) -> List[int]:
+    """
+    解析逗号、空格或换行分隔的整数列表
+    
+    Args:
+        text: 输入文本
+        
+    Returns:
+        List[int]: 整数列表，输入为空时返回空列表
+        
+    Raises:
+        ValueError: 包含非数字内容
+    """
+    if not text:
+        return []
+    return [int(x) for x in text.replace(',', ' ').replace('，', ' ').split()]
+
+
+def build_task_filter_params(statuses: str, dataset_ids: str, task_id_min: str, task_id_max: str,
+                             attachment_types: List[str], frame_start: str, frame_end: str) -> Optional[Dict[str, Any]]:
+    """
+    根据界面输入构建任务过滤配置
+    
+    Args:
+        statuses: 任务状态列表文本
+        dataset_ids: 数据集ID列表文本
+        task_id_min: 任务ID下限文本
+        task_id_max: 任务ID上限文本
+        attachment_types: 附件类型列表
+        frame_start: 帧范围起点文本
+        frame_end: 帧范围终点文本
+        
+    Returns:
+        Optional[Dict[str, Any]]: 过滤配置，未填写任何条件时返回None
+        
+    Raises:
+        ValueError: 输入格式错误
+    """
+    def optional_int(text):
+        text = (text or '').strip()
+        return int(text) if text else None
+    
+    filter_params = {
+        'statuses': parse_int_list(statuses),
+        'dataset_ids': parse_int_list(dataset_ids),
+        'task_id_min': optional_int(task_id_min),
+        'task_id_max': optional_int(task_id_max),
+        'attachment_types': list(attachment_types or []),
+        'frame_start': optional_int(frame_start),
+        'frame_end': optional_int(frame_end)
+    }
+    filter_params = {k: v for k, v in filter_params.items() if v not in (None, [])}
+    return filter_params or None
\ No newline at end of file